@@ -1,8 +1,25 @@
 import sys
 
-from .simulation import Simulation
+from .allocation import limit_blas_threads
+
+# BLAS reads its thread count when NumPy is first imported
+limit_blas_threads()
+
+from .simulation import Simulation  # noqa: E402
+
+
+def main(arguments):
+    """Dispatch to a subcommand, or play a game by default."""
+    if arguments and arguments[0] == 'benchmark':
+        from .benchmark import Benchmark
+        Benchmark.entrypoint(arguments[1:])
+    elif arguments and arguments[0] == 'sweep':
+        from .sweep import Sweep
+        Sweep.entrypoint(arguments[1:])
+    else:
+        Simulation.entrypoint(arguments)
 
 
 if __name__ == '__main__':
     # CLI entrypoint when run via `python -m howso_engine_rl_recipes`
-    Simulation.entrypoint(sys.argv[1:])
+    main(sys.argv[1:])
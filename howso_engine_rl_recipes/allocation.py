@@ -0,0 +1,221 @@
+import os
+from pathlib import Path
+import typing as t
+
+BLAS_THREAD_VARIABLES = (
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+)
+"""The environment variables which set the threads of NumPy's BLAS libraries."""
+
+
+class CpuAllocation:
+    """
+    Division of the available cores among worker processes and their engine threads.
+
+    Every worker runs its own engine, so running more workers than cores,
+    or more engine threads than the cores left to each worker, makes them
+    compete for the same cores, while too few leaves cores idle. Each worker
+    is pinned to its own set of CPUs, so workers do not migrate between
+    cores and evict each other's caches.
+
+    Parameters
+    ----------
+    workers : int
+        The number of worker processes.
+    engine_threads : int, optional
+        The threads of each worker's multi-threaded engine. Defaults to the
+        engine's own choice.
+    cpu_sets : list of list of int, optional
+        The CPUs each worker is pinned to. Workers are not pinned when not
+        specified.
+    cores : int, optional
+        The number of cores the allocation was chosen from.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        *,
+        engine_threads: t.Optional[int] = None,
+        cpu_sets: t.Optional[t.Sequence[t.Sequence[int]]] = None,
+        cores: t.Optional[int] = None
+    ) -> None:
+        self.workers = max(1, workers)
+        self.engine_threads = engine_threads
+        self.cpu_sets = None if cpu_sets is None else [list(cpus) for cpus in cpu_sets]
+        self.cores = cores
+
+    def __repr__(self) -> str:
+        return f'CpuAllocation({self.workers}, engine_threads={self.engine_threads})'
+
+    @classmethod
+    def auto(
+        cls,
+        tasks: t.Optional[int] = None,
+        *,
+        multithreaded: bool = True,
+        cpus: t.Optional[t.Iterable[int]] = None,
+        cores: t.Optional[int] = None
+    ) -> "CpuAllocation":
+        """
+        Choose the workers and engine threads from the detected cores.
+
+        A game reacts to one small batch of observations at a time, which
+        parallelizes better across games than across engine threads, so
+        there is a worker for every physical core, or for every task when
+        there are fewer. The cores left over are shared out as engine threads
+        when the engine is multi-threaded. Hyperthreads are not counted as
+        cores, but are included in the CPUs each worker is pinned to.
+
+        Parameters
+        ----------
+        tasks : int, optional
+            The number of games to play, which caps the number of workers.
+        multithreaded : bool, default True
+            If the engine configuration uses the multi-threaded engine.
+        cpus : iterable of int, optional
+            The CPUs to allocate. Defaults to those the process may use.
+        cores : int, optional
+            The number of physical cores of ``cpus``. Detected when not
+            specified.
+
+        Returns
+        -------
+        CpuAllocation
+            The chosen allocation.
+        """
+        cpus = available_cpus() if cpus is None else sorted(cpus)
+        if cores is None:
+            cores = physical_cores(cpus)
+        cores = max(1, min(cores, len(cpus)))
+        workers = min(cores, tasks) if tasks else cores
+        engine_threads = max(1, cores // workers) if multithreaded else 1
+        cpu_sets = [
+            cpus[len(cpus) * worker // workers:len(cpus) * (worker + 1) // workers]
+            for worker in range(workers)
+        ]
+        return cls(workers, engine_threads=engine_threads, cpu_sets=cpu_sets, cores=cores)
+
+    def as_dict(self) -> t.Dict[str, t.Any]:
+        """Get the allocation in a form which can be serialized to JSON."""
+        return {
+            'workers': self.workers,
+            'engine_threads': self.engine_threads,
+            'cpu_sets': self.cpu_sets,
+            'cores': self.cores,
+        }
+
+    def describe(self) -> str:
+        """Get a description of the allocation for the summary."""
+        description = f'{self.workers} workers'
+        if self.engine_threads is not None:
+            description += f' x {self.engine_threads} engine threads'
+        if self.cores is not None:
+            description += f' on {self.cores} cores'
+        return description
+
+
+def available_cpus() -> t.List[int]:
+    """
+    Get the CPUs the current process may run on.
+
+    Returns
+    -------
+    list of int
+        The CPU numbers.
+    """
+    import psutil
+    process = psutil.Process()
+    # macOS does not support CPU affinity
+    if hasattr(process, 'cpu_affinity'):
+        return sorted(process.cpu_affinity())
+    return list(range(psutil.cpu_count() or 1))
+
+
+def physical_cores(cpus: t.Sequence[int]) -> int:
+    """
+    Estimate the number of physical cores of a set of CPUs.
+
+    Parameters
+    ----------
+    cpus : list of int
+        The CPU numbers.
+
+    Returns
+    -------
+    int
+        The physical cores of the machine, in proportion to the share of its
+        CPUs given.
+    """
+    import psutil
+    logical = psutil.cpu_count() or len(cpus)
+    physical = psutil.cpu_count(logical=False) or logical
+    return max(1, min(len(cpus), physical * len(cpus) // logical))
+
+
+def is_multithreaded(engine_config: t.Optional[str] = None) -> bool:
+    """
+    Check if an engine configuration uses the multi-threaded engine.
+
+    Parameters
+    ----------
+    engine_config : str, optional
+        The Howso configuration file. Defaults to the file in the
+        ``HOWSO_CONFIG`` environment variable.
+
+    Returns
+    -------
+    bool
+        False when the configuration selects a single-threaded Amalgam
+        library, True otherwise as that is the default.
+    """
+    engine_config = engine_config or os.environ.get('HOWSO_CONFIG')
+    if engine_config is None or not Path(engine_config).is_file():
+        return True
+    import yaml
+    with open(engine_config) as config_file:
+        config = yaml.safe_load(config_file) or {}
+    amalgam = ((config.get('Howso') or {}).get('client_extra_params') or {}).get('amalgam') or {}
+    return not str(amalgam.get('library_postfix', '')).startswith('-st')
+
+
+def pin_process(cpus: t.Iterable[int]) -> None:
+    """
+    Pin the current process to a set of CPUs, where supported.
+
+    Parameters
+    ----------
+    cpus : iterable of int
+        The CPU numbers.
+    """
+    import psutil
+    process = psutil.Process()
+    if hasattr(process, 'cpu_affinity'):
+        process.cpu_affinity(list(cpus))
+
+
+def limit_blas_threads(threads: int = 1) -> None:
+    """
+    Cap the threads of NumPy's BLAS libraries.
+
+    The games only operate on small arrays, for which BLAS threads add
+    overhead and compete with the engine for cores. The environment
+    variables only affect libraries loaded after they are set, and are left
+    alone when already set so they can be overridden. Libraries already
+    loaded are limited with threadpoolctl, when it is installed.
+
+    Parameters
+    ----------
+    threads : int, default 1
+        The number of threads.
+    """
+    for variable in BLAS_THREAD_VARIABLES:
+        os.environ.setdefault(variable, str(threads))
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(threads, user_api='blas')
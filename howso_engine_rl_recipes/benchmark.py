@@ -0,0 +1,310 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from importlib import resources
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import sys
+
+import numpy as np
+
+from . import __version__
+from .allocation import CpuAllocation, is_multithreaded, limit_blas_threads, pin_process
+from .common.profiler import PhaseProfiler
+from .common.resources import get_peak_rss
+from .simulation import GameType, import_game, set_engine_threads, Simulation
+
+logger = logging.getLogger('howso.rl.examples.benchmark')
+
+CONFIG_DIR = Path(str(resources.files(__package__) / 'config'))
+"""The directory of the engine configurations installed with the package."""
+
+DEFAULT_ENGINE_CONFIGS = [
+    CONFIG_DIR / 'latest-st-howso.yml',
+    CONFIG_DIR / 'latest-mt-howso.yml',
+]
+"""The single-threaded and multi-threaded engine configurations."""
+
+DEFAULT_MAX_ROUNDS = {
+    GameType.WTM: 150,
+    GameType.CART_POLE: 200,
+}
+"""The maximum rounds of each game's workload."""
+
+
+class Benchmark:
+    """
+    Measure the throughput of playing each game with each of its agents.
+
+    Every workload plays a fixed sequence of seeds in a fresh process that
+    uses the given engine configuration, so results are comparable between
+    runs of the benchmark. The process is given every detected core, as
+    engine threads when the configuration is multi-threaded, and the
+    allocation chosen is reported with the workload's results.
+
+    Parameters
+    ----------
+    engine_configs : list of Path
+        The Howso configuration files to run the workloads under.
+    iterations : int, default 3
+        The number of games played by each workload.
+    seed : int, default 0
+        The seed of the first game of each workload, subsequent games use
+        consecutive seeds.
+    max_rounds : int, optional
+        The maximum rounds of each game. Defaults to a per-game value.
+    """
+
+    def __init__(self, engine_configs, iterations=3, seed=0, max_rounds=None):
+        self.engine_configs = [Path(c) for c in engine_configs]
+        self.iterations = max(1, iterations)
+        self.seed = seed
+        self.max_rounds = max_rounds
+
+    @classmethod
+    def process_args(cls, arguments):
+        """Process command line arguments."""
+        parser = argparse.ArgumentParser(
+            prog='python -m howso_engine_rl_recipes benchmark',
+            description='Benchmark the throughput of the reinforcement '
+                        'learning games.')
+        parser.add_argument(
+            '--games', dest='game_types', nargs='+',
+            default=GameType.choices(), choices=GameType.choices(),
+            help='The game types to benchmark.')
+        parser.add_argument(
+            '--agents', dest='agent_types', nargs='+',
+            help='The agent types to benchmark. Defaults to all agents of '
+                 'each game.')
+        parser.add_argument(
+            '--engine-config', dest='engine_configs', nargs='+',
+            metavar='FILE', default=DEFAULT_ENGINE_CONFIGS,
+            help='The Howso configuration files to benchmark under.')
+        parser.add_argument(
+            '--iterations', '-i', dest='iterations', type=int, default=3,
+            help='The number of games played by each workload.')
+        parser.add_argument(
+            '--seed', '-s', dest='seed', type=int, default=0,
+            help='The seed of the first game of each workload.')
+        parser.add_argument(
+            '--max-rounds', dest='max_rounds', type=int,
+            help='The maximum number of rounds of each game.')
+        parser.add_argument(
+            '--output', '-o', dest='output', metavar='FILE',
+            help='Write the benchmark results to FILE.')
+        parser.add_argument(
+            '--baseline', dest='baseline', metavar='FILE',
+            help='Compare the results to a previous benchmark output FILE '
+                 'and exit with an error when a metric regressed.')
+        parser.add_argument(
+            '--tolerance', dest='tolerance', type=float, default=0.1,
+            help='The relative change from the baseline allowed before a '
+                 'metric is considered regressed.')
+        parser.add_argument(
+            '--log-level', dest='log_level', default=logging.INFO,
+            help="The the log level to use.")
+
+        return parser.parse_args(arguments)
+
+    @classmethod
+    def entrypoint(cls, arguments):
+        """CLI entrypoint."""
+        args = cls.process_args(arguments)
+        logging.basicConfig(stream=sys.stderr, level=args.log_level,
+                            format="[%(asctime)s] %(levelname)s: %(message)s")
+        benchmark = cls(args.engine_configs, iterations=args.iterations,
+                        seed=args.seed, max_rounds=args.max_rounds)
+        report = benchmark.run(args.game_types, args.agent_types)
+
+        if args.baseline:
+            with open(args.baseline) as baseline_file:
+                baseline = json.load(baseline_file)
+            report['regressions'] = compare_to_baseline(report, baseline, args.tolerance)
+
+        output = json.dumps(report, indent=4, default=str)
+        print(output)
+        if args.output:
+            with open(args.output, 'w') as output_file:
+                output_file.write(output)
+
+        if report.get('regressions'):
+            for regression in report['regressions']:
+                logger.error(
+                    'Regression in %s/%s/%s %s: %.4g (baseline %.4g)',
+                    regression['game_type'], regression['agent_type'], regression['engine_config'],
+                    regression['metric'], regression['value'], regression['baseline'])
+            sys.exit(1)
+
+    def run(self, game_types, agent_types=None):
+        """
+        Run the workload of every game, agent and engine configuration.
+
+        Parameters
+        ----------
+        game_types : list of str
+            The game types to benchmark.
+        agent_types : list of str, optional
+            The agent types to benchmark. Defaults to all agents of each game.
+
+        Returns
+        -------
+        dict
+            The benchmark report.
+        """
+        results = []
+        for engine_config in self.engine_configs:
+            if not engine_config.is_file():
+                raise ValueError(f'Engine configuration "{engine_config}" does not exist')
+            for game_type in game_types:
+                game_agents = import_game(game_type).agent_registry
+                for agent_type in agent_types or game_agents:
+                    if agent_type not in game_agents:
+                        continue
+                    logger.info('Benchmarking %s %s with %s', game_type, agent_type, engine_config.name)
+                    results.append(self.run_workload(engine_config, game_type, agent_type))
+
+        return {
+            'version': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'iterations': self.iterations,
+            'seed': self.seed,
+            'results': results,
+        }
+
+    def run_workload(self, engine_config, game_type, agent_type):
+        """
+        Run a single workload in a fresh process using the engine config.
+
+        Parameters
+        ----------
+        engine_config : Path
+            The Howso configuration file.
+        game_type : str
+            The game type to play.
+        agent_type : str
+            The agent type to play with.
+
+        Returns
+        -------
+        dict
+            The workload result.
+        """
+        allocation = CpuAllocation.auto(1, multithreaded=is_multithreaded(engine_config))
+        result = {
+            'game_type': str(game_type),
+            'agent_type': agent_type,
+            'engine_config': engine_config.stem,
+            'allocation': allocation.as_dict(),
+        }
+        max_rounds = self.max_rounds or DEFAULT_MAX_ROUNDS[GameType(game_type)]
+        seeds = [self.seed + i for i in range(self.iterations)]
+        # A new process per workload isolates its client and peak memory
+        with ProcessPoolExecutor(max_workers=1, initializer=_use_engine_config,
+                                 initargs=[str(engine_config.resolve()), allocation]) as pool:
+            try:
+                result.update(pool.submit(
+                    _run_workload, game_type, agent_type, seeds, max_rounds
+                ).result())
+            except Exception as e:
+                logger.exception('Workload %s %s failed', game_type, agent_type)
+                result['error'] = repr(e)
+        return result
+
+
+def _use_engine_config(engine_config, allocation):
+    """Select the Howso configuration and CPU allocation of a workload process."""
+    os.environ['HOWSO_CONFIG'] = engine_config
+    limit_blas_threads()
+    set_engine_threads(allocation.engine_threads)
+    pin_process(allocation.cpu_sets[0])
+
+
+def _run_workload(game_type, agent_type, seeds, max_rounds):
+    """Play the games of a workload and measure them."""
+    sim = Simulation(iterations=len(seeds))
+    result = sim.run(seeds=seeds, game_type=game_type, agent_type=agent_type,
+                     max_rounds=max_rounds, profile=True)
+
+    runs = list(result['runs'].values())
+    steps = sum(run['steps'] for run in runs)
+    play_seconds = sum(run['duration'].total_seconds() for run in runs)
+    react = PhaseProfiler.from_dict(result['metrics']['profile']).stats['react']
+    won_rounds = [run['rounds'] for run in runs if run['win']]
+    workload = {
+        'steps': steps,
+        'steps_per_sec': steps / play_seconds if play_seconds else float('nan'),
+        'react_calls': react.count,
+        'react_latency_p50': react.percentile(50),
+        'react_latency_p95': react.percentile(95),
+        'react_latency_p99': react.percentile(99),
+        'win_rate': len(won_rounds) / len(runs),
+        'rounds_to_win': float(np.mean(won_rounds)) if won_rounds else float('nan'),
+        'setup_duration': result['metrics']['setup-duration']['mean'],
+        'peak_rss': get_peak_rss(),
+        'duration': result['duration'].total_seconds(),
+    }
+    # JSON has no NaN, metrics which could not be measured are null instead
+    return {key: None if isinstance(value, float) and np.isnan(value) else value for key, value in workload.items()}
+
+
+REGRESSION_METRICS = {
+    'steps_per_sec': 'higher',
+    'react_latency_p50': 'lower',
+    'react_latency_p95': 'lower',
+    'rounds_to_win': 'lower',
+    'peak_rss': 'lower',
+}
+"""The metrics compared to the baseline and the direction that is better."""
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """
+    Find the metrics of a benchmark that regressed from a baseline benchmark.
+
+    Parameters
+    ----------
+    report : dict
+        The benchmark report.
+    baseline : dict
+        A previous benchmark report.
+    tolerance : float
+        The relative change allowed before a metric is considered regressed.
+
+    Returns
+    -------
+    list of dict
+        The regressed metrics.
+    """
+    def workload_key(result):
+        return result['game_type'], result['agent_type'], result['engine_config']
+
+    baseline_results = {workload_key(r): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        baseline_result = baseline_results.get(workload_key(result))
+        if baseline_result is None:
+            continue
+        for metric, better in REGRESSION_METRICS.items():
+            value = result.get(metric)
+            baseline_value = baseline_result.get(metric)
+            if value is None or baseline_value is None or np.isnan(value) or np.isnan(baseline_value):
+                continue
+            if better == 'higher':
+                regressed = value < baseline_value * (1 - tolerance)
+            else:
+                regressed = value > baseline_value * (1 + tolerance)
+            if regressed:
+                regressions.append({
+                    'game_type': result['game_type'],
+                    'agent_type': result['agent_type'],
+                    'engine_config': result['engine_config'],
+                    'metric': metric,
+                    'value': value,
+                    'baseline': baseline_value,
+                })
+    return regressions
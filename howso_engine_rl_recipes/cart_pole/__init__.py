@@ -0,0 +1,9 @@
+from gymnasium.envs.registration import register
+
+register(
+    id="CartPoleNative-v1",
+    entry_point="gymnasium.envs.classic_control.cartpole:CartPoleEnv",
+    vector_entry_point="howso_engine_rl_recipes.cart_pole.cart_pole:CartPoleVectorEnv",
+    max_episode_steps=500,
+    reward_threshold=475.0,
+)
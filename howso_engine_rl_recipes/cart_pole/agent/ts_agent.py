@@ -1,10 +1,9 @@
 import logging
 
-from howso import engine
 import numpy as np
-import pandas as pd
 
 from ...common.agent import BaseAgent
+from ...common.training import StepBuffer
 
 logger = logging.getLogger('howso.rl.examples.cart_pole')
 
@@ -51,12 +50,22 @@ class TimeSeriesAgent(BaseAgent[np.ndarray, int]):
     improving performances.
     """
 
+    default_cache_bin_widths = (0.1, 0.1, 0.01, 0.1)
+    # TODO:22817 - lower conviction to 1
+    default_desired_conviction = 2
+
+    # Reacts also depend on the previous step and the round, which the
+    # distilled policy does not see
+    supports_distilled_policy = False
+
     def setup(self) -> None:
         """Setup the agent."""
         self.max_avg_score = 0
 
         self.last_observation = [None, None, None, None]
         self.last_push_direction = None
+        # Last step of rounds played via `act_batch`, keyed by round
+        self.round_last_steps = {}
 
         # Setup Howso features
         self.features = {
@@ -122,46 +131,49 @@ class TimeSeriesAgent(BaseAgent[np.ndarray, int]):
             '.push_direction_lag_1',
         ]
 
-        self.trainee = engine.Trainee(features=self.features)
-        self.trainee.set_auto_analyze_params(
+        # Steps of rounds recorded client side, instead of in the series store
+        self.steps = StepBuffer(len(self.context_features) + len(self.action_features))
+
+        self.trainee = self.create_trainee(
+            self.features,
             auto_analyze_enabled=True,
             context_features=self.context_features + self.lag_features + self.action_features,
             rebalance_features=self.goal_features
         )
         self.goal_map = dict(zip(self.goal_features, [{"goal": "max"}]))
 
-        if self.seed is not None:
-            self.trainee.set_random_seed(self.seed)
-        # Show all DataFrame columns
-        pd.set_option('display.max_columns', None)
+        if self.explanations.enabled:
+            import pandas as pd
+
+            # Show all DataFrame columns of the explanations
+            pd.set_option('display.max_columns', None)
 
     def done(self, won=False) -> None:
         """Cleanup when finished."""
         self.trainee.delete()
 
-    def act(self, observation, round_num, step) -> int:
-        """React to the observation to get the action."""
-        # TODO:22817 - lower conviction to 1
-        desired_conviction = 2
+    def get_state(self) -> dict:
+        """Get the agent's client side state to include in a checkpoint."""
+        return {'max_avg_score': float(self.max_avg_score)}
 
-        details = {}
-        if self.explanation_level >= 2:
-            details['influential_cases'] = True
+    def set_state(self, state) -> None:
+        """Restore the agent's client side state from a checkpoint."""
+        self.max_avg_score = state['max_avg_score']
 
-        if self.explanation_level >= 3:
-            details['feature_full_accuracy_contributions'] = True
-            details['feature_full_residuals'] = True
-            details['feature_full_residuals_for_case'] = True
-            details['boundary_cases'] = 3
+    def act(self, observation, round_num, step) -> int:
+        """React to the observation to get the action."""
+        if self.records_cases:
+            return self.act_batch([observation], [round_num], [step])[0]
 
-        react = self.trainee.react(
-            desired_conviction=desired_conviction,
+        explain = self.explanations.should_explain()
+        react = self.react(
+            desired_conviction=self.desired_conviction,
             contexts=[[*observation, *self.last_observation, self.last_push_direction]],
             context_features=self.context_features + self.lag_features,
             action_features=self.action_features,
             goal_features_map=self.goal_map,
             into_series_store=str(round_num),
-            details=details
+            details=self.get_react_details() if explain else None
         )
 
         push_direction = react['action']['push_direction'][0]
@@ -169,87 +181,92 @@ class TimeSeriesAgent(BaseAgent[np.ndarray, int]):
         self.last_observation = observation
         self.last_push_direction = push_direction
 
-        self.output_explanations(react)
+        if explain:
+            with self.profiler.phase('explanations'):
+                self.explanations.record(react['details'], round=round_num, step=step)
 
         return int(push_direction)
 
+    def act_batch(self, observations, round_nums, steps) -> list[int]:
+        """React to the observations of several rounds at once."""
+        observations = np.asarray(observations).tolist()
+        contexts = []
+        for observation, round_num in zip(observations, round_nums):
+            last_observation, last_push_direction = self.round_last_steps.get(
+                str(round_num), ([None, None, None, None], None))
+            contexts.append([*observation, *last_observation, last_push_direction])
+
+        # Cached actions are keyed on the current observation only
+        push_directions = [None] * len(contexts)
+        if self.action_cache is not None:
+            push_directions = [self.action_cache.get(observation) for observation in observations]
+        pending = [i for i, push_direction in enumerate(push_directions) if push_direction is None]
+
+        if pending:
+            explain = self.explanations.should_explain()
+            react = self.react(
+                desired_conviction=self.desired_conviction,
+                num_cases_to_generate=len(pending),
+                contexts=[contexts[i] for i in pending],
+                context_features=self.context_features + self.lag_features,
+                action_features=self.action_features,
+                goal_features_map=self.goal_map,
+                details=self.get_react_details() if explain else None
+            )
+            for index, i in enumerate(pending):
+                push_directions[i] = int(react['action']['push_direction'][index])
+                if self.action_cache is not None:
+                    self.action_cache.put(observations[i], push_directions[i])
+                if explain:
+                    with self.profiler.phase('explanations'):
+                        self.explanations.record(react['details'], index, round=int(round_nums[i]), step=int(steps[i]))
+
+        # A react can only record into a single series store, so the steps of
+        # each round are kept here until the round's reward is assigned. Lag
+        # features are derived by the trainee when the round is trained.
+        for observation, push_direction, round_num in zip(observations, push_directions, round_nums):
+            self.round_last_steps[str(round_num)] = (observation, push_direction)
+            self.steps.append(round_num, [*observation, push_direction])
+
+        return push_directions
+
     def assign_reward(self, observation, scores, round_num, step) -> None:
         """Assign reward to model."""
-        score = scores[-1]
+        score = scores.last
         # avg of the last 100 games (or however many win_threshold is)
-        avg_score = np.mean(scores[-self.win_threshold:])
+        avg_score = scores.window_mean
         self.max_avg_score = max(self.max_avg_score, avg_score)
         game_id = str(round_num)
 
-        # assign each action a score, high to low, representing how many ticks before failure
-        game_final_values = [
-            [score - i, i, game_id]
-            for i in range(step)
-        ]
+        self.round_last_steps.pop(game_id, None)
 
         # only train on games that did better than the current max avg score
         if score >= self.max_avg_score + 1:
-            self.trainee.train(
-                features=self.goal_features + self.time_features + self.id_features,
-                cases=game_final_values,
-                series=str(round_num),
-            )
-        else:
-            self.trainee.remove_series_store()
+            # assign each action a score, high to low, representing how many ticks before failure
+            ticks = np.arange(step)
+            game_final_values = np.column_stack([score - ticks, ticks])
+            steps = self.steps.pop(round_num)
+            if steps is not None:
+                self.train_round(
+                    [case + [game_id] for case in np.column_stack([steps, game_final_values]).tolist()],
+                    features=(self.context_features + self.action_features + self.goal_features +
+                              self.time_features + self.id_features),
+                )
+            else:
+                self.train(
+                    [values + [game_id] for values in game_final_values.tolist()],
+                    features=self.goal_features + self.time_features + self.id_features,
+                    series=str(round_num),
+                )
+        elif not self.steps.discard(round_num):
+            with self.profiler.phase('remove_series_store'):
+                self.trainee.remove_series_store(str(round_num))
 
         logger.info(
-            'Round %s: score=%.0f high_score=%.0f avg_score=%.0f',
-            round_num, score, np.max(scores), avg_score
+            'Round %s: score=%.0f high_score=%.0f avg_score=%.0f cases=%d react_latency=%.2fms',
+            round_num, score, scores.max, avg_score, self.num_cases, 1000 * self.pop_react_latency()
         )
 
         # Reset for next game
         self.last_observation = [None, None, None, None]
         self.last_push_direction = None
-
-    def output_explanations(self, react) -> None:
-        """
-        Log react explanations based on explanation_level.
-
-        Parameters
-        ----------
-        react : dict
-            A react response.
-        """
-        if self.explanation_level >= 2:
-            # Get influential cases
-            influential_cases_data = react['explanation']['influential_cases']
-            if influential_cases_data is not None:
-                influential_cases_list = influential_cases_data[0]
-                influential_cases = pd.DataFrame(influential_cases_list)
-                logger.info("Most influential cases: \n%s", influential_cases)
-
-        if self.explanation_level >= 3:
-            # Get boundary cases
-            boundary_cases_data = react['explanation']['boundary_cases']
-            if boundary_cases_data is not None:
-                boundary_cases_list = boundary_cases_data[0]
-                boundary_cases = pd.DataFrame(boundary_cases_list)
-                logger.info("Boundary cases: \n%s", boundary_cases)
-
-            # Get mean decrease in accuracy
-            ac_data = react['explanation']['feature_full_accuracy_contributions'][0]
-            if ac_data is not None:
-                for feature in ac_data:
-                    logger.info(
-                        "Removing feature '%s' reduces accuracy of best action by: %s",
-                        feature, ac_data[feature])
-
-            # Get residuals
-            residuals_data = react['explanation']['feature_full_residuals_for_case'][0]
-            if residuals_data is not None:
-                for feature in residuals_data:
-                    logger.info(
-                        "Feature %s has a residual of: %s",
-                        feature, residuals_data[feature])
-
-            residuals_data = react['explanation']['feature_full_residuals'][0]
-            if residuals_data is not None:
-                for feature in residuals_data:
-                    logger.info(
-                        "Feature %s has a residual of: %s",
-                        feature, residuals_data[feature])
@@ -0,0 +1,70 @@
+import gymnasium as gym
+from gymnasium.envs.classic_control import cartpole
+from gymnasium.vector import AutoresetMode
+import numpy as np
+
+
+class CartPoleVectorEnv(cartpole.CartPoleVectorEnv):
+    """
+    Gymnasium's NumPy cart pole vector environment, reset within the same step.
+
+    Gymnasium's environment resets the games which ended on the step after
+    they end, which the games' loops do not expect. Instead, games which end
+    are reset within the same step, as ``gym.make_vec`` does with the
+    ``SAME_STEP`` autoreset mode, and their final observations are returned
+    in ``info["final_obs"]``, marked by ``info["_final_obs"]``. Actions are
+    not checked against the action space every step.
+
+    Every environment draws its starting state from a single random number
+    generator, so the rounds played from a seed differ from those of
+    ``CartPole-v1`` environments seeded one at a time.
+    """
+
+    metadata = {**cartpole.CartPoleVectorEnv.metadata, "autoreset_mode": AutoresetMode.SAME_STEP}
+
+    def step(self, actions):
+        if self.state is None:
+            raise gym.error.ResetNeeded("Call reset before using step method.")
+
+        x, x_dot, theta, theta_dot = self.state
+        force = np.where(np.asarray(actions) == 1, self.force_mag, -self.force_mag)
+        costheta = np.cos(theta)
+        sintheta = np.sin(theta)
+
+        temp = (force + self.polemass_length * np.square(theta_dot) * sintheta) / self.total_mass
+        thetaacc = (self.gravity * sintheta - costheta * temp) / (
+            self.length * (4.0 / 3.0 - self.masspole * np.square(costheta) / self.total_mass)
+        )
+        xacc = temp - self.polemass_length * thetaacc * costheta / self.total_mass
+
+        # Euler integration, as CartPole-v1
+        self.state = np.stack((
+            x + self.tau * x_dot,
+            x_dot + self.tau * xacc,
+            theta + self.tau * theta_dot,
+            theta_dot + self.tau * thetaacc,
+        ))
+        x, theta = self.state[0], self.state[2]
+
+        terminated = (
+            (x < -self.x_threshold)
+            | (x > self.x_threshold)
+            | (theta < -self.theta_threshold_radians)
+            | (theta > self.theta_threshold_radians)
+        )
+        self.steps += 1
+        truncated = self.steps >= self.max_episode_steps
+
+        if self._sutton_barto_reward:
+            rewards = -terminated.astype(np.float64)
+        else:
+            rewards = np.ones(self.num_envs)
+
+        info = {}
+        done = terminated | truncated
+        if done.any():
+            info = {"final_obs": self.state.T.astype(np.float32), "_final_obs": done}
+            self.state[:, done] = self.np_random.uniform(low=self.low, high=self.high, size=(4, done.sum()))
+            self.steps[done] = 0
+
+        return self.state.T.astype(np.float32), rewards, terminated, truncated, info
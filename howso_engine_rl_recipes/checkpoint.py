@@ -0,0 +1,119 @@
+import json
+import logging
+from pathlib import Path
+import shutil
+import typing as t
+
+import numpy as np
+
+from .common.game import GameResult
+from .results import JsonlResultSink, read_jsonl_results, ResultSink
+
+logger = logging.getLogger('howso.rl.examples')
+
+
+class SimulationCheckpoint(ResultSink):
+    """
+    Checkpoint of a simulation's progress, stored in a directory.
+
+    The directory holds the simulation's options and seeds, the result of
+    every finished iteration and a subdirectory per unfinished iteration
+    which its game checkpoints its progress to. Running a simulation again
+    with the same options skips the finished iterations and resumes the
+    unfinished ones.
+
+    Parameters
+    ----------
+    directory : str
+        The checkpoint directory. It is created if it does not exist.
+    iterations : int
+        The number of iterations of the simulation.
+    options : dict
+        The game options of the simulation.
+    seeds : list of int, optional
+        The seed of each iteration. When not specified, each iteration uses
+        the `seed` option or a random seed, and the seeds of iterations
+        already in the checkpoint are kept.
+
+    Raises
+    ------
+    ValueError
+        When the directory holds the checkpoint of a simulation with
+        different options or seeds.
+    """
+
+    ignored_options = ('checkpoint_every', 'result_cache', 'trainee_pool')
+    """Options which may change when a simulation is resumed."""
+
+    def __init__(
+        self,
+        directory: str,
+        iterations: int,
+        options: t.Mapping[str, t.Any],
+        *,
+        seeds: t.Optional[t.Sequence[int]] = None
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        options = json.loads(json.dumps(
+            {k: v for k, v in options.items() if k not in self.ignored_options},
+            sort_keys=True, default=str
+        ))
+
+        manifest_path = self.directory / 'simulation.json'
+        manifest = {'options': options, 'seeds': []}
+        if manifest_path.is_file():
+            with open(manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest['options'] != options:
+                raise ValueError(f'Checkpoint "{directory}" was created by a simulation with different options')
+
+        if seeds is None and 'seed' in options:
+            self.seeds = None
+        else:
+            # Seeds are kept in the checkpoint so resumed iterations replay
+            # the same games, even when they were drawn at random
+            self.seeds = manifest['seeds'][:iterations]
+            if seeds is not None and [int(seed) for seed in seeds[:len(self.seeds)]] != self.seeds:
+                raise ValueError(f'Checkpoint "{directory}" was created by a simulation with different seeds')
+            for i in range(len(self.seeds), iterations):
+                self.seeds.append(seeds[i] if seeds is not None else (1 + i) * int(100000 * np.random.rand()))
+        with open(manifest_path, 'w') as manifest_file:
+            json.dump({'options': options, 'seeds': self.seeds or []}, manifest_file, indent=4)
+
+        results_path = self.directory / 'results.jsonl'
+        self.completed: t.Dict[int, GameResult] = {}
+        if results_path.is_file():
+            self.completed = {
+                iteration: result
+                for iteration, result in read_jsonl_results(results_path).items()
+                if iteration < iterations
+            }
+            logger.info('Skipping %d iterations completed in checkpoint %s', len(self.completed), directory)
+        self._sink = JsonlResultSink(results_path)
+
+    def iteration_dir(self, iteration: int) -> str:
+        """
+        Get the directory an iteration's game checkpoints its progress to.
+
+        Parameters
+        ----------
+        iteration : int
+            The simulation iteration.
+
+        Returns
+        -------
+        str
+            The game checkpoint directory.
+        """
+        return str(self.directory / f'iteration-{iteration}')
+
+    def write(self, iteration: int, result: GameResult) -> None:
+        """Record an iteration as finished and discard its game checkpoint."""
+        self._sink.write(iteration, result)
+        self.completed[int(iteration)] = result
+        shutil.rmtree(self.iteration_dir(iteration), ignore_errors=True)
+
+    def close(self) -> None:
+        """Close the results file."""
+        self._sink.close()
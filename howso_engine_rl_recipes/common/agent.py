@@ -1,7 +1,26 @@
 from abc import ABC, abstractmethod
+import logging
+import os
+from pathlib import Path
+import shutil
+import tempfile
+from time import perf_counter
 import typing as t
+import uuid
 
 import gymnasium as gym
+from howso import engine
+import numpy as np
+
+from .cache import ActionCache
+from .distilled import DistilledPolicy
+from .explanations import ExplanationRecorder
+from .profiler import PhaseProfiler
+from .scores import ScoreTracker
+from .trainee_pool import trainee_pool
+from .training import BackgroundTrainer, supports_background_training, TrainingBuffer
+
+logger = logging.getLogger('howso.rl.examples')
 
 ObsType = t.TypeVar("ObsType")
 ActType = t.TypeVar("ActType")
@@ -11,7 +30,8 @@ class BaseAgent(ABC, t.Generic[ObsType, ActType]):
     """
     Base class for game agents.
 
-    Defines interface for agents who play the game.
+    Defines interface for agents who play the game. Agents backed by a Howso
+    trainee keep it in their ``trainee`` attribute.
 
     Parameters
     ----------
@@ -21,29 +41,234 @@ class BaseAgent(ABC, t.Generic[ObsType, ActType]):
         The required threshold of rounds to solve the game.
     explanation_level : int
         The Howso react explanation level.
+    desired_conviction : float, optional
+        The desired conviction of the actions reacted to, higher values
+        explore less. Defaults to the agent's ``default_desired_conviction``.
+    explanation_sample_every : int, default 1
+        Explain one in every N reacts.
+    explanation_background : bool, default False
+        If explanations should be rendered in a background thread instead of
+        while acting.
+    explanation_output : str, optional
+        The JSON Lines file to write explanations to instead of logging them.
     seed: int, optional
         The agent seed.
+    action_cache : bool, default False
+        If the actions chosen for each observation should be cached and
+        reused instead of reacting again. Not all agents support caching.
+    cache_invalidate_every : int, default 1
+        The number of times the model may be trained before cached actions
+        are discarded.
+    cache_bin_widths : float or sequence of float, optional
+        The width of the bins observation components are quantized into to
+        build cache keys. Defaults to the agent's ``default_cache_bin_widths``.
+    cache_size : int, optional
+        The maximum number of cached actions, least recently used actions are
+        evicted first.
+    distilled_policy : bool, default False
+        If observations should be acted on by a nearest-neighbour policy
+        distilled from the trainee's reacts, only reacting to those the
+        policy is not confident in. Agents which do not support a distilled
+        policy raise ValueError.
+    distill_every : int, default 1
+        The number of times the model may be trained before the distilled
+        policy is distilled from the trainee again.
+    distill_neighbors : int, default 5
+        The number of nearest contexts which vote on the distilled action.
+    distill_min_agreement : float, default 0.8
+        The fraction of the nearest contexts which must agree on the
+        distilled action, otherwise the observation is reacted to.
+    distill_max_distance : float, optional
+        The largest distance to the nearest context, in standard deviations
+        of the context features, at which the distilled policy acts.
+    distill_samples : int, default 1000
+        The largest number of the contexts of the trainee's cases reacted to
+        when distilling the policy.
+    train_every_rounds : int, optional
+        The number of trained rounds whose cases are buffered client side
+        before they are trained in a single call.
+    train_every_cases : int, optional
+        The number of buffered cases which are trained even when fewer rounds
+        are buffered. When neither is specified, every round is trained.
+    background_training : bool, default False
+        If the trainee should be trained, and auto-analyzed, on a background
+        thread while play continues against the model as it was. Requires
+        the multi-threaded engine, training is synchronous otherwise.
+    max_pending_trains : int, default 1
+        The number of background train calls which may be outstanding while
+        play continues. Training another round waits until one finishes.
+    step_buffer : bool, default False
+        If the steps of each round should be recorded client side instead of
+        in the trainee's series store, so rounds which are not trained cost
+        no engine calls.
+    case_budget : int, optional
+        The maximum number of cases the trainee keeps. When training exceeds
+        it, cases are removed using ``case_budget_strategy``.
+    case_budget_strategy : {'lowest-score', 'reduce'}, default 'lowest-score'
+        How cases are removed when the case budget is exceeded.
+        'lowest-score' removes the cases with the lowest value of the agent's
+        first goal feature. 'reduce' uses the engine's data reduction, which
+        removes the cases that add the least information and accumulates
+        their weight into the cases kept. Data reduction suits continuous
+        observations, it does not finish on trainees of mostly identical
+        cases such as those of Wafer-Thin-Mint.
+    trainee_pool : bool, default True
+        If the trainee should be copied from an empty template kept by the
+        process, instead of created from scratch by every game.
+    profiler : PhaseProfiler, optional
+        The profiler to record the latency of engine calls with.
     """
 
+    default_cache_bin_widths: t.Optional[float | t.Sequence[float]] = None
+    """The default quantization of observations for the action cache."""
+
+    default_desired_conviction: float = 1
+    """The desired conviction of reacts when none is specified."""
+
+    supports_distilled_policy: bool = True
+    """If the agent's reacts only depend on its context features, so they can be distilled."""
+
+    case_budget_strategies = ('lowest-score', 'reduce')
+    """The strategies which may be used to keep the trainee within its case budget."""
+
     def __init__(
         self,
         env: gym.Env,
         win_threshold: int,
         *,
         explanation_level: int = 1,
+        desired_conviction: t.Optional[float] = None,
+        explanation_sample_every: int = 1,
+        explanation_background: bool = False,
+        explanation_output: t.Optional[str] = None,
         seed: t.Optional[int] = None,
+        action_cache: bool = False,
+        cache_invalidate_every: int = 1,
+        cache_bin_widths: t.Optional[float | t.Sequence[float]] = None,
+        cache_size: t.Optional[int] = None,
+        distilled_policy: bool = False,
+        distill_every: int = 1,
+        distill_neighbors: int = 5,
+        distill_min_agreement: float = 0.8,
+        distill_max_distance: t.Optional[float] = None,
+        distill_samples: int = 1000,
+        train_every_rounds: t.Optional[int] = None,
+        train_every_cases: t.Optional[int] = None,
+        background_training: bool = False,
+        max_pending_trains: int = 1,
+        step_buffer: bool = False,
+        case_budget: t.Optional[int] = None,
+        case_budget_strategy: str = 'lowest-score',
+        trainee_pool: bool = True,
+        profiler: t.Optional[PhaseProfiler] = None,
         **options: t.Dict
     ) -> None:
         self.env = env
         self.explanation_level = explanation_level
+        if desired_conviction is None:
+            desired_conviction = self.default_desired_conviction
+        self.desired_conviction = desired_conviction
+        self.explanations = ExplanationRecorder(
+            explanation_level,
+            sample_every=explanation_sample_every,
+            background=explanation_background,
+            output=explanation_output
+        )
         self.seed = seed
         self.win_threshold = win_threshold
         self.options = options
+        self.profiler = profiler or PhaseProfiler(enabled=False)
+        self.react_calls = 0
+        self.train_calls = 0
+        self.analyze_calls = 0
+        self._analyze_threshold = None
+        self.training_buffer = TrainingBuffer(train_every_rounds, train_every_cases)
+        self.step_buffer = step_buffer
+        # Decided before the first round, as it changes whether cases are recorded client side
+        if background_training and not supports_background_training():
+            logger.warning('Background training requires the multi-threaded engine, training synchronously')
+            background_training = False
+        self.background_training = background_training
+        self.max_pending_trains = max_pending_trains
+        self.background_trainer: t.Optional[BackgroundTrainer] = None
+        if case_budget_strategy not in self.case_budget_strategies:
+            raise ValueError(f'Unknown case budget strategy "{case_budget_strategy}"')
+        self.case_budget = case_budget
+        self.case_budget_strategy = case_budget_strategy
+        self.trainee_pool = trainee_pool
+        self.num_cases = 0
+        self.cases_removed = 0
+        self.case_reductions = 0
+        self._round_react_seconds = 0.0
+        self._round_reacts = 0
+        self.action_cache: t.Optional[ActionCache[ActType]] = None
+        if action_cache:
+            if cache_bin_widths is None:
+                cache_bin_widths = self.default_cache_bin_widths
+            self.action_cache = ActionCache(
+                invalidate_every=cache_invalidate_every,
+                bin_widths=cache_bin_widths,
+                max_size=cache_size
+            )
+        self.distilled: t.Optional[DistilledPolicy] = None
+        if distilled_policy:
+            if not self.supports_distilled_policy:
+                raise ValueError(f'{type(self).__name__} does not support a distilled policy')
+            self.distilled = DistilledPolicy(
+                distill_every,
+                neighbors=distill_neighbors,
+                min_agreement=distill_min_agreement,
+                max_distance=distill_max_distance,
+                max_samples=distill_samples,
+                seed=seed
+            )
+
+    @property
+    def records_cases(self) -> bool:
+        """
+        If the cases of each round are recorded client side.
+
+        Otherwise, they are recorded in the trainee's series store. Cached
+        and distilled actions are not reacted to, buffered rounds are trained
+        together and rounds trained in the background are trained while the
+        next rounds play, so none can use the series store.
+        """
+        return (
+            self.step_buffer or self.action_cache is not None or self.distilled is not None or
+            self.training_buffer.enabled or self.background_training
+        )
 
     @abstractmethod
     def setup(self) -> None:
         """Setup the agent."""
 
+    def create_trainee(self, features: t.Mapping[str, t.Mapping], **auto_analyze_params) -> engine.Trainee:
+        """
+        Create the agent's empty trainee, seeded with the agent's seed.
+
+        Parameters
+        ----------
+        features : dict
+            The trainee's feature attributes.
+        **auto_analyze_params
+            The trainee's auto-analyze parameters.
+
+        Returns
+        -------
+        Trainee
+            The trainee, which the agent deletes once done.
+        """
+        if self.trainee_pool:
+            trainee = trainee_pool.acquire(features, **auto_analyze_params)
+            # Copies would otherwise share the random state of their template
+            trainee.set_random_seed(self.seed if self.seed is not None else uuid.uuid4().hex)
+            return trainee
+        trainee = engine.Trainee(features=features)
+        trainee.set_auto_analyze_params(**auto_analyze_params)
+        if self.seed is not None:
+            trainee.set_random_seed(self.seed)
+        return trainee
+
     @abstractmethod
     def done(self, won: bool = False) -> None:
         """
@@ -75,11 +300,44 @@ class BaseAgent(ABC, t.Generic[ObsType, ActType]):
             The action to take in the game.
         """
 
+    def act_batch(
+        self,
+        observations: t.Sequence[ObsType],
+        round_nums: t.Sequence[int],
+        steps: t.Sequence[int]
+    ) -> t.List[ActType]:
+        """
+        React to a batch of observations to get their actions.
+
+        Used when several rounds are played in lockstep, one per environment
+        of a vectorized game. Each observation belongs to a different round.
+        The default implementation calls :meth:`act` once per observation,
+        agents should override it to react to all observations at once.
+
+        Parameters
+        ----------
+        observations : sequence of ObsType
+            The observation of the current step of each round.
+        round_nums : sequence of int
+            The game round of each observation.
+        steps : sequence of int
+            The current step of each observation's round.
+
+        Returns
+        -------
+        list of ActType
+            The actions to take in the game, one per observation.
+        """
+        return [
+            self.act(observation, int(round_num), int(step))
+            for observation, round_num, step in zip(observations, round_nums, steps)
+        ]
+
     @abstractmethod
     def assign_reward(
         self,
         observation: ObsType,
-        scores: t.Iterable[float],
+        scores: ScoreTracker,
         round_num: int,
         step: int
     ) -> None:
@@ -90,10 +348,380 @@ class BaseAgent(ABC, t.Generic[ObsType, ActType]):
         ----------
         observation : ObsType
             The observation from the final step.
-        scores : list of float
-            The final scores from all rounds.
+        scores : ScoreTracker
+            The final scores from all rounds. Its window is the agent's
+            ``win_threshold`` rounds.
         round_num : int
             The current game round.
         step : int
             The game round's current step.
         """
+
+    def react(self, **kwargs) -> t.Dict[str, t.Any]:
+        """
+        React with the trainee, counting and timing the react.
+
+        Parameters
+        ----------
+        **kwargs
+            The parameters passed to the trainee's react.
+
+        Returns
+        -------
+        dict
+            The react response.
+        """
+        if self.background_trainer is not None:
+            self._collect_background_training()
+        self.react_calls += 1
+        start = perf_counter()
+        with self.profiler.phase('react'):
+            react = self.trainee.react(**kwargs)
+        self._round_react_seconds += perf_counter() - start
+        self._round_reacts += 1
+        return react
+
+    def pop_react_latency(self) -> float:
+        """
+        Get the average latency of the reacts since the last call, in seconds.
+
+        Returns
+        -------
+        float
+            The average react latency, or NaN when there were no reacts.
+        """
+        latency = self._round_react_seconds / self._round_reacts if self._round_reacts else float('nan')
+        self._round_react_seconds = 0.0
+        self._round_reacts = 0
+        return latency
+
+    def train(self, cases: t.List[t.List[t.Any]], features: t.List[str], **kwargs) -> None:
+        """
+        Train cases into the trainee, counting the train and auto-analysis.
+
+        Cases are removed afterwards if the trainee exceeds its case budget.
+        With background training, the cases are trained on the background
+        thread and this returns once it accepted them.
+
+        Parameters
+        ----------
+        cases : list of list
+            The cases to train.
+        features : list of str
+            The features of the cases.
+        **kwargs
+            Additional parameters passed to the trainee's train.
+        """
+        if self.background_training and self.background_trainer is None:
+            self.background_trainer = BackgroundTrainer(self.max_pending_trains)
+        if self.background_trainer is None:
+            self._apply_train(self._train(cases, features, **kwargs))
+            self._model_updated()
+        else:
+            self._collect_background_training()
+            self.background_trainer.submit(self._train, cases, features, **kwargs)
+
+    def _train(
+        self,
+        cases: t.List[t.List[t.Any]],
+        features: t.List[str],
+        **kwargs
+    ) -> t.Tuple[float, int, bool]:
+        """
+        Train cases into the trainee, which may run on the background thread.
+
+        Only engine calls are made here, the agent's state is updated with the
+        result by :meth:`_apply_train` on the thread which plays.
+
+        Returns
+        -------
+        tuple of (float, int, bool)
+            The seconds spent training, the number of cases trained into the
+            trainee and if training triggered an auto-analysis.
+        """
+        if self._analyze_threshold is None:
+            self._analyze_threshold = self.trainee.get_params()['analyze_threshold']
+        start = perf_counter()
+        self.trainee.train(cases, features=features, **kwargs)
+        seconds = perf_counter() - start
+        num_cases = self.trainee.get_num_training_cases()
+        # The trainee raises its analyze threshold each time it auto-analyzes
+        analyze_threshold = self.trainee.get_params()['analyze_threshold']
+        analyzed = analyze_threshold != self._analyze_threshold
+        self._analyze_threshold = analyze_threshold
+        return seconds, num_cases, analyzed
+
+    def _apply_train(self, result: t.Tuple[float, int, bool]) -> None:
+        """Count a finished train call on the thread which plays."""
+        seconds, num_cases, analyzed = result
+        self.profiler.record('train', seconds)
+        self.train_calls += 1
+        self.analyze_calls += analyzed
+        self.num_cases = num_cases
+
+    def _model_updated(self) -> None:
+        """Enforce the case budget once train calls finished, then invalidate what was derived from the model."""
+        if self.case_budget is not None and self.num_cases > self.case_budget:
+            if self.background_trainer is not None:
+                # Cases are only removed once no train call is outstanding
+                self.background_trainer.wait()
+                for result in self.background_trainer.collect():
+                    self._apply_train(result)
+            self.enforce_case_budget()
+        self._model_trained()
+
+    def _model_trained(self) -> None:
+        """Invalidate what was derived from the model before it was trained."""
+        if self.action_cache is not None:
+            self.action_cache.model_trained()
+        if self.distilled is not None:
+            self.distilled.model_trained()
+
+    def _collect_background_training(self) -> None:
+        """Apply the train calls the background thread finished to the state kept by play."""
+        results = self.background_trainer.collect()
+        for result in results:
+            self._apply_train(result)
+        if results:
+            self._model_updated()
+
+    def distilled_actions(
+        self,
+        contexts: t.Sequence[t.Sequence[float]],
+        **react_params
+    ) -> t.List[t.Optional[ActType]]:
+        """
+        Act on observations with the distilled policy, distilling it again if stale.
+
+        Parameters
+        ----------
+        contexts : list of list of float
+            The context features of each observation.
+        **react_params
+            The parameters the agent reacts with, such as its goal features
+            map and desired conviction.
+
+        Returns
+        -------
+        list
+            The action of each observation, or None when it should be
+            reacted to.
+        """
+        if self.distilled.stale:
+            with self.profiler.phase('distill'):
+                cases = self.trainee.get_cases(features=self.context_features)
+                samples = self.distilled.sample(
+                    cases.to_numpy(dtype=float).reshape(len(cases), len(self.context_features)))
+                actions = np.empty(0)
+                if len(samples):
+                    # The policy learns the actions the trainee chooses to meet
+                    # its goal, not the actions of every case trained
+                    react = self.react(
+                        contexts=samples.tolist(),
+                        context_features=self.context_features,
+                        action_features=self.action_features,
+                        num_cases_to_generate=len(samples),
+                        **react_params
+                    )
+                    actions = react['action'][self.action_features[0]].to_numpy()
+                self.distilled.fit(samples, actions)
+        with self.profiler.phase('distilled_act'):
+            actions, confident = self.distilled.predict(contexts)
+        return [action.item() if is_confident else None for action, is_confident in zip(actions, confident)]
+
+    def enforce_case_budget(self) -> None:
+        """Remove cases from the trainee until it is within its case budget."""
+        num_cases = self.num_cases
+        with self.profiler.phase('case_budget'):
+            if self.case_budget_strategy == 'reduce':
+                # Data reduction never reduces below the ablation's minimum
+                # number of cases, so it is kept at half the budget
+                self.trainee.set_auto_ablation_params(
+                    min_num_cases=self.case_budget // 2,
+                    reduce_max_cases=self.case_budget
+                )
+                # Reducing with hyperparameters analyzed before the latest
+                # cases were trained can fail to converge
+                self.trainee.analyze()
+                self.analyze_calls += 1
+                self.trainee.reduce_data(reduce_max_cases=self.case_budget)
+                self.num_cases = self.trainee.get_num_training_cases()
+            if self.num_cases > self.case_budget:
+                self._remove_lowest_score_cases(self.num_cases - self.case_budget)
+                self.num_cases = self.trainee.get_num_training_cases()
+        self.case_reductions += 1
+        self.cases_removed += num_cases - self.num_cases
+        logger.debug('Removed %d cases to keep within the case budget of %d',
+                     num_cases - self.num_cases, self.case_budget)
+
+    def _remove_lowest_score_cases(self, num_cases: int) -> None:
+        goal_feature = self.goal_features[0]
+        scores = self.trainee.get_cases(features=[goal_feature])[goal_feature].to_numpy(dtype=float)
+        threshold = np.partition(scores, num_cases - 1)[num_cases - 1]
+        self.trainee.remove_cases(
+            num_cases,
+            condition={goal_feature: [None, float(threshold)]},
+            precision='exact'
+        )
+
+    def train_round(self, cases: t.List[t.List[t.Any]], features: t.List[str]) -> None:
+        """
+        Train the cases of a round, once enough rounds are buffered.
+
+        Parameters
+        ----------
+        cases : list of list
+            The cases of the round.
+        features : list of str
+            The features of the cases.
+        """
+        if self.training_buffer.add(cases, features):
+            self._train_buffered()
+
+    def flush_training(self) -> None:
+        """Train the cases of all buffered rounds, waiting for any training in the background."""
+        self._train_buffered()
+        self.wait_training()
+
+    def wait_training(self) -> None:
+        """Wait for any training in the background, leaving buffered rounds untrained."""
+        if self.background_trainer is not None:
+            self.background_trainer.wait()
+            self._collect_background_training()
+
+    def _train_buffered(self) -> None:
+        if self.training_buffer.cases:
+            features = self.training_buffer.features
+            self.train(self.training_buffer.drain(), features)
+
+    def close_training(self) -> None:
+        """Wait for any training in the background and stop its thread."""
+        if self.background_trainer is not None:
+            self.background_trainer.close()
+            self._collect_background_training()
+
+    def get_metrics(self) -> t.Dict[str, t.Any]:
+        """
+        Get the agent's metrics to include in the game result.
+
+        Returns
+        -------
+        dict
+            The agent metrics.
+        """
+        metrics = {
+            'react_calls': self.react_calls,
+            'train_calls': self.train_calls,
+            'analyze_calls': self.analyze_calls,
+        }
+        if self.case_budget is not None:
+            metrics['cases_removed'] = self.cases_removed
+            metrics['case_reductions'] = self.case_reductions
+        if self.training_buffer.enabled:
+            metrics['train_staleness'] = self.training_buffer.staleness
+        if self.background_trainer is not None:
+            metrics['background_train_seconds'] = self.background_trainer.busy_seconds
+            metrics['background_wait_seconds'] = self.background_trainer.wait_seconds
+        if self.action_cache is not None:
+            metrics['action_cache_hits'] = self.action_cache.hits
+            metrics['action_cache_misses'] = self.action_cache.misses
+            metrics['action_cache_evictions'] = self.action_cache.evictions
+        if self.distilled is not None:
+            metrics['distilled_hits'] = self.distilled.hits
+            metrics['distilled_fallbacks'] = self.distilled.fallbacks
+            metrics['distilled_refreshes'] = self.distilled.refreshes
+        if self.explanations.enabled:
+            metrics['explanations'] = self.explanations.recorded
+            metrics['explanations_dropped'] = self.explanations.dropped
+        return metrics
+
+    def get_state(self) -> t.Dict[str, t.Any]:
+        """
+        Get the agent's client side state to include in a checkpoint.
+
+        Returns
+        -------
+        dict
+            The JSON serializable agent state.
+        """
+        return {}
+
+    def set_state(self, state: t.Mapping[str, t.Any]) -> None:
+        """
+        Restore the agent's client side state from a checkpoint.
+
+        Parameters
+        ----------
+        state : dict
+            The agent state returned by :meth:`get_state`.
+        """
+
+    def save_trainee(self, file_path: str) -> None:
+        """
+        Save the agent's trainee to a file, replacing it if it exists.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the ``.caml`` file to save to.
+        """
+        # Deleting a trainee also deletes the file it was last saved to, so
+        # it is saved under a temporary name which is then renamed. The
+        # engine resolves relative paths against the client's scratch
+        # directory rather than the working directory.
+        file_path = Path(file_path).resolve()
+        temp_path = file_path.with_name(f'{uuid.uuid4().hex}.caml')
+        self.trainee.save(str(temp_path))
+        os.replace(temp_path, file_path)
+
+    def load_trainee(self, file_path: str) -> None:
+        """
+        Replace the agent's trainee with a trainee saved to a file.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the ``.caml`` file to load.
+
+        Raises
+        ------
+        ValueError
+            When the trainee does not have the agent's features.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            # Deleting a loaded trainee also deletes the file it was loaded
+            # from, so a uniquely named copy is loaded instead
+            copy_path = Path(directory, f'{uuid.uuid4().hex}.caml')
+            shutil.copyfile(file_path, copy_path)
+            trainee = engine.load_trainee(str(copy_path))
+        missing = set(getattr(self, 'features', ())) - set(trainee.features)
+        if missing:
+            trainee.delete()
+            raise ValueError(f'Trainee "{file_path}" is missing the features: {", ".join(sorted(missing))}')
+        if self.seed is not None:
+            trainee.set_random_seed(self.seed)
+        self.trainee.delete()
+        self.trainee = trainee
+        self.num_cases = trainee.get_num_training_cases()
+
+    def get_react_details(self) -> t.Dict[str, t.Any]:
+        """
+        Get the react details to request based on explanation_level.
+
+        Returns
+        -------
+        dict
+            The react details.
+        """
+        details = {}
+        if self.explanation_level >= 2:
+            details['influential_cases'] = True
+
+        if self.explanation_level >= 3:
+            details['feature_full_accuracy_contributions'] = True
+            details['feature_full_residuals'] = True
+            details['feature_full_residuals_for_case'] = True
+            details['boundary_cases'] = True
+            details['num_boundary_cases'] = 3
+
+        return details
@@ -0,0 +1,134 @@
+from collections import OrderedDict
+import typing as t
+
+import numpy as np
+
+ActType = t.TypeVar("ActType")
+
+
+class ActionCache(t.Generic[ActType]):
+    """
+    Cache of the actions chosen by an agent, keyed by observation.
+
+    Cached actions are only valid for the version of the model they were
+    reacted with, so the cache is cleared whenever the model has been trained
+    ``invalidate_every`` times since it was last cleared.
+
+    Continuous observations are quantized into bins so that nearly identical
+    observations share an action. When the cache is full, the least recently
+    used action is evicted.
+
+    Parameters
+    ----------
+    invalidate_every : int, default 1
+        The number of times the model may be trained before the cache is
+        cleared.
+    bin_widths : float or sequence of float, optional
+        The width of the bins each observation component is quantized into.
+        A single width applies to all components. When not specified,
+        observations must match exactly.
+    max_size : int, optional
+        The maximum number of cached actions. Unbounded when not specified.
+    """
+
+    def __init__(
+        self,
+        invalidate_every: int = 1,
+        *,
+        bin_widths: t.Optional[float | t.Sequence[float]] = None,
+        max_size: t.Optional[int] = None
+    ) -> None:
+        self.invalidate_every = max(1, invalidate_every)
+        self.bin_widths = None if bin_widths is None else np.asarray(bin_widths, dtype=float)
+        self.max_size = max_size
+        self.model_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._trains = 0
+        self._actions: OrderedDict[t.Hashable, ActType] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    def key(self, observation: t.Any) -> t.Hashable:
+        """
+        Get the cache key of an observation.
+
+        Parameters
+        ----------
+        observation : Any
+            A game observation.
+
+        Returns
+        -------
+        Hashable
+            The cache key.
+        """
+        if self.bin_widths is not None:
+            bins = np.floor(np.asarray(observation, dtype=float) / self.bin_widths)
+            return tuple(bins.astype(int).ravel().tolist())
+        if hasattr(observation, 'tolist'):
+            observation = observation.tolist()
+        if isinstance(observation, list):
+            return tuple(observation)
+        return observation
+
+    def get(self, observation: t.Any) -> t.Optional[ActType]:
+        """
+        Get the cached action of an observation.
+
+        Parameters
+        ----------
+        observation : Any
+            A game observation.
+
+        Returns
+        -------
+        ActType or None
+            The cached action, or None when the observation is not cached.
+        """
+        key = self.key(observation)
+        action = self._actions.get(key)
+        if action is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._actions.move_to_end(key)
+        return action
+
+    def put(self, observation: t.Any, action: ActType) -> None:
+        """
+        Cache the action chosen for an observation.
+
+        Parameters
+        ----------
+        observation : Any
+            A game observation.
+        action : ActType
+            The action chosen for the observation.
+        """
+        key = self.key(observation)
+        self._actions[key] = action
+        self._actions.move_to_end(key)
+        if self.max_size is not None and len(self._actions) > self.max_size:
+            self._actions.popitem(last=False)
+            self.evictions += 1
+
+    def model_trained(self) -> None:
+        """Record that the model was trained, clearing the cache if due."""
+        self._trains += 1
+        if self._trains >= self.invalidate_every:
+            self.clear()
+
+    def clear(self) -> None:
+        """Clear all cached actions."""
+        self._actions.clear()
+        self._trains = 0
+        self.model_version += 1
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups that were served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,181 @@
+import typing as t
+
+import numpy as np
+
+
+class DistilledPolicy:
+    """
+    Nearest-neighbour policy distilled from the reacts of an agent's trainee.
+
+    The trainee is reacted to once, in a single batch, at a sample of the
+    contexts of its cases, with the goal and desired conviction the agent
+    acts with. Those contexts and the actions chosen for them are kept in
+    NumPy arrays, and an observation is given the action chosen for most of
+    its nearest contexts, without a react. The actions of the cases
+    themselves are not used, since they include those of rounds which were
+    lost, while the trainee's reacts favour the actions of the cases which
+    best meet the goal.
+
+    Context features are scaled by their standard deviation so each
+    contributes equally to the distance. Observations are left to react
+    when the policy is not confident in them: when they lie outside the
+    range of the distilled contexts, when their nearest context is further
+    than ``max_distance``, or when fewer than ``min_agreement`` of their
+    neighbours agree on the action.
+
+    The policy is distilled from the version of the model it was exported
+    from, so it goes stale once the model has been trained
+    ``refresh_every`` times since, and is exported again before its next
+    use.
+
+    Parameters
+    ----------
+    refresh_every : int, default 1
+        The number of times the model may be trained before the policy is
+        exported again.
+    neighbors : int, default 5
+        The number of nearest contexts which vote on the action.
+    min_agreement : float, default 0.8
+        The fraction of the neighbours which must agree on the action.
+    max_distance : float, optional
+        The largest scaled distance to the nearest context at which the
+        policy acts. Unbounded when not specified.
+    max_samples : int, default 1000
+        The largest number of contexts the policy is distilled at.
+    seed : int, optional
+        The seed of the sample of contexts.
+    """
+
+    def __init__(
+        self,
+        refresh_every: int = 1,
+        *,
+        neighbors: int = 5,
+        min_agreement: float = 0.8,
+        max_distance: t.Optional[float] = None,
+        max_samples: int = 1000,
+        seed: t.Optional[int] = None
+    ) -> None:
+        self.refresh_every = max(1, refresh_every)
+        self.neighbors = max(1, neighbors)
+        self.min_agreement = min_agreement
+        self.max_distance = max_distance
+        self.max_samples = max(1, max_samples)
+        self._rng = np.random.default_rng(seed)
+        self.hits = 0
+        self.fallbacks = 0
+        self.refreshes = 0
+        self.stale = True
+        self._trains = 0
+        self._contexts = np.empty((0, 0))
+        self._norms = np.empty(0)
+        self._actions = np.empty(0)
+        self._scale = np.ones(0)
+        self._low = np.empty(0)
+        self._high = np.empty(0)
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    def sample(self, contexts: t.Any) -> np.ndarray:
+        """
+        Choose the contexts to distill the policy at.
+
+        Parameters
+        ----------
+        contexts : array-like of shape (n_cases, n_features)
+            The numeric context features of the model's cases.
+
+        Returns
+        -------
+        ndarray
+            At most ``max_samples`` of the contexts, in their original order.
+        """
+        contexts = _as_matrix(contexts)
+        if len(contexts) > self.max_samples:
+            contexts = contexts[np.sort(self._rng.choice(len(contexts), self.max_samples, replace=False))]
+        return contexts
+
+    def fit(self, contexts: t.Any, actions: t.Any) -> None:
+        """
+        Distill the policy from the actions the model chose.
+
+        Parameters
+        ----------
+        contexts : array-like of shape (n_samples, n_features)
+            The numeric context features reacted to.
+        actions : array-like of shape (n_samples,)
+            The action the model chose for each context.
+        """
+        contexts = _as_matrix(contexts)
+        scale = contexts.std(axis=0) if len(contexts) else np.ones(contexts.shape[1])
+        self._scale = np.where(scale > 0, scale, 1.0)
+        # Stored transposed with their squared norms, so distances are a single matrix product
+        scaled = contexts / self._scale
+        self._contexts = np.ascontiguousarray(scaled.T)
+        self._norms = np.square(scaled).sum(axis=1)
+        self._actions = np.asarray(actions)
+        self._low = contexts.min(axis=0, initial=np.inf)
+        self._high = contexts.max(axis=0, initial=-np.inf)
+        self._trains = 0
+        self.stale = False
+        self.refreshes += 1
+
+    def predict(self, observations: t.Any) -> t.Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the actions of a batch of observations.
+
+        Parameters
+        ----------
+        observations : array-like of shape (n_observations, n_features)
+            The numeric observations.
+
+        Returns
+        -------
+        actions : ndarray
+            The action of each observation, only meaningful where confident.
+        confident : ndarray of bool
+            If the policy is confident in each observation's action. The
+            other observations should be reacted to.
+        """
+        observations = _as_matrix(observations)
+        if len(self._actions) < self.neighbors:
+            self.fallbacks += len(observations)
+            return np.zeros(len(observations), dtype=self._actions.dtype), np.zeros(len(observations), dtype=bool)
+
+        scaled = observations / self._scale
+        distances = np.square(scaled).sum(axis=1)[:, np.newaxis] - 2 * scaled @ self._contexts + self._norms
+        nearest = np.argpartition(distances, self.neighbors - 1, axis=1)[:, :self.neighbors]
+        neighbor_actions = self._actions[nearest]
+        # The votes of each neighbour's action, the majority action has the most
+        votes = (neighbor_actions[:, :, np.newaxis] == neighbor_actions[:, np.newaxis, :]).sum(axis=2)
+        majority = votes.argmax(axis=1)
+        actions = neighbor_actions[np.arange(len(observations)), majority]
+
+        confident = (votes.max(axis=1) >= self.min_agreement * self.neighbors) & np.all(
+            (observations >= self._low) & (observations <= self._high), axis=1)
+        if self.max_distance is not None:
+            nearest_distance = np.sqrt(np.maximum(np.take_along_axis(distances, nearest, axis=1).min(axis=1), 0))
+            confident &= nearest_distance <= self.max_distance
+        hits = int(confident.sum())
+        self.hits += hits
+        self.fallbacks += len(observations) - hits
+        return actions, confident
+
+    def model_trained(self) -> None:
+        """Record that the model was trained, marking the policy stale if due."""
+        self._trains += 1
+        if self._trains >= self.refresh_every:
+            self.stale = True
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of observations the policy acted on without a react."""
+        lookups = self.hits + self.fallbacks
+        return self.hits / lookups if lookups else 0.0
+
+
+def _as_matrix(values: t.Any) -> np.ndarray:
+    """Get observations as a float matrix with a row per observation."""
+    values = np.asarray(values, dtype=float)
+    return values[:, np.newaxis] if values.ndim == 1 else values
@@ -0,0 +1,182 @@
+import json
+import logging
+import queue
+import threading
+import typing as t
+
+logger = logging.getLogger('howso.rl.examples.explanations')
+
+
+def get_case_explanation(details: t.Mapping[str, t.Any], index: int = 0) -> t.Dict[str, t.Any]:
+    """
+    Get the explanation of a single reacted case from react details.
+
+    Parameters
+    ----------
+    details : dict
+        The details of a react response.
+    index : int, default 0
+        The index of the react context to get the explanation of.
+
+    Returns
+    -------
+    dict
+        The JSON serializable explanation. Cases are lists of records and
+        feature values are keyed by feature.
+    """
+    # Imported here, so games without explanations do not import pandas
+    import pandas as pd
+
+    explanation = {}
+    for key in ('influential_cases', 'boundary_cases'):
+        cases = details.get(key)
+        if cases is not None and cases[index] is not None:
+            explanation[key] = pd.DataFrame(cases[index]).to_dict(orient='records')
+    for key in ('feature_full_accuracy_contributions', 'feature_full_residuals_for_case', 'feature_full_residuals'):
+        values = details.get(key)
+        if values is not None:
+            explanation[key] = pd.DataFrame(values).iloc[index].to_dict()
+    return explanation
+
+
+def render_explanation(explanation: t.Mapping[str, t.Any]) -> None:
+    """
+    Log an explanation created by :func:`get_case_explanation`.
+
+    Parameters
+    ----------
+    explanation : dict
+        The explanation of a reacted case.
+    """
+    import pandas as pd
+
+    if 'influential_cases' in explanation:
+        logger.info("Most influential cases: \n%s", pd.DataFrame(explanation['influential_cases']))
+
+    if 'boundary_cases' in explanation:
+        logger.info("Boundary cases: \n%s", pd.DataFrame(explanation['boundary_cases']))
+
+    for feature, value in explanation.get('feature_full_accuracy_contributions', {}).items():
+        logger.info("Removing feature '%s' reduces accuracy of best action by: %s", feature, value)
+
+    for key in ('feature_full_residuals_for_case', 'feature_full_residuals'):
+        for feature, value in explanation.get(key, {}).items():
+            logger.info("Feature %s has a residual of: %s", feature, value)
+
+
+class ExplanationRecorder:
+    """
+    Records the explanations of reacts, optionally off the hot path.
+
+    Explanations are rendered to the log, or written as JSON Lines for
+    rendering later. In the background, explanations are queued for a
+    thread to render or write, and dropped when the queue is full instead of
+    blocking play.
+
+    Parameters
+    ----------
+    explanation_level : int
+        The Howso react explanation level. Explanations are only recorded
+        from level 2.
+    sample_every : int, default 1
+        Explain one in every N reacts.
+    background : bool, default False
+        If explanations should be rendered in a background thread.
+    output : str, optional
+        The JSON Lines file to append explanations to instead of logging
+        them. Explanations written to a file are always written in the
+        background.
+    queue_size : int, default 1000
+        The maximum number of explanations queued for the background thread.
+    """
+
+    def __init__(
+        self,
+        explanation_level: int,
+        *,
+        sample_every: int = 1,
+        background: bool = False,
+        output: t.Optional[str] = None,
+        queue_size: int = 1000
+    ) -> None:
+        self.enabled = explanation_level >= 2
+        self.sample_every = max(1, sample_every)
+        self.recorded = 0
+        self.dropped = 0
+        self._reacts = 0
+        self._file = None
+        self._queue = None
+        self._thread = None
+        if not self.enabled:
+            return
+        if output is not None:
+            # Line buffered so workers appending to the same file write whole lines
+            self._file = open(output, 'a', buffering=1)
+            background = True
+        if background:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._work, name='explanations', daemon=True)
+            self._thread.start()
+
+    def should_explain(self) -> bool:
+        """
+        Get if the next react should be explained, counting it as sampled.
+
+        Returns
+        -------
+        bool
+            True if the react should request and record explanations.
+        """
+        if not self.enabled:
+            return False
+        self._reacts += 1
+        return (self._reacts - 1) % self.sample_every == 0
+
+    def record(self, details: t.Mapping[str, t.Any], index: int = 0, **context) -> None:
+        """
+        Record the explanation of a reacted case.
+
+        Parameters
+        ----------
+        details : dict
+            The details of a react response.
+        index : int, default 0
+            The index of the react context to record the explanation of.
+        **context
+            Fields which identify the explanation, such as the round and step.
+        """
+        self.recorded += 1
+        if self._queue is None:
+            self._handle(details, index, context)
+            return
+        try:
+            self._queue.put_nowait((details, index, context))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Wait for queued explanations to be handled and stop the thread."""
+        if self._thread is not None:
+            self._queue.put((None, 0, {}))
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _handle(self, details, index, context) -> None:
+        explanation = get_case_explanation(details, index)
+        if self._file is not None:
+            self._file.write(json.dumps({**context, **explanation}, default=str) + '\n')
+        else:
+            render_explanation(explanation)
+
+    def _work(self) -> None:
+        while True:
+            details, index, context = self._queue.get()
+            if details is None:
+                break
+            try:
+                self._handle(details, index, context)
+            except Exception:
+                logger.exception('Failed to record explanation')
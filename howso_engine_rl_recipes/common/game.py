@@ -1,12 +1,22 @@
 from abc import ABC, abstractmethod
 from datetime import timedelta
+import json
+import logging
+import os
+from pathlib import Path
+from time import perf_counter
 import typing as t
 
 
 import gymnasium as gym
+from gymnasium.vector import AutoresetMode
 from typing_extensions import NotRequired
 
 from .agent import BaseAgent
+from .profiler import PhaseProfiler
+from .scores import ScoreTracker
+
+logger = logging.getLogger('howso.rl.examples')
 
 
 class GameResult(t.TypedDict):
@@ -15,9 +25,31 @@ class GameResult(t.TypedDict):
     rounds: int
     high_score: float
     total_cases: int
+    steps: int
+    react_calls: int
+    train_calls: int
+    analyze_calls: int
+    train_staleness: NotRequired[float]
+    background_train_seconds: NotRequired[float]
+    background_wait_seconds: NotRequired[float]
+    cases_removed: NotRequired[int]
+    case_reductions: NotRequired[int]
     duration: timedelta
     total_average_score: NotRequired[float]
     average_score: float
+    action_cache_hits: NotRequired[int]
+    action_cache_misses: NotRequired[int]
+    action_cache_evictions: NotRequired[int]
+    distilled_hits: NotRequired[int]
+    distilled_fallbacks: NotRequired[int]
+    distilled_refreshes: NotRequired[int]
+    explanations: NotRequired[int]
+    explanations_dropped: NotRequired[int]
+    profile: NotRequired[t.Dict[str, t.Dict[str, t.Any]]]
+    cached: NotRequired[bool]
+    peak_rss: NotRequired[int]
+    setup_duration: NotRequired[float]
+    teardown_duration: NotRequired[float]
 
 
 class BaseGame(ABC):
@@ -36,9 +68,44 @@ class BaseGame(ABC):
         The Gym render mode.
     seed : int
         The Gym and agent seed.
+    num_envs : int, default 1
+        The number of environments to play rounds in at once. When greater
+        than 1, the rounds of all environments are stepped in lockstep and
+        the agent reacts to all of their observations in a single batch.
+    vector_mode : {'sync', 'native'}, default 'sync'
+        How the environments are stepped when ``num_envs`` is greater than 1.
+        'sync' steps a Gym environment for each in turn, while 'native' steps
+        all of them at once with the game's NumPy vector environment, which
+        does not render.
+    profile : bool, default False
+        If the latency of each call in the phases of game play should be
+        recorded and included in the game result.
+    checkpoint_dir : str, optional
+        The directory the game's progress is checkpointed to. When it holds a
+        checkpoint of a previous, interrupted game, play resumes from it.
+        Only games played one round at a time are checkpointed.
+    checkpoint_every : int, default 10
+        The number of rounds played between checkpoints.
+    warm_start : str, optional
+        The path of a saved trainee the agent starts from instead of an empty
+        trainee.
+    save_winner : str, optional
+        The path to save the agent's trainee to when the game is won, such
+        as to warm start later games from. It is replaced by each game won.
+    agent_options : dict
+        Additional options passed to the agent.
     """
 
     game_id = None
+    native_game_id: t.Optional[str] = None
+    """The registered game whose vector entry point steps every environment as NumPy arrays."""
+    agent_registry: t.Mapping[str, t.Type[BaseAgent]] = {}
+
+    score_window = 1
+    """The number of most recent rounds the windowed score statistics are of."""
+
+    on_agent_ready: t.Optional[t.Callable[[], None]] = None
+    """Called once the agent is setup and play is about to start."""
 
     def __init__(
         self,
@@ -47,13 +114,33 @@ class BaseGame(ABC):
         explanation_level: int = 1,
         max_rounds: int = 1000,
         render_mode: t.Optional[str] = None,
-        seed: t.Optional[int] = None
+        seed: t.Optional[int] = None,
+        num_envs: int = 1,
+        vector_mode: str = 'sync',
+        profile: bool = False,
+        checkpoint_dir: t.Optional[str] = None,
+        checkpoint_every: int = 10,
+        warm_start: t.Optional[str] = None,
+        save_winner: t.Optional[str] = None,
+        **agent_options
     ) -> None:
         self.seed = seed
         self.max_rounds = max_rounds
         self.explanation_level = explanation_level
+        self.num_envs = max(1, num_envs)
         self.env = gym.make(self.game_id, render_mode=render_mode)
+        self.vector_env = None
+        if self.num_envs > 1:
+            self.vector_env = self.make_vector_env(vector_mode, render_mode)
         self.agent_class = agent
+        self.agent_options = agent_options
+        self.profiler = PhaseProfiler(enabled=profile)
+        self.checkpoint_dir = None if checkpoint_dir is None else Path(checkpoint_dir)
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.warm_start = warm_start
+        self.save_winner = save_winner
+        self.setup_duration = None
+        self.teardown_duration = None
         if seed is not None:
             self.env.action_space.seed(seed)
 
@@ -66,7 +153,225 @@ class BaseGame(ABC):
     def close(self) -> None:
         """Close the game and cleanup."""
         self.env.close()
+        if self.vector_env is not None:
+            self.vector_env.close()
+
+    def make_vector_env(self, vector_mode: str, render_mode: t.Optional[str] = None) -> gym.vector.VectorEnv:
+        """
+        Create the environments rounds are played in at once.
+
+        Either way, finished environments are reset within the same step, so
+        every observation returned is the start of an active round.
+
+        Parameters
+        ----------
+        vector_mode : {'sync', 'native'}
+            If a Gym environment is stepped for each environment in turn, or
+            all are stepped at once by the game's native vector environment.
+        render_mode : str, optional
+            The Gym render mode.
+
+        Returns
+        -------
+        VectorEnv
+            The vector environment of ``num_envs`` environments.
+        """
+        if vector_mode == 'sync':
+            return gym.make_vec(
+                self.game_id,
+                num_envs=self.num_envs,
+                vectorization_mode='sync',
+                vector_kwargs={'autoreset_mode': AutoresetMode.SAME_STEP},
+                render_mode=render_mode,
+            )
+        if vector_mode != 'native':
+            raise ValueError(f'Invalid vector mode "{vector_mode}". Allowed modes include: [sync, native]')
+        if self.native_game_id is None:
+            raise ValueError(f'{type(self).__name__} has no native vector environment')
+        if render_mode is not None:
+            raise ValueError('Native vector environments do not support rendering')
+        return gym.make_vec(self.native_game_id, num_envs=self.num_envs, vectorization_mode='vector_entry_point')
+
+    def create_score_tracker(self, state: t.Optional[t.Mapping[str, t.Any]] = None) -> ScoreTracker:
+        """
+        Create the tracker of the final score of each round.
+
+        Parameters
+        ----------
+        state : dict, optional
+            The tracker state to restore from a checkpoint.
+
+        Returns
+        -------
+        ScoreTracker
+            The score tracker.
+        """
+        if state is not None:
+            return ScoreTracker.from_state(self.score_window, state)
+        return ScoreTracker(self.score_window)
+
+    def create_agent(self) -> BaseAgent:
+        """Create and setup the agent that will play the game, timing it separately from play."""
+        started = perf_counter()
+        agent = self.agent_class(
+            env=self.env,
+            explanation_level=self.explanation_level,
+            seed=self.seed,
+            win_threshold=self.win_threshold,
+            profiler=self.profiler,
+            **self.agent_options
+        )
+        with self.profiler.phase('agent_setup'):
+            agent.setup()
+            if self.warm_start is not None:
+                agent.load_trainee(self.warm_start)
+        self.setup_duration = perf_counter() - started
+        if self.on_agent_ready is not None:
+            self.on_agent_ready()
+        return agent
+
+    def finish_agent(self, agent: BaseAgent, won: bool) -> None:
+        """
+        Close the agent once the game is over, timing it separately from play.
+
+        Parameters
+        ----------
+        agent : BaseAgent
+            The agent which played the game.
+        won : bool
+            If the game was won.
+        """
+        agent.flush_training()
+        started = perf_counter()
+        if won and self.save_winner is not None:
+            agent.save_trainee(self.save_winner)
+            logger.info('Saved winning trainee to %s', self.save_winner)
+        with self.profiler.phase('agent_done'):
+            agent.done(won)
+        agent.explanations.close()
+        agent.close_training()
+        self.teardown_duration = perf_counter() - started
+
+    def get_metrics(self, agent: BaseAgent) -> t.Dict[str, t.Any]:
+        """
+        Get the metrics of the agent and game to include in the game result.
+
+        Parameters
+        ----------
+        agent : BaseAgent
+            The agent which played the game.
+
+        Returns
+        -------
+        dict
+            The game metrics.
+        """
+        metrics = agent.get_metrics()
+        if self.setup_duration is not None:
+            metrics['setup_duration'] = self.setup_duration
+        if self.teardown_duration is not None:
+            metrics['teardown_duration'] = self.teardown_duration
+        if self.profiler.enabled:
+            metrics['profile'] = self.profiler.to_dict()
+        return metrics
+
+    def checkpoint_due(self, round_num: int) -> bool:
+        """
+        Get if a checkpoint should be saved before playing a round.
+
+        Parameters
+        ----------
+        round_num : int
+            The round about to be played.
+
+        Returns
+        -------
+        bool
+            True if the game should be checkpointed.
+        """
+        return (
+            self.checkpoint_dir is not None and
+            self.vector_env is None and
+            round_num > 1 and
+            (round_num - 1) % self.checkpoint_every == 0
+        )
+
+    def save_checkpoint(self, agent: BaseAgent, round_num: int, **state) -> None:
+        """
+        Save the agent's trainee and the game's state between rounds.
+
+        The state file is replaced only after the trainee is saved, so an
+        interruption at any point leaves the previous checkpoint intact.
+        Rounds buffered for training are saved with the state rather than
+        trained, so checkpointing does not change when rounds are trained.
+
+        Parameters
+        ----------
+        agent : BaseAgent
+            The agent playing the game.
+        round_num : int
+            The round about to be played.
+        **state
+            The JSON serializable game loop state.
+        """
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        trainee_file = f'trainee-{round_num}.caml'
+        agent.wait_training()
+        with self.profiler.phase('checkpoint'):
+            agent.save_trainee(str(self.checkpoint_dir / trainee_file))
+            state_path = self.checkpoint_dir / 'state.json'
+            with open(state_path.with_suffix('.tmp'), 'w') as state_file:
+                json.dump({
+                    'trainee': trainee_file,
+                    'agent': agent.get_state(),
+                    'training_buffer': agent.training_buffer.get_state(),
+                    'game': {'round_num': round_num, **state},
+                }, state_file)
+            os.replace(state_path.with_suffix('.tmp'), state_path)
+            for path in self.checkpoint_dir.glob('trainee-*.caml'):
+                if path.name != trainee_file:
+                    path.unlink(missing_ok=True)
+        logger.debug('Checkpointed round %s to %s', round_num, self.checkpoint_dir)
+
+    def load_checkpoint(self, agent: BaseAgent) -> t.Optional[t.Dict[str, t.Any]]:
+        """
+        Restore the agent from the game's checkpoint, if there is one.
+
+        Parameters
+        ----------
+        agent : BaseAgent
+            The agent, which has already been setup.
+
+        Returns
+        -------
+        dict or None
+            The game loop state passed to :meth:`save_checkpoint`, including
+            ``round_num``, or None when there is no checkpoint.
+        """
+        if self.checkpoint_dir is None or self.vector_env is not None:
+            return None
+        state_path = self.checkpoint_dir / 'state.json'
+        if not state_path.is_file():
+            return None
+        with open(state_path) as state_file:
+            state = json.load(state_file)
+        agent.load_trainee(str(self.checkpoint_dir / state['trainee']))
+        agent.set_state(state['agent'])
+        if 'training_buffer' in state:
+            agent.training_buffer.set_state(state['training_buffer'])
+        logger.info('Resuming from round %s of %s', state['game']['round_num'], self.checkpoint_dir)
+        return state['game']
 
-    @abstractmethod
     def play(self) -> GameResult:
         """Play the game."""
+        if self.vector_env is not None:
+            return self.play_vectorized()
+        return self.play_sequential()
+
+    @abstractmethod
+    def play_sequential(self) -> GameResult:
+        """Play the game one round at a time."""
+
+    @abstractmethod
+    def play_vectorized(self) -> GameResult:
+        """Play the game with rounds from all environments in lockstep."""
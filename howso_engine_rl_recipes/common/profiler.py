@@ -0,0 +1,222 @@
+from collections import Counter
+from contextlib import nullcontext
+import math
+from time import perf_counter
+import typing as t
+
+
+class PhaseStats:
+    """
+    Latency statistics of a single phase of game play.
+
+    Latencies are counted in logarithmically spaced buckets so that the
+    statistics of many calls, possibly recorded in different processes, can be
+    merged and their percentiles estimated without keeping every sample.
+    """
+
+    buckets_per_decade = 50
+    """The number of histogram buckets per power of ten seconds."""
+
+    min_latency = 1e-7
+    """The lower bound of the first histogram bucket, in seconds."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram: Counter[int] = Counter()
+
+    def record(self, seconds: float) -> None:
+        """
+        Record the latency of a call.
+
+        Parameters
+        ----------
+        seconds : float
+            The call latency in seconds.
+        """
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        bucket = int(math.log10(max(seconds, self.min_latency) / self.min_latency) * self.buckets_per_decade)
+        self.histogram[bucket] += 1
+
+    def merge(self, other: "PhaseStats") -> None:
+        """
+        Add the statistics of another phase to these statistics.
+
+        Parameters
+        ----------
+        other : PhaseStats
+            The statistics to merge.
+        """
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.histogram.update(other.histogram)
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimate a latency percentile.
+
+        Parameters
+        ----------
+        q : float
+            The percentile to estimate, between 0 and 100.
+
+        Returns
+        -------
+        float
+            The estimated latency in seconds, the geometric center of the
+            histogram bucket the percentile falls into.
+        """
+        if self.count == 0:
+            return float('nan')
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= rank:
+                break
+        latency = self.min_latency * 10 ** ((bucket + 0.5) / self.buckets_per_decade)
+        return min(latency, self.max)
+
+    def summary(self) -> t.Dict[str, float]:
+        """Get the count, total and latency percentiles of the phase."""
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else float('nan'),
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        """Serialize the statistics, including the histogram."""
+        return {
+            **self.summary(),
+            'histogram': dict(self.histogram),
+        }
+
+    @classmethod
+    def from_dict(cls, data: t.Mapping[str, t.Any]) -> "PhaseStats":
+        """Deserialize statistics created by :meth:`to_dict`."""
+        stats = cls()
+        stats.count = data['count']
+        stats.total = data['total']
+        stats.max = data['max']
+        stats.histogram.update({int(k): v for k, v in data['histogram'].items()})
+        return stats
+
+
+class _PhaseTimer:
+    """Context manager which records the duration of its block."""
+
+    __slots__ = ('stats', 'start')
+
+    def __init__(self, stats: PhaseStats) -> None:
+        self.stats = stats
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, *args) -> None:
+        self.stats.record(perf_counter() - self.start)
+
+
+class PhaseProfiler:
+    """
+    Records the latency of each call made in the phases of game play.
+
+    Parameters
+    ----------
+    enabled : bool, default True
+        If latencies should be recorded. When disabled, phases are no-ops.
+    """
+
+    phases = (
+        'agent_setup', 'react', 'distill', 'distilled_act', 'env_step', 'train', 'case_budget',
+        'remove_series_store', 'explanations', 'checkpoint', 'agent_done',
+    )
+    """The phases of game play, in the order they are reported."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.stats: t.Dict[str, PhaseStats] = {}
+
+    def phase(self, name: str) -> t.ContextManager:
+        """
+        Get a context manager which times a call in the named phase.
+
+        Parameters
+        ----------
+        name : str
+            The name of the phase.
+
+        Returns
+        -------
+        ContextManager
+            The phase timer.
+        """
+        if not self.enabled:
+            return nullcontext()
+        if name not in self.stats:
+            self.stats[name] = PhaseStats()
+        return _PhaseTimer(self.stats[name])
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Record the latency of a call in the named phase.
+
+        Parameters
+        ----------
+        name : str
+            The name of the phase.
+        seconds : float
+            The call latency in seconds.
+        """
+        if self.enabled:
+            self.stats.setdefault(name, PhaseStats()).record(seconds)
+
+    def merge(self, other: "PhaseProfiler") -> None:
+        """
+        Add the latencies recorded by another profiler to this profiler.
+
+        Parameters
+        ----------
+        other : PhaseProfiler
+            The profiler to merge.
+        """
+        for name, stats in other.stats.items():
+            self.stats.setdefault(name, PhaseStats()).merge(stats)
+
+    def _ordered(self) -> t.List[str]:
+        known = [name for name in self.phases if name in self.stats]
+        return known + sorted(name for name in self.stats if name not in self.phases)
+
+    def summary(self) -> t.Dict[str, t.Dict[str, float]]:
+        """Get the summary statistics of each phase."""
+        return {name: self.stats[name].summary() for name in self._ordered()}
+
+    def to_dict(self) -> t.Dict[str, t.Dict[str, t.Any]]:
+        """Serialize the profiler, for returning it from a worker process."""
+        return {name: self.stats[name].to_dict() for name in self._ordered()}
+
+    @classmethod
+    def from_dict(cls, data: t.Mapping[str, t.Mapping[str, t.Any]]) -> "PhaseProfiler":
+        """Deserialize a profiler created by :meth:`to_dict`."""
+        profiler = cls()
+        profiler.stats = {name: PhaseStats.from_dict(stats) for name, stats in data.items()}
+        return profiler
+
+    def format(self) -> str:
+        """Format the summary statistics of each phase as a table."""
+        lines = [f"{'Phase':<20} {'Calls':>9} {'Total (s)':>11} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}"]
+        for name, summary in self.summary().items():
+            lines.append(
+                f"{name:<20} {summary['count']:>9} {summary['total']:>11.3f} "
+                f"{summary['p50'] * 1000:>10.3f} {summary['p95'] * 1000:>10.3f} {summary['p99'] * 1000:>10.3f}"
+            )
+        return '\n'.join(lines)
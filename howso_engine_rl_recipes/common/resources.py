@@ -0,0 +1,67 @@
+import sys
+import threading
+import typing as t
+
+
+def get_peak_rss() -> int:
+    """
+    Get the peak resident set size of the current process.
+
+    Returns
+    -------
+    int
+        The peak resident set size in bytes.
+    """
+    try:
+        import resource
+    except ImportError:
+        # Windows does not provide the resource module
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes while macOS reports bytes
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+class PeakMemoryMonitor:
+    """
+    Find the peak resident set size of the current process while in use.
+
+    The peak RSS reported by the operating system is of the whole life of
+    the process, so it cannot tell the games played by a long lived worker
+    apart. Instead, the RSS is sampled in a background thread.
+
+    Parameters
+    ----------
+    interval : float, default 0.05
+        The seconds between samples.
+    """
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: t.Optional[threading.Thread] = None
+
+    def __enter__(self) -> "PeakMemoryMonitor":
+        import psutil
+        process = psutil.Process()
+        self._stop.clear()
+        self.peak = process.memory_info().rss
+
+        def sample():
+            while not self._stop.wait(self.interval):
+                self.peak = max(self.peak, process.memory_info().rss)
+
+        self._thread = threading.Thread(target=sample, name='peak-memory-monitor', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args, **kwargs) -> None:
+        import psutil
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.peak = max(self.peak, psutil.Process().memory_info().rss)
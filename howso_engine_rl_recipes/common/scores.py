@@ -0,0 +1,152 @@
+from collections import deque
+import typing as t
+
+import numpy as np
+
+
+class ScoreTracker:
+    """
+    The final scores of a game's rounds, with constant time statistics.
+
+    Only the scores of the most recent ``window`` rounds are kept, in a ring
+    buffer, along with running totals of all rounds. Games check for a win
+    and agents choose which rounds to train on from these statistics every
+    round, so they must not grow with the number of rounds played.
+
+    Parameters
+    ----------
+    window : int
+        The number of most recent rounds the windowed statistics are of,
+        such as the rounds a game must average a score across to be won.
+    """
+
+    def __init__(self, window: int) -> None:
+        self.window = max(1, window)
+        self.count = 0
+        self.total = 0.0
+        self.max = float('nan')
+        self._scores = np.zeros(self.window)
+        self._window_total = 0.0
+        # Indices of the scores which may still become the window's maximum,
+        # their scores are decreasing
+        self._window_maxima: t.Deque[int] = deque()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, score: float) -> None:
+        """
+        Record the final score of a round.
+
+        Parameters
+        ----------
+        score : float
+            The round's final score.
+        """
+        score = float(score)
+        index = self.count % self.window
+        if self.count >= self.window:
+            self._window_total -= self._scores[index]
+        self._scores[index] = score
+        self._window_total += score
+        if index == self.window - 1:
+            # Recompute the running sum once per window so floating point
+            # error does not accumulate over many rounds
+            self._window_total = float(self._scores.sum())
+
+        while self._window_maxima and self._scores[self._window_maxima[-1] % self.window] <= score:
+            self._window_maxima.pop()
+        self._window_maxima.append(self.count)
+        if self._window_maxima[0] <= self.count - self.window:
+            self._window_maxima.popleft()
+
+        self.count += 1
+        self.total += score
+        self.max = score if self.count == 1 else max(self.max, score)
+
+    @property
+    def last(self) -> float:
+        """The score of the most recent round."""
+        if not self.count:
+            return float('nan')
+        return float(self._scores[(self.count - 1) % self.window])
+
+    @property
+    def mean(self) -> float:
+        """The average score of all rounds."""
+        return self.total / self.count if self.count else float('nan')
+
+    @property
+    def window_full(self) -> bool:
+        """If at least ``window`` rounds were recorded."""
+        return self.count >= self.window
+
+    @property
+    def window_mean(self) -> float:
+        """The average score of the most recent ``window`` rounds."""
+        if not self.count:
+            return float('nan')
+        return self._window_total / min(self.count, self.window)
+
+    @property
+    def window_max(self) -> float:
+        """The highest score of the most recent ``window`` rounds."""
+        if not self.count:
+            return float('nan')
+        return float(self._scores[self._window_maxima[0] % self.window])
+
+    def recent(self) -> np.ndarray:
+        """
+        Get the scores of the most recent ``window`` rounds.
+
+        Returns
+        -------
+        np.ndarray
+            The scores, oldest first.
+        """
+        if self.count < self.window:
+            return self._scores[:self.count].copy()
+        return np.roll(self._scores, -(self.count % self.window))
+
+    def get_state(self) -> t.Dict[str, t.Any]:
+        """
+        Get the tracker's state to include in a checkpoint.
+
+        Returns
+        -------
+        dict
+            The JSON serializable state.
+        """
+        return {
+            'count': self.count,
+            'total': self.total,
+            'max': self.max,
+            'recent': self.recent().tolist(),
+        }
+
+    @classmethod
+    def from_state(cls, window: int, state: t.Mapping[str, t.Any]) -> "ScoreTracker":
+        """
+        Restore a tracker from a checkpoint.
+
+        Parameters
+        ----------
+        window : int
+            The number of most recent rounds the windowed statistics are of.
+        state : dict
+            The state returned by :meth:`get_state`.
+
+        Returns
+        -------
+        ScoreTracker
+            The restored tracker.
+        """
+        tracker = cls(window)
+        recent = state['recent'][-tracker.window:]
+        # Replay the recent scores at the positions they were recorded at
+        tracker.count = state['count'] - len(recent)
+        for score in recent:
+            tracker.append(score)
+        tracker.total = state['total']
+        tracker.max = state['max']
+        return tracker
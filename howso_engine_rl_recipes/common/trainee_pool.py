@@ -0,0 +1,68 @@
+import json
+import typing as t
+
+from howso import engine
+
+
+class TraineePool:
+    """
+    Empty trainee templates which the trainees of agents are copied from.
+
+    Creating a trainee and setting its auto-analyze parameters takes several
+    engine calls, a large share of a short game. Instead, an empty trainee
+    is created once per process for each feature specification and its
+    auto-analyze parameters, and every game plays with a copy of it, which
+    the engine clones in a single call. Templates belong to the client that
+    created them, so each client has templates of its own.
+    """
+
+    def __init__(self) -> None:
+        self._templates: t.Dict[t.Tuple[int, str], engine.Trainee] = {}
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def acquire(self, features: t.Mapping[str, t.Mapping], **auto_analyze_params) -> engine.Trainee:
+        """
+        Get an empty trainee from the template of the active client.
+
+        Parameters
+        ----------
+        features : dict
+            The trainee's feature attributes.
+        **auto_analyze_params
+            The trainee's auto-analyze parameters.
+
+        Returns
+        -------
+        Trainee
+            A copy of the template, which the caller deletes once done.
+        """
+        client = engine.get_client()
+        key = (id(client), json.dumps([features, auto_analyze_params], sort_keys=True, default=str))
+        template = self._templates.get(key)
+        if template is None:
+            template = engine.Trainee(features=features, client=client)
+            template.set_auto_analyze_params(**auto_analyze_params)
+            self._templates[key] = template
+        return template.copy()
+
+    def clear(self, *, delete: bool = True) -> None:
+        """
+        Remove every template.
+
+        Parameters
+        ----------
+        delete : bool, default True
+            If the templates should be deleted from the engine. Templates
+            inherited from a forked parent process are only forgotten, as
+            their clients are not used by the child.
+        """
+        if delete:
+            for template in self._templates.values():
+                template.delete()
+        self._templates = {}
+
+
+trainee_pool = TraineePool()
+"""The trainee templates of the current process."""
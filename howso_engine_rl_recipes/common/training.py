@@ -0,0 +1,368 @@
+import queue
+import threading
+from time import perf_counter
+import typing as t
+
+import numpy as np
+
+
+class TrainingBuffer:
+    """
+    Cases of rounds buffered client side so they are trained together.
+
+    Training the cases of several rounds in a single call reduces the number
+    of train calls, and the auto-analyses they trigger, at the cost of the
+    model not learning from a round until its cases are trained.
+
+    Parameters
+    ----------
+    every_rounds : int, optional
+        The number of rounds whose cases are buffered before training them.
+    every_cases : int, optional
+        The number of buffered cases which are trained even when fewer rounds
+        are buffered. When neither is specified, every round is trained.
+    """
+
+    def __init__(self, every_rounds: t.Optional[int] = None, every_cases: t.Optional[int] = None) -> None:
+        self.every_rounds = every_rounds
+        self.every_cases = every_cases
+        self.features: t.Optional[t.List[str]] = None
+        self.cases: t.List[t.List[t.Any]] = []
+        self.rounds = 0
+        self.trained_rounds = 0
+        self.total_delay = 0
+
+    @property
+    def enabled(self) -> bool:
+        """If cases of more than a single round may be buffered."""
+        return self.every_cases is not None or (self.every_rounds or 1) > 1
+
+    @property
+    def staleness(self) -> float:
+        """The average number of later rounds buffered before a round was trained."""
+        return self.total_delay / self.trained_rounds if self.trained_rounds else 0.0
+
+    def add(self, cases: t.Iterable[t.List[t.Any]], features: t.Sequence[str]) -> bool:
+        """
+        Buffer the cases of a round.
+
+        Parameters
+        ----------
+        cases : list of list
+            The cases of the round.
+        features : list of str
+            The features of the cases, the same for every round.
+
+        Returns
+        -------
+        bool
+            True if the buffered cases should now be trained.
+        """
+        self.features = list(features)
+        self.cases.extend(cases)
+        self.rounds += 1
+        if not self.enabled:
+            return True
+        return (
+            (self.every_rounds is not None and self.rounds >= self.every_rounds) or
+            (self.every_cases is not None and len(self.cases) >= self.every_cases)
+        )
+
+    def drain(self) -> t.List[t.List[t.Any]]:
+        """
+        Remove and return the buffered cases to train them.
+
+        Returns
+        -------
+        list of list
+            The buffered cases.
+        """
+        cases = self.cases
+        # The first round buffered waited for every later round
+        self.total_delay += self.rounds * (self.rounds - 1) // 2
+        self.trained_rounds += self.rounds
+        self.cases = []
+        self.rounds = 0
+        return cases
+
+    def get_state(self) -> t.Dict[str, t.Any]:
+        """
+        Get the buffered cases to include in a checkpoint.
+
+        Returns
+        -------
+        dict
+            The JSON serializable state.
+        """
+        return {
+            'features': self.features,
+            'cases': [[v.item() if isinstance(v, np.generic) else v for v in case] for case in self.cases],
+            'rounds': self.rounds,
+            'trained_rounds': self.trained_rounds,
+            'total_delay': self.total_delay,
+        }
+
+    def set_state(self, state: t.Mapping[str, t.Any]) -> None:
+        """
+        Restore the buffered cases from a checkpoint.
+
+        Parameters
+        ----------
+        state : dict
+            The state returned by :meth:`get_state`.
+        """
+        self.features = state['features']
+        self.cases = [list(case) for case in state['cases']]
+        self.rounds = state['rounds']
+        self.trained_rounds = state['trained_rounds']
+        self.total_delay = state['total_delay']
+
+
+class StepBuffer:
+    """
+    The values recorded at each step of the rounds in progress.
+
+    Each round's steps are kept client side in a preallocated array instead
+    of in the trainee's series store. Arrays are reused by later rounds once
+    a round is removed, and double in size when a round outgrows them.
+
+    Parameters
+    ----------
+    width : int
+        The number of values recorded each step, such as the context and
+        action features.
+    capacity : int, default 64
+        The initial number of steps a round's array holds.
+    """
+
+    def __init__(self, width: int, capacity: int = 64) -> None:
+        self.width = width
+        self.capacity = max(1, capacity)
+        self._rounds: t.Dict[int, t.Tuple[np.ndarray, int]] = {}
+        self._free: t.List[np.ndarray] = []
+
+    def __contains__(self, round_num: int) -> bool:
+        return int(round_num) in self._rounds
+
+    def append(self, round_num: int, values: t.Sequence[float]) -> None:
+        """
+        Record the values of a round's next step.
+
+        Parameters
+        ----------
+        round_num : int
+            The round of the step.
+        values : sequence of float
+            The values of the step.
+        """
+        round_num = int(round_num)
+        steps, count = self._rounds.get(round_num) or (self._allocate(), 0)
+        if count == len(steps):
+            steps = np.concatenate([steps, np.empty_like(steps)])
+        steps[count] = values
+        self._rounds[round_num] = (steps, count + 1)
+
+    def pop(self, round_num: int) -> t.Optional[np.ndarray]:
+        """
+        Remove the steps of a round.
+
+        Parameters
+        ----------
+        round_num : int
+            The round to remove.
+
+        Returns
+        -------
+        np.ndarray or None
+            The values of each step of the round, one row per step, or None
+            when no steps of the round were recorded.
+        """
+        entry = self._rounds.pop(int(round_num), None)
+        if entry is None:
+            return None
+        steps, count = entry
+        self._free.append(steps)
+        return steps[:count].copy()
+
+    def discard(self, round_num: int) -> bool:
+        """
+        Remove the steps of a round without using them.
+
+        Parameters
+        ----------
+        round_num : int
+            The round to remove.
+
+        Returns
+        -------
+        bool
+            True if steps of the round were recorded.
+        """
+        entry = self._rounds.pop(int(round_num), None)
+        if entry is None:
+            return False
+        self._free.append(entry[0])
+        return True
+
+    def _allocate(self) -> np.ndarray:
+        if self._free:
+            return self._free.pop()
+        return np.empty((self.capacity, self.width))
+
+
+class BackgroundTrainer:
+    """
+    Runs train calls on a background thread while play continues.
+
+    Play keeps reacting against the model as it was before the calls still
+    queued or running, so at most ``max_pending`` train calls are left
+    outstanding. Submitting another waits until one finishes, bounding how
+    far the model lags behind the rounds played. Auto-analyses triggered by
+    training run on the thread with the train call that triggered them. The
+    calls should only call the engine, their results are collected by play
+    to update its own state.
+
+    Concurrent engine calls are only supported by the multi-threaded engine,
+    see :func:`supports_background_training`.
+
+    Parameters
+    ----------
+    max_pending : int, default 1
+        The number of train calls which may be queued or running while play
+        continues.
+    """
+
+    def __init__(self, max_pending: int = 1) -> None:
+        self.max_pending = max(1, max_pending)
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.completed = 0
+        self._results: t.List[t.Any] = []
+        self._pending = 0
+        self._error: t.Optional[BaseException] = None
+        self._condition = threading.Condition()
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: t.Optional[threading.Thread] = threading.Thread(
+            target=self._work, name='training', daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """The number of train calls queued or running."""
+        return self._pending
+
+    @property
+    def overlap(self) -> float:
+        """The fraction of the time spent training which play did not wait for."""
+        if not self.busy_seconds:
+            return 0.0
+        return max(0.0, 1.0 - self.wait_seconds / self.busy_seconds)
+
+    def submit(self, fn: t.Callable, *args, **kwargs) -> None:
+        """
+        Queue a train call, once fewer than ``max_pending`` calls are outstanding.
+
+        Parameters
+        ----------
+        fn : callable
+            The function which trains the model.
+        *args, **kwargs
+            The arguments to call ``fn`` with.
+        """
+        self.wait(self.max_pending - 1)
+        with self._condition:
+            self._pending += 1
+        self._queue.put((fn, args, kwargs))
+
+    def wait(self, max_pending: int = 0) -> None:
+        """
+        Wait until at most ``max_pending`` train calls are outstanding.
+
+        Parameters
+        ----------
+        max_pending : int, default 0
+            The number of calls which may still be outstanding.
+
+        Raises
+        ------
+        Exception
+            The exception raised by a train call which failed since the last
+            call was submitted.
+        """
+        with self._condition:
+            if self._pending > max_pending:
+                started = perf_counter()
+                self._condition.wait_for(lambda: self._pending <= max_pending)
+                self.wait_seconds += perf_counter() - started
+        self._raise()
+
+    def collect(self) -> t.List[t.Any]:
+        """
+        Get the results of the train calls which finished since last collected.
+
+        Returns
+        -------
+        list
+            The value returned by each finished call, in the order submitted.
+
+        Raises
+        ------
+        Exception
+            The exception raised by a train call which failed.
+        """
+        self._raise()
+        with self._condition:
+            results, self._results = self._results, []
+        return results
+
+    def close(self) -> None:
+        """Wait for the outstanding train calls and stop the thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._raise()
+
+    def _raise(self) -> None:
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _work(self) -> None:
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            fn, args, kwargs = task
+            started = perf_counter()
+            try:
+                results = [fn(*args, **kwargs)]
+            except Exception as e:
+                self._error = self._error or e
+                results = []
+            with self._condition:
+                self._results.extend(results)
+                self.busy_seconds += perf_counter() - started
+                self.completed += 1
+                self._pending -= 1
+                self._condition.notify_all()
+
+
+def supports_background_training() -> bool:
+    """
+    Check if the active engine client may be called from several threads at once.
+
+    Returns
+    -------
+    bool
+        True for the multi-threaded engine. The single-threaded engine does
+        not guard against concurrent calls.
+    """
+    from howso import engine
+    amalgam = getattr(engine.get_client(), 'amlg', None)
+    if amalgam is None:
+        return False
+    concurrency = amalgam.get_concurrency_type_string()
+    if isinstance(concurrency, bytes):
+        concurrency = concurrency.decode()
+    return concurrency != 'SingleThreaded'
@@ -0,0 +1,309 @@
+import logging
+import multiprocessing
+import multiprocessing.connection
+import time
+import traceback
+import typing as t
+
+logger = logging.getLogger('howso.rl.examples')
+
+_connection = None
+"""The pipe of the current worker process to its pool, if any."""
+
+
+class WorkerPool:
+    """
+    Process pool which runs one task at a time in each of its workers.
+
+    Unlike a ``ProcessPoolExecutor``, each worker's task is known, so a
+    worker can be replaced without affecting the others. Workers are
+    replaced once they ran ``max_tasks_per_worker`` tasks, releasing any
+    memory their games leaked. A watchdog polls the resident set size of
+    every busy worker, and a worker which exceeds ``max_rss`` or exits
+    unexpectedly is restarted and its task resubmitted to it.
+
+    Workers report when they are ready, and tasks may report events of
+    their own with :func:`notify`, which are collected in ``notices``.
+
+    Parameters
+    ----------
+    max_workers : int
+        The number of worker processes.
+    initializer : callable, optional
+        Called in each worker process when it starts.
+    initargs : tuple, optional
+        The arguments of ``initializer``.
+    max_tasks_per_worker : int, optional
+        The number of tasks a worker runs before it is replaced.
+    max_rss : int, optional
+        The resident set size in bytes a worker is restarted at.
+    max_retries : int, default 2
+        The number of times a task is resubmitted before it fails.
+    poll_interval : float, default 0.5
+        The seconds between checks of the workers' memory.
+    cpu_sets : list of list of int, optional
+        The CPUs each worker is pinned to. A worker which replaces another
+        is pinned to the same CPUs.
+    start_method : str, optional
+        The multiprocessing start method of the workers. Defaults to the
+        platform's default.
+    preload : list of str, optional
+        The modules a forkserver imports once, so the workers it forks
+        start with them imported.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        *,
+        initializer: t.Optional[t.Callable] = None,
+        initargs: t.Sequence[t.Any] = (),
+        max_tasks_per_worker: t.Optional[int] = None,
+        max_rss: t.Optional[int] = None,
+        max_retries: int = 2,
+        poll_interval: float = 0.5,
+        cpu_sets: t.Optional[t.Sequence[t.Sequence[int]]] = None,
+        start_method: t.Optional[str] = None,
+        preload: t.Sequence[str] = ()
+    ) -> None:
+        self.initializer = initializer
+        self.initargs = tuple(initargs)
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_rss = max_rss
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self.cpu_sets = cpu_sets
+        self.restarts = 0
+        self.recycles = 0
+        self.notices: t.List[t.Dict[str, t.Any]] = []
+        self._context = multiprocessing.get_context(start_method)
+        self.start_method = self._context.get_start_method()
+        if self.start_method == 'forkserver' and preload:
+            self._context.set_forkserver_preload(list(preload))
+        self._idle = [self._start_worker(slot) for slot in range(max(1, max_workers))]
+        self._busy: t.Dict[_Worker, _Task] = {}
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, exc_type, *args, **kwargs) -> None:
+        if exc_type is None:
+            self.shutdown()
+        else:
+            self.terminate()
+
+    @property
+    def idle(self) -> int:
+        """The number of workers without a task."""
+        return len(self._idle)
+
+    @property
+    def running(self) -> int:
+        """The number of tasks running."""
+        return len(self._busy)
+
+    def submit(self, key: t.Hashable, fn: t.Callable, *args, **kwargs) -> None:
+        """
+        Run a task in an idle worker.
+
+        Parameters
+        ----------
+        key : hashable
+            The key the task's result is returned with.
+        fn : callable
+            The picklable function to call.
+        *args, **kwargs
+            The arguments to call ``fn`` with.
+        """
+        if not self._idle:
+            raise RuntimeError('No idle worker to run the task')
+        self._assign(self._idle.pop(), _Task(key, fn, args, kwargs))
+
+    def wait(self) -> t.List[t.Tuple[t.Hashable, t.Any]]:
+        """
+        Wait for at least one task to finish.
+
+        Returns
+        -------
+        list of tuple
+            The key and result of each finished task.
+
+        Raises
+        ------
+        Exception
+            The exception raised by a task, or a RuntimeError when a task's
+            worker was restarted more than ``max_retries`` times.
+        """
+        while True:
+            ready = set(multiprocessing.connection.wait(
+                [handle for worker in self._busy for handle in (worker.connection, worker.process.sentinel)],
+                timeout=self.poll_interval
+            ))
+
+            finished = []
+            for worker, task in list(self._busy.items()):
+                if worker.connection in ready:
+                    try:
+                        succeeded, value = worker.connection.recv()
+                    except (EOFError, OSError):
+                        self._restart(worker, 'exited unexpectedly')
+                        continue
+                    if succeeded is None:
+                        self.notices.append({'pid': worker.process.pid, **value})
+                        continue
+                    del self._busy[worker]
+                    self._release(worker)
+                    if not succeeded:
+                        raise value
+                    finished.append((task.key, value))
+                elif worker.process.sentinel in ready:
+                    self._restart(worker, f'exited unexpectedly with code {worker.process.exitcode}')
+                elif self.max_rss is not None:
+                    rss = worker.rss()
+                    if rss is not None and rss > self.max_rss:
+                        self._restart(worker, f'exceeded the memory limit with {rss / 2 ** 20:.0f} MB')
+            if finished:
+                return finished
+
+    def shutdown(self) -> None:
+        """Stop the workers once they finish their tasks."""
+        for worker in self._idle + list(self._busy):
+            worker.stop()
+        self._idle = []
+        self._busy = {}
+
+    def terminate(self) -> None:
+        """Kill the workers without waiting for their tasks."""
+        for worker in self._idle + list(self._busy):
+            worker.kill()
+        self._idle = []
+        self._busy = {}
+
+    def _start_worker(self, slot: int) -> "_Worker":
+        connection, worker_connection = self._context.Pipe()
+        cpus = self.cpu_sets[slot % len(self.cpu_sets)] if self.cpu_sets else None
+        process = self._context.Process(
+            target=_worker_main, args=(worker_connection, self.initializer, self.initargs, cpus))
+        process.start()
+        worker_connection.close()
+        return _Worker(process, connection, slot)
+
+    def _assign(self, worker: "_Worker", task: "_Task") -> None:
+        self._busy[worker] = task
+        worker.connection.send((task.fn, task.args, task.kwargs))
+
+    def _release(self, worker: "_Worker") -> None:
+        """Make a worker which finished a task idle, or replace it once it ran its share of tasks."""
+        worker.tasks += 1
+        if self.max_tasks_per_worker is not None and worker.tasks >= self.max_tasks_per_worker:
+            worker.stop()
+            worker = self._start_worker(worker.slot)
+            self.recycles += 1
+        self._idle.append(worker)
+
+    def _restart(self, worker: "_Worker", reason: str) -> None:
+        """Replace a worker which failed and resubmit its task to the new worker."""
+        task = self._busy.pop(worker)
+        worker.kill()
+        self.restarts += 1
+        task.attempts += 1
+        if task.attempts > self.max_retries:
+            raise RuntimeError(f'Task {task.key!r} failed after its worker {reason} {task.attempts} times')
+        logger.warning('Worker %s %s, resubmitting its task', worker.process.pid, reason)
+        self._assign(self._start_worker(worker.slot), task)
+
+
+class _Task:
+    """A task submitted to the pool."""
+
+    def __init__(self, key, fn, args, kwargs) -> None:
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.attempts = 0
+
+
+class _Worker:
+    """A worker process, the parent's end of its pipe and the slot of the pool it fills."""
+
+    def __init__(self, process, connection, slot) -> None:
+        self.process = process
+        self.connection = connection
+        self.slot = slot
+        self.tasks = 0
+
+    def rss(self) -> t.Optional[int]:
+        """The worker's resident set size in bytes, or None when it exited."""
+        import psutil
+        try:
+            return psutil.Process(self.process.pid).memory_info().rss
+        except psutil.Error:
+            return None
+
+    def stop(self) -> None:
+        """Ask the worker to exit once it is idle."""
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.kill()
+        self.connection.close()
+
+    def kill(self) -> None:
+        """Kill the worker."""
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+def notify(event: str, **info) -> None:
+    """
+    Report an event of the current worker to its pool.
+
+    Does nothing when not called in a worker process.
+
+    Parameters
+    ----------
+    event : str
+        The name of the event.
+    **info
+        The picklable details of the event.
+    """
+    if _connection is not None:
+        _connection.send((None, {'event': event, 'time': time.time(), **info}))
+
+
+def _worker_main(connection, initializer, initargs, cpus=None):
+    """Run the tasks received from the pool until told to stop."""
+    global _connection
+    _connection = connection
+    started = time.time()
+    if cpus is not None:
+        from .allocation import pin_process
+        pin_process(cpus)
+    if initializer is not None:
+        initializer(*initargs)
+    notify('ready', started=started)
+    while True:
+        try:
+            task = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if task is None:
+            return
+        fn, args, kwargs = task
+        try:
+            result = (True, fn(*args, **kwargs))
+        except KeyboardInterrupt:
+            return
+        except Exception as e:
+            e.add_note(f'Raised in worker process:\n{traceback.format_exc()}')
+            result = (False, e)
+        try:
+            connection.send(result)
+        except Exception as e:
+            # The result or exception could not be pickled
+            connection.send((False, RuntimeError(f'Failed to return the task result: {e!r}')))
@@ -0,0 +1,177 @@
+from datetime import timedelta
+import hashlib
+from importlib import metadata
+import json
+from pathlib import Path
+import sqlite3
+import typing as t
+
+from . import __version__
+from .common.game import GameResult
+
+
+class ResultCache:
+    """
+    On-disk cache of game results, keyed by the identity of each game.
+
+    A game's identity is its options, including its seed, the contents of
+    the files they refer to and the versions of this package and the
+    engine. Playing a game again with the same identity returns the result
+    recorded the first time instead, so re-running an extended sweep only
+    plays the games which were not played before. Results are kept in a
+    SQLite database which the workers of a simulation share.
+
+    Only games with a seed are cached, since the result of an unseeded game
+    is not reproducible. Games which write files, such as saving their
+    winning trainee, are not cached either.
+
+    Parameters
+    ----------
+    path : str
+        The SQLite database file. It is created if it does not exist.
+    """
+
+    ignored_options = ('checkpoint_dir', 'checkpoint_every', 'trainee_pool')
+    """Options which do not change the result of a game."""
+
+    file_options = ('warm_start', 'engine_config')
+    """Options naming a file whose contents are part of a game's identity."""
+
+    uncached_options = ('save_winner', 'explanation_output')
+    """Options with side effects which a cached result would skip."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # Workers write concurrently, so wait for each other's writes
+        self._connection = sqlite3.connect(path, timeout=60)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, identity TEXT, result TEXT)')
+        self._connection.commit()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *args, **kwargs) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    @classmethod
+    def cacheable(cls, options: t.Mapping[str, t.Any]) -> bool:
+        """
+        Check if the result of a game may be cached.
+
+        Parameters
+        ----------
+        options : dict
+            The game's options.
+
+        Returns
+        -------
+        bool
+            True if the game is seeded and has no side effects.
+        """
+        return options.get('seed') is not None and not any(options.get(key) for key in cls.uncached_options)
+
+    @classmethod
+    def identity(cls, options: t.Mapping[str, t.Any]) -> t.Dict[str, t.Any]:
+        """
+        Get the identity of a game.
+
+        Parameters
+        ----------
+        options : dict
+            The game's options, including its game type.
+
+        Returns
+        -------
+        dict
+            The canonical options, file digests and versions identifying
+            the game.
+        """
+        options = {k: v for k, v in options.items() if k not in cls.ignored_options}
+        files = {}
+        for key in cls.file_options:
+            if options.get(key) is not None and Path(options[key]).is_file():
+                files[key] = hashlib.sha256(Path(options[key]).read_bytes()).hexdigest()
+        return json.loads(json.dumps({
+            'options': options,
+            'files': files,
+            'versions': cls.versions(),
+        }, sort_keys=True, default=str))
+
+    @staticmethod
+    def versions() -> t.Dict[str, t.Optional[str]]:
+        """Get the versions of the packages which determine a game's result."""
+        versions = {'howso-engine-rl-recipes': __version__}
+        for package in ('howso-engine', 'amalgam-lang', 'gymnasium'):
+            try:
+                versions[package] = metadata.version(package)
+            except metadata.PackageNotFoundError:
+                versions[package] = None
+        return versions
+
+    @classmethod
+    def key(cls, options: t.Mapping[str, t.Any]) -> str:
+        """
+        Get the cache key of a game.
+
+        Parameters
+        ----------
+        options : dict
+            The game's options, including its game type.
+
+        Returns
+        -------
+        str
+            The hash of the game's identity.
+        """
+        return hashlib.sha256(json.dumps(cls.identity(options), sort_keys=True).encode()).hexdigest()
+
+    def get(self, options: t.Mapping[str, t.Any]) -> t.Optional[GameResult]:
+        """
+        Get the cached result of a game.
+
+        Parameters
+        ----------
+        options : dict
+            The game's options, including its game type.
+
+        Returns
+        -------
+        GameResult or None
+            The result of the game, or None when it is not cached.
+        """
+        row = self._connection.execute(
+            'SELECT result FROM results WHERE key = ?', (self.key(options), )).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row[0])
+        result['duration'] = timedelta(seconds=result['duration'])
+        return result
+
+    def put(self, options: t.Mapping[str, t.Any], result: GameResult) -> None:
+        """
+        Cache the result of a game.
+
+        Parameters
+        ----------
+        options : dict
+            The game's options, including its game type.
+        result : GameResult
+            The result of the game.
+        """
+        record = {**result, 'duration': result['duration'].total_seconds()}
+        record.pop('cached', None)
+        identity = json.dumps(self.identity(options), sort_keys=True)
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO results (key, identity, result) VALUES (?, ?, ?)',
+                (hashlib.sha256(identity.encode()).hexdigest(), identity,
+                 json.dumps(record, sort_keys=True, default=str)))
+
+    def close(self) -> None:
+        """Close the database."""
+        self._connection.close()
@@ -0,0 +1,554 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+from csv import DictWriter
+from datetime import timedelta
+import json
+import math
+import typing as t
+
+from .common.game import GameResult
+from .common.profiler import PhaseProfiler
+
+
+class ResultSink(ABC):
+    """
+    Destination that game results are written to as each one completes.
+
+    Sinks flush every result they write so finished iterations are not lost
+    if the simulation is interrupted.
+    """
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *args, **kwargs) -> None:
+        self.close()
+
+    @abstractmethod
+    def write(self, iteration: int, result: GameResult) -> None:
+        """
+        Write the result of a game.
+
+        Parameters
+        ----------
+        iteration : int
+            The simulation iteration the game was played in.
+        result : GameResult
+            The game result.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """Close the sink."""
+
+
+class CsvResultSink(ResultSink):
+    """
+    Append game results to a CSV file.
+
+    Parameters
+    ----------
+    path : str
+        The CSV file to append to. The header is written if it is empty.
+    game_type : str
+        The game type recorded in each row.
+    agent_type : str
+        The agent type recorded in each row.
+    configuration : str, optional
+        The configuration label recorded in each row.
+    profile : bool, default False
+        If per-phase latency columns should be included.
+    """
+
+    fieldnames = ['game_type', 'agent_type', 'configuration', 'iteration', 'win', 'rounds', 'high_score',
+                  'total_cases', 'duration']
+    profile_stats = ('calls', 'total', 'p50', 'p95', 'p99')
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        game_type: str,
+        agent_type: str,
+        configuration: t.Optional[str] = None,
+        profile: bool = False
+    ) -> None:
+        self.game_type = game_type
+        self.agent_type = agent_type
+        self.configuration = configuration
+        fieldnames = list(self.fieldnames)
+        if profile:
+            fieldnames += [
+                f'{phase}_{stat}'
+                for phase in PhaseProfiler.phases
+                for stat in self.profile_stats
+            ]
+        self._file = open(path, 'a', newline='')
+        self._writer = DictWriter(self._file, fieldnames)
+        if self._file.tell() == 0:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def write(self, iteration: int, result: GameResult) -> None:
+        """Append the result of a game as a CSV row."""
+        profile_columns = {}
+        for phase, stats in result.get('profile', {}).items():
+            if phase in PhaseProfiler.phases:
+                profile_columns.update({
+                    f'{phase}_calls': stats['count'],
+                    f'{phase}_total': stats['total'],
+                    f'{phase}_p50': stats['p50'],
+                    f'{phase}_p95': stats['p95'],
+                    f'{phase}_p99': stats['p99'],
+                })
+        self._writer.writerow({
+            **profile_columns,
+            'game_type': self.game_type,
+            'agent_type': self.agent_type,
+            'configuration': self.configuration,
+            'iteration': int(iteration),
+            'win': 'true' if result['win'] else 'false',
+            'rounds': result['rounds'],
+            'high_score': result['high_score'],
+            'total_cases': result['total_cases'],
+            'duration': result['duration'].total_seconds()
+        })
+        self._file.flush()
+
+    def close(self) -> None:
+        """Close the CSV file."""
+        self._file.close()
+
+
+class JsonlResultSink(ResultSink):
+    """
+    Append game results to a JSON Lines file, one object per game.
+
+    Parameters
+    ----------
+    path : str
+        The JSON Lines file to append to.
+    **fields
+        Additional fields recorded in each object, such as the game type.
+    """
+
+    def __init__(self, path: str, **fields) -> None:
+        self.fields = fields
+        self._file = open(path, 'a')
+
+    def write(self, iteration: int, result: GameResult) -> None:
+        """Append the result of a game as a JSON object."""
+        record = {**self.fields, 'iteration': int(iteration), **result}
+        record['duration'] = result['duration'].total_seconds()
+        self._file.write(json.dumps(record, sort_keys=True, default=str) + '\n')
+        self._file.flush()
+
+    def close(self) -> None:
+        """Close the JSON Lines file."""
+        self._file.close()
+
+
+def read_jsonl_results(path: str) -> t.Dict[int, GameResult]:
+    """
+    Read the game results written by a :class:`JsonlResultSink`.
+
+    Parameters
+    ----------
+    path : str
+        The JSON Lines file.
+
+    Returns
+    -------
+    dict of int to GameResult
+        The game results keyed by iteration. Lines which were not written
+        completely, such as when the simulation was interrupted, are skipped.
+    """
+    results = {}
+    with open(path) as results_file:
+        for line in results_file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            iteration = record.pop('iteration')
+            record['duration'] = timedelta(seconds=record['duration'])
+            results[iteration] = record
+    return results
+
+
+class RunningStats:
+    """
+    Streaming statistics of a series of values.
+
+    The mean and variance are updated with Welford's algorithm and
+    percentiles are estimated from a histogram of logarithmically spaced
+    buckets, so the statistics of any number of values take constant memory.
+    """
+
+    buckets_per_decade = 50
+    """The number of histogram buckets per power of ten."""
+
+    min_magnitude = 1e-6
+    """The magnitude below which values share the histogram's zero bucket."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = float('nan')
+        self.min = float('nan')
+        self.max = float('nan')
+        self._m2 = 0.0
+        self.histogram: Counter[int] = Counter()
+
+    def add(self, value: float) -> None:
+        """
+        Add a value to the statistics.
+
+        Parameters
+        ----------
+        value : float
+            The value.
+        """
+        value = float(value)
+        self.count += 1
+        if self.count == 1:
+            self.mean = self.min = self.max = value
+        else:
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (value - self.mean)
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        self.histogram[self._bucket(value)] += 1
+
+    @property
+    def variance(self) -> float:
+        """The sample variance of the values."""
+        return self._m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    @property
+    def std(self) -> float:
+        """The sample standard deviation of the values."""
+        return math.sqrt(self.variance)
+
+    def confidence_interval(self, z: float = 1.96) -> t.Tuple[float, float]:
+        """
+        Get the normal approximation confidence interval of the mean.
+
+        Parameters
+        ----------
+        z : float, default 1.96
+            The standard score of the confidence level, 1.96 for 95%.
+
+        Returns
+        -------
+        tuple of float
+            The lower and upper bounds of the interval.
+        """
+        margin = z * self.std / math.sqrt(self.count) if self.count > 1 else float('nan')
+        return self.mean - margin, self.mean + margin
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimate a percentile of the values.
+
+        Parameters
+        ----------
+        q : float
+            The percentile to estimate, between 0 and 100.
+
+        Returns
+        -------
+        float
+            The estimated value, the geometric center of the histogram bucket
+            the percentile falls into.
+        """
+        if self.count == 0:
+            return float('nan')
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= rank:
+                break
+        if bucket == 0:
+            value = 0.0
+        else:
+            value = math.copysign(self.min_magnitude * 10 ** ((abs(bucket) - 0.5) / self.buckets_per_decade), bucket)
+        return min(max(value, self.min), self.max)
+
+    def summary(self) -> t.Dict[str, float]:
+        """Get the count, mean, spread, percentiles and 95% confidence interval of the values."""
+        ci_low, ci_high = self.confidence_interval()
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'std': self.std,
+            'min': self.min,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p95': self.percentile(95),
+            'max': self.max,
+            'ci95-low': ci_low,
+            'ci95-high': ci_high,
+        }
+
+    def _bucket(self, value: float) -> int:
+        if abs(value) < self.min_magnitude:
+            return 0
+        bucket = 1 + int(math.log10(abs(value) / self.min_magnitude) * self.buckets_per_decade)
+        return bucket if value > 0 else -bucket
+
+
+def wilson_interval(successes: int, total: int, z: float = 1.96) -> t.Tuple[float, float]:
+    """
+    Get the Wilson score confidence interval of a proportion.
+
+    Parameters
+    ----------
+    successes : int
+        The number of successes, such as games won.
+    total : int
+        The number of trials.
+    z : float, default 1.96
+        The standard score of the confidence level, 1.96 for 95%.
+
+    Returns
+    -------
+    tuple of float
+        The lower and upper bounds of the proportion, between 0 and 1.
+    """
+    if total == 0:
+        return float('nan'), float('nan')
+    p = successes / total
+    denominator = 1 + z ** 2 / total
+    center = (p + z ** 2 / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z ** 2 / (4 * total ** 2)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class MetricsAggregator:
+    """
+    Aggregate simulation metrics one game result at a time.
+
+    Only running totals and streaming statistics are kept, so metrics of any
+    number of games can be computed without retaining their results.
+    """
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.won = 0
+        self.rounds = RunningStats()
+        self.duration = RunningStats()
+        self.react_calls = 0
+        self.train_calls = 0
+        self.analyze_calls = 0
+        self.staleness_runs = 0
+        self.staleness = 0.0
+        self.budget_runs = 0
+        self.cases_removed = 0
+        self.win_rounds = RunningStats()
+        self.win_high_score = 0.0
+        self.win_cases = 0
+        self.win_duration = timedelta()
+        self.cache_runs = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.distilled_runs = 0
+        self.background_train_seconds = 0.0
+        self.background_wait_seconds = 0.0
+        self.background_runs = 0
+        self.distilled_hits = 0
+        self.distilled_fallbacks = 0
+        self.cached = 0
+        self.peak_rss = RunningStats()
+        self.setup = RunningStats()
+        self.teardown = RunningStats()
+        self.profile: t.Optional[PhaseProfiler] = None
+
+    def add(self, result: GameResult) -> None:
+        """
+        Add a game result to the metrics.
+
+        Parameters
+        ----------
+        result : GameResult
+            The game result.
+        """
+        self.total += 1
+        self.rounds.add(result['rounds'])
+        self.duration.add(result['duration'].total_seconds())
+        self.react_calls += result.get('react_calls', 0)
+        self.train_calls += result.get('train_calls', 0)
+        self.analyze_calls += result.get('analyze_calls', 0)
+        if 'train_staleness' in result:
+            self.staleness_runs += 1
+            self.staleness += result['train_staleness']
+        if 'background_train_seconds' in result:
+            self.background_runs += 1
+            self.background_train_seconds += result['background_train_seconds']
+            self.background_wait_seconds += result['background_wait_seconds']
+        if 'cases_removed' in result:
+            self.budget_runs += 1
+            self.cases_removed += result['cases_removed']
+        if result['win']:
+            self.won += 1
+            self.win_rounds.add(result['rounds'])
+            self.win_high_score += result['high_score']
+            self.win_cases += result['total_cases']
+            self.win_duration += result['duration']
+        if 'action_cache_hits' in result:
+            self.cache_runs += 1
+            self.cache_hits += result['action_cache_hits']
+            self.cache_misses += result['action_cache_misses']
+        if 'distilled_hits' in result:
+            self.distilled_runs += 1
+            self.distilled_hits += result['distilled_hits']
+            self.distilled_fallbacks += result['distilled_fallbacks']
+        if result.get('cached'):
+            self.cached += 1
+        if 'peak_rss' in result:
+            self.peak_rss.add(result['peak_rss'])
+        if 'setup_duration' in result:
+            self.setup.add(result['setup_duration'])
+        if 'teardown_duration' in result:
+            self.teardown.add(result['teardown_duration'])
+        if 'profile' in result:
+            if self.profile is None:
+                self.profile = PhaseProfiler()
+            self.profile.merge(PhaseProfiler.from_dict(result['profile']))
+
+    @property
+    def percent_won(self) -> float:
+        """The percentage of games won so far."""
+        return 100.0 * self.won / self.total if self.total else float('nan')
+
+    def metrics(self) -> t.Dict[str, t.Any]:
+        """Get the metrics of all games added."""
+        if self.won > 0:
+            avg_win_high_score = self.win_high_score / self.won
+            avg_win_duration = self.win_duration / self.won
+            avg_win_cases = self.win_cases / self.won
+            avg_win_rounds = self.win_rounds.mean
+        else:
+            avg_win_high_score = float("nan")
+            avg_win_duration = float("nan")
+            avg_win_cases = float("nan")
+            avg_win_rounds = float("nan")
+
+        metrics = {
+            'total-iterations': self.total,
+            'total-won': self.won,
+            'percent-won': self.percent_won,
+            'percent-won-ci95': [100.0 * bound for bound in wilson_interval(self.won, self.total)],
+            'average-rounds-to-win': avg_win_rounds,
+            'rounds-to-win': self.win_rounds.summary(),
+            'average-win-high-score': avg_win_high_score,
+            'average-win-duration': avg_win_duration,
+            'average-win-cases': avg_win_cases,
+            'average-rounds': self.rounds.mean,
+            'rounds': self.rounds.summary(),
+            'duration': self.duration.summary(),
+            'average-react-calls': self.react_calls / self.total if self.total else float('nan'),
+            'average-train-calls': self.train_calls / self.total if self.total else float('nan'),
+            'average-analyze-calls': self.analyze_calls / self.total if self.total else float('nan'),
+        }
+
+        if self.staleness_runs:
+            metrics['average-train-staleness'] = self.staleness / self.staleness_runs
+
+        if self.background_runs:
+            metrics['average-background-train-seconds'] = self.background_train_seconds / self.background_runs
+            metrics['average-background-wait-seconds'] = self.background_wait_seconds / self.background_runs
+            # The share of background training which play did not have to wait for
+            metrics['background-training-overlap'] = (
+                max(0.0, 1.0 - self.background_wait_seconds / self.background_train_seconds)
+                if self.background_train_seconds else 0.0
+            )
+
+        if self.budget_runs:
+            metrics['average-cases-removed'] = self.cases_removed / self.budget_runs
+
+        if self.cached:
+            metrics['cached-iterations'] = self.cached
+
+        if self.peak_rss.count:
+            metrics['peak-rss'] = self.peak_rss.summary()
+
+        if self.setup.count:
+            metrics['setup-duration'] = self.setup.summary()
+
+        if self.teardown.count:
+            metrics['teardown-duration'] = self.teardown.summary()
+
+        if self.profile is not None:
+            metrics['profile'] = self.profile.to_dict()
+
+        if self.cache_runs:
+            cache_lookups = self.cache_hits + self.cache_misses
+            metrics['action-cache-hit-rate'] = self.cache_hits / cache_lookups if cache_lookups else 0.0
+
+        if self.distilled_runs:
+            distilled_lookups = self.distilled_hits + self.distilled_fallbacks
+            metrics['distilled-hit-rate'] = self.distilled_hits / distilled_lookups if distilled_lookups else 0.0
+
+        return metrics
+
+
+class PairedComparison:
+    """
+    Paired differences between two variants of a game played on the same seeds.
+
+    Playing both variants on the same seeds removes the variation between
+    seeds from their differences, so fewer iterations are needed to tell
+    the variants apart than with independent seeds. A variant's result is
+    only held until the other variant's game on the same seed finishes.
+    """
+
+    def __init__(self) -> None:
+        self.win_rate = RunningStats()
+        self.rounds = RunningStats()
+        self.rounds_to_win = RunningStats()
+        self.duration = RunningStats()
+        self._unpaired: t.Dict[t.Tuple[bool, int], t.Tuple[bool, int, float]] = {}
+
+    @property
+    def pairs(self) -> int:
+        """The number of seeds both variants finished."""
+        return self.win_rate.count
+
+    def add(self, iteration: int, result: GameResult, *, baseline: bool) -> None:
+        """
+        Add the result of a game, pairing it with the other variant's game on the same seed.
+
+        Parameters
+        ----------
+        iteration : int
+            The simulation iteration, which determines the seed.
+        result : GameResult
+            The game result.
+        baseline : bool
+            If the game was played by the baseline variant. Differences are
+            the other variant's metrics minus the baseline's.
+        """
+        outcome = (bool(result['win']), result['rounds'], result['duration'].total_seconds())
+        other = self._unpaired.pop((not baseline, int(iteration)), None)
+        if other is None:
+            self._unpaired[(baseline, int(iteration))] = outcome
+            return
+        (won, rounds, duration), (baseline_won, baseline_rounds, baseline_duration) = (
+            (other, outcome) if baseline else (outcome, other))
+        self.win_rate.add(100.0 * (won - baseline_won))
+        self.rounds.add(rounds - baseline_rounds)
+        self.duration.add(duration - baseline_duration)
+        if won and baseline_won:
+            self.rounds_to_win.add(rounds - baseline_rounds)
+
+    def metrics(self) -> t.Dict[str, t.Any]:
+        """Get the paired differences, the compared variant's minus the baseline's."""
+        return {
+            'pairs': self.pairs,
+            'win-rate-difference': self.win_rate.summary(),
+            'rounds-difference': self.rounds.summary(),
+            'rounds-to-win-difference': self.rounds_to_win.summary(),
+            'duration-difference': self.duration.summary(),
+        }
@@ -0,0 +1,179 @@
+from collections import deque
+from csv import DictReader
+import heapq
+import json
+import math
+from pathlib import Path
+import typing as t
+
+from .common.game import GameResult
+from .results import RunningStats
+
+Job = t.Tuple[str, str, t.Optional[str]]
+"""The game type, agent type and configuration label of a game."""
+
+
+class LongestJobFirst:
+    """
+    Schedule which starts the games expected to take longest first.
+
+    Game durations vary widely, such as a Cart-Pole game which is not won
+    playing all of its rounds. Starting the longest games first leaves the
+    short ones to fill the workers at the end, so fewer workers sit idle
+    while the last games finish. Durations are predicted from the results
+    of previous games with the same game type, agent type and configuration
+    label, or only the same game and agent type when the label has no
+    results. Games with no prediction at all are started first, so their
+    duration is learned early.
+
+    Games of the same job are predicted to take equally long, so the tasks
+    to start are queued by job and the jobs kept in a heap by their
+    predicted duration, picking each task in logarithmic time in the
+    number of jobs.
+
+    Parameters
+    ----------
+    reprioritize : bool, default False
+        If the duration of each game finished should update the predictions
+        of the games not yet started.
+    """
+
+    def __init__(self, *, reprioritize: bool = False) -> None:
+        self.reprioritize = reprioritize
+        self._durations: t.Dict[Job, RunningStats] = {}
+        self._agent_durations: t.Dict[t.Tuple[str, str], RunningStats] = {}
+        self._queues: t.Dict[Job, t.Deque[t.Tuple[int, t.Hashable]]] = {}
+        self._heap: t.List[t.Tuple[float, int, int, Job]] = []
+        self._versions: t.Dict[Job, int] = {}
+
+    def add(self, job: Job, duration: float) -> None:
+        """
+        Record the duration of a game.
+
+        Parameters
+        ----------
+        job : tuple of str
+            The game type, agent type and configuration label of the game.
+        duration : float
+            The game's duration in seconds.
+        """
+        job = _job_key(job)
+        self._durations.setdefault(job, RunningStats()).add(duration)
+        self._agent_durations.setdefault(job[:2], RunningStats()).add(duration)
+
+    def load(self, path: str) -> None:
+        """
+        Record the durations of the games in a previous results file.
+
+        Parameters
+        ----------
+        path : str
+            A CSV or JSON Lines file written by ``--csv`` or ``--jsonl``.
+        """
+        with open(path, newline='') as results_file:
+            if Path(path).suffix.lower() == '.csv':
+                records = list(DictReader(results_file))
+            else:
+                records = [json.loads(line) for line in results_file if line.strip()]
+        for record in records:
+            try:
+                job = (record['game_type'], record['agent_type'], record.get('configuration'))
+                self.add(job, float(record['duration']))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    def predict(self, job: Job) -> float:
+        """
+        Predict the duration of a game.
+
+        Parameters
+        ----------
+        job : tuple of str
+            The game type, agent type and configuration label of the game.
+
+        Returns
+        -------
+        float
+            The predicted duration in seconds, or infinity when there are no
+            results to predict it from.
+        """
+        job = _job_key(job)
+        stats = self._durations.get(job) or self._agent_durations.get(job[:2])
+        return stats.mean if stats is not None else math.inf
+
+    def schedule(self, keys: t.Iterable[t.Hashable], jobs: t.Mapping[t.Hashable, Job]) -> None:
+        """
+        Queue the tasks to start, replacing any still queued.
+
+        Parameters
+        ----------
+        keys : iterable
+            The keys of the tasks to start, in their default order.
+        jobs : dict
+            The job of each task.
+        """
+        self._queues = {}
+        self._heap = []
+        for index, key in enumerate(keys):
+            self._queues.setdefault(_job_key(jobs[key]), deque()).append((index, key))
+        for job in self._queues:
+            self._push(job)
+
+    def pick(self) -> t.Hashable:
+        """
+        Pick the next task to start.
+
+        Returns
+        -------
+        hashable
+            The key of the queued task predicted to take longest, the first
+            such in the default order when tied.
+
+        Raises
+        ------
+        IndexError
+            When no tasks are queued.
+        """
+        while True:
+            _, _, version, job = heapq.heappop(self._heap)
+            # Jobs are pushed again when their prediction changes, leaving
+            # their earlier entries behind
+            if version == self._versions[job]:
+                break
+        queue = self._queues[job]
+        _, key = queue.popleft()
+        if queue:
+            self._push(job)
+        else:
+            del self._queues[job]
+        return key
+
+    def _push(self, job: Job) -> None:
+        version = self._versions.get(job, 0) + 1
+        self._versions[job] = version
+        heapq.heappush(self._heap, (-self.predict(job), self._queues[job][0][0], version, job))
+
+    def observe(self, job: Job, result: GameResult) -> None:
+        """
+        Record a finished game when reprioritizing.
+
+        Parameters
+        ----------
+        job : tuple of str
+            The game type, agent type and configuration label of the game.
+        result : GameResult
+            The game's result.
+        """
+        if self.reprioritize:
+            self.add(job, result['duration'].total_seconds())
+            # Jobs without results of their own are predicted from their agent's
+            job = _job_key(job)
+            for queued in self._queues:
+                if queued[:2] == job[:2]:
+                    self._push(queued)
+
+
+def _job_key(job: Job) -> Job:
+    """Get a job in the form durations are recorded by."""
+    game_type, agent_type, configuration = job
+    return str(game_type), agent_type, configuration or None
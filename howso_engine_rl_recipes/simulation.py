@@ -1,16 +1,48 @@
 import argparse
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from csv import DictWriter
+from contextlib import ExitStack
 from enum import Enum
+from functools import partial
+import importlib
 import json
 import logging
+import multiprocessing
+import os
+from pathlib import Path
 import sys
-from multiprocessing import Lock
+import tempfile
+import textwrap
+import time
+from time import perf_counter
 
 import numpy as np
 
 from howso.utilities.monitors import Timer
 
+from .allocation import CpuAllocation, is_multithreaded, limit_blas_threads
+from .checkpoint import SimulationCheckpoint
+from .common.agent import BaseAgent
+from .common.profiler import PhaseProfiler
+from .common.resources import PeakMemoryMonitor
+from .common.trainee_pool import trainee_pool
+from .pool import notify, WorkerPool
+from .result_cache import ResultCache
+from .results import CsvResultSink, JsonlResultSink, MetricsAggregator, PairedComparison
+from .scheduling import LongestJobFirst
+from .stopping import SequentialStopping
+
+LOG_FORMAT = "[%(asctime)s] %(levelname)s: %(message)s"
+"""The format of the log messages of the command line."""
+
+PRELOAD_MODULES = (
+    'numpy',
+    'gymnasium',
+    'howso.engine',
+    'howso.direct',
+    'howso_engine_rl_recipes.wafer_thin_mint.game',
+    'howso_engine_rl_recipes.cart_pole.game',
+)
+"""The modules a worker imports before playing, preloaded by a forkserver."""
+
 
 class GameType(str, Enum):
     WTM = "wtm"
@@ -26,9 +58,18 @@ class GameType(str, Enum):
 
 class Simulation:
 
-    def __init__(self, iterations=1, max_workers=1):
-        self.max_workers = max(1, max_workers)
+    def __init__(self, iterations=1, max_workers=None, *, max_tasks_per_worker=None, max_worker_rss=None,
+                 allocation=None, start_method=None):
+        if allocation is not None:
+            if max_workers is not None:
+                raise ValueError('The number of workers is given by the allocation')
+            max_workers = allocation.workers
+        self.max_workers = max(1, max_workers or 1)
+        self.allocation = allocation
+        self.start_method = start_method
         self.iterations = max(1, iterations)
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_worker_rss = max_worker_rss
 
     @classmethod
     def process_args(cls, arguments):
@@ -48,11 +89,37 @@ class Simulation:
             '--iterations', '-i', dest='iterations', type=int, default=1,
             help='The number of times to run the simulation.')
         parser.add_argument(
-            '--workers', '-w', dest='workers', type=int, default=1,
-            help='The number of workers to use to play the game.')
+            '--workers', '-w', dest='workers', type=cls._parse_workers, default=1,
+            help='The number of workers to use to play the game, or "auto" to '
+                 'choose the workers and engine threads from the detected '
+                 'cores and pin each worker to its own CPUs.')
         parser.add_argument(
             '--explanation', '-e', dest='explanation_level', type=int,
             default=1, help='The explanation level to use when reacting.')
+        parser.add_argument(
+            '--desired-conviction', dest='desired_conviction', type=float,
+            default=argparse.SUPPRESS,
+            help='The desired conviction of reacts, higher values explore '
+                 'less. Defaults to a value chosen for each agent.')
+        parser.add_argument(
+            '--engine-config', dest='engine_config', metavar='FILE',
+            default=argparse.SUPPRESS,
+            help='The Howso configuration file the games use.')
+        parser.add_argument(
+            '--explanation-sample', dest='explanation_sample_every', type=int,
+            metavar='N', default=argparse.SUPPRESS,
+            help='Only explain one in every N reacts.')
+        parser.add_argument(
+            '--explanation-background', dest='explanation_background',
+            action='store_true', default=argparse.SUPPRESS,
+            help='Render explanations in a background thread instead of while '
+                 'playing. Explanations are dropped if they cannot be rendered '
+                 'fast enough.')
+        parser.add_argument(
+            '--explanation-output', dest='explanation_output', metavar='FILE',
+            default=argparse.SUPPRESS,
+            help='Append explanations to FILE in JSON Lines format, in a '
+                 'background thread, instead of logging them.')
         parser.add_argument(
             '--seed', '-s', dest='seed', type=int, default=argparse.SUPPRESS,
             help='The Gym seed.')
@@ -60,6 +127,215 @@ class Simulation:
             '--max-rounds', dest='max_rounds', type=int,
             default=argparse.SUPPRESS,
             help='The maximum number of rounds to attempt at winning the game.')
+        parser.add_argument(
+            '--envs', dest='num_envs', type=int, default=argparse.SUPPRESS,
+            help='The number of environments to play rounds in at once. When '
+                 'greater than 1, the agent reacts to all environments in a '
+                 'single batch.')
+        parser.add_argument(
+            '--vector-mode', dest='vector_mode', choices=['sync', 'native'],
+            default=argparse.SUPPRESS,
+            help='How the environments of --envs are stepped. "native" steps '
+                 'all of them at once as NumPy arrays instead of one Gym '
+                 'environment at a time. Defaults to "sync".')
+        parser.add_argument(
+            '--action-cache', dest='action_cache', action='store_true',
+            default=argparse.SUPPRESS,
+            help='Cache the action chosen for each observation and reuse it '
+                 'until the model is trained. (Not all agents support '
+                 'caching)')
+        parser.add_argument(
+            '--cache-invalidate-every', dest='cache_invalidate_every',
+            type=int, default=argparse.SUPPRESS,
+            help='The number of times the model may be trained before cached '
+                 'actions are discarded.')
+        parser.add_argument(
+            '--cache-bin-width', dest='cache_bin_widths', type=float,
+            nargs='+', metavar='WIDTH', default=argparse.SUPPRESS,
+            help='The width of the bins observation components are quantized '
+                 'into for the action cache. Either one width for all '
+                 'components or one width per component.')
+        parser.add_argument(
+            '--cache-size', dest='cache_size', type=int,
+            default=argparse.SUPPRESS,
+            help='The maximum number of cached actions. The least recently '
+                 'used actions are evicted first.')
+        parser.add_argument(
+            '--distilled-policy', dest='distilled_policy', action='store_true',
+            default=argparse.SUPPRESS,
+            help='Act with a nearest-neighbour policy distilled from the '
+                 "trainee's reacts, only reacting to observations it is not "
+                 'confident in. (Not all agents support a distilled policy)')
+        parser.add_argument(
+            '--distill-every', dest='distill_every', type=int,
+            default=argparse.SUPPRESS,
+            help='The number of times the model may be trained before the '
+                 'policy is distilled again.')
+        parser.add_argument(
+            '--distill-neighbors', dest='distill_neighbors', type=int,
+            default=argparse.SUPPRESS,
+            help='The number of nearest contexts which vote on the distilled '
+                 'action.')
+        parser.add_argument(
+            '--distill-min-agreement', dest='distill_min_agreement', type=float,
+            default=argparse.SUPPRESS,
+            help='The fraction of the nearest contexts which must agree on '
+                 'the distilled action, otherwise the observation is reacted '
+                 'to.')
+        parser.add_argument(
+            '--distill-max-distance', dest='distill_max_distance', type=float,
+            default=argparse.SUPPRESS,
+            help='The largest distance to the nearest context, in standard '
+                 'deviations of each feature, at which the distilled policy '
+                 'acts.')
+        parser.add_argument(
+            '--distill-samples', dest='distill_samples', type=int,
+            default=argparse.SUPPRESS,
+            help="The largest number of the contexts of the trainee's cases "
+                 'reacted to when distilling the policy.')
+        parser.add_argument(
+            '--cache-compare', dest='cache_compare', action='store_true',
+            help='Also run every iteration without the action cache using the '
+                 'same seeds and report the difference in win rate.')
+        parser.add_argument(
+            '--step-buffer', dest='step_buffer', action='store_true',
+            default=argparse.SUPPRESS,
+            help='Record the steps of each round client side instead of in '
+                 'the series store, so rounds which are not trained cost no '
+                 'engine calls.')
+        parser.add_argument(
+            '--train-every-rounds', dest='train_every_rounds', type=int,
+            metavar='K', default=argparse.SUPPRESS,
+            help='Buffer the cases of trained rounds and train them together '
+                 'once K rounds are buffered, or M cases when also given.')
+        parser.add_argument(
+            '--train-every-cases', dest='train_every_cases', type=int,
+            metavar='M', default=argparse.SUPPRESS,
+            help='Buffer the cases of trained rounds and train them together '
+                 'once M cases are buffered, or K rounds when also given.')
+        parser.add_argument(
+            '--background-training', dest='background_training',
+            action='store_true', default=argparse.SUPPRESS,
+            help='Train and auto-analyze on a background thread while the '
+                 'next rounds play against the model as it was. Requires the '
+                 'multi-threaded engine.')
+        parser.add_argument(
+            '--max-pending-trains', dest='max_pending_trains', type=int,
+            metavar='N', default=argparse.SUPPRESS,
+            help='The number of background train calls which may be '
+                 'outstanding before play waits for one to finish.')
+        parser.add_argument(
+            '--case-budget', dest='case_budget', type=int,
+            metavar='N', default=argparse.SUPPRESS,
+            help='The maximum number of cases each trainee keeps. Cases are '
+                 'removed when training exceeds it.')
+        parser.add_argument(
+            '--case-budget-strategy', dest='case_budget_strategy',
+            choices=BaseAgent.case_budget_strategies, default=argparse.SUPPRESS,
+            help='How cases are removed when the case budget is exceeded. '
+                 '"lowest-score" removes the cases with the lowest score, '
+                 '"reduce" uses the engine\'s data reduction, which suits '
+                 'cartpole but not wtm. Defaults to "lowest-score".')
+        parser.add_argument(
+            '--profile', dest='profile', action='store_true',
+            default=argparse.SUPPRESS,
+            help='Record the latency of each call in the phases of game play '
+                 '(react, env step, train, ...) and report their percentiles.')
+        parser.add_argument(
+            '--checkpoint', dest='checkpoint_dir', metavar='DIR',
+            default=argparse.SUPPRESS,
+            help='Checkpoint progress to DIR. Running again with the same '
+                 'arguments skips finished iterations and resumes unfinished '
+                 'games from their last checkpoint.')
+        parser.add_argument(
+            '--checkpoint-every', dest='checkpoint_every', type=int,
+            default=argparse.SUPPRESS,
+            help='The number of rounds played between checkpoints of a game. '
+                 '(Games played with several environments are not '
+                 'checkpointed mid-game)')
+        parser.add_argument(
+            '--warm-start', dest='warm_start', metavar='PATH',
+            default=argparse.SUPPRESS,
+            help='Start every game from the trainee saved to PATH instead of '
+                 'an empty trainee.')
+        parser.add_argument(
+            '--save-winner', dest='save_winner', metavar='PATH',
+            default=argparse.SUPPRESS,
+            help='Save the trainee of a game that is won to PATH, for warm '
+                 'starting later games.')
+        parser.add_argument(
+            '--warm-start-compare', dest='warm_start_compare',
+            action='store_true',
+            help='Also run every iteration from an empty trainee using the '
+                 'same seeds and report the rounds and react calls the warm '
+                 'start saved.')
+        parser.add_argument(
+            '--baseline-agent', dest='baseline_agent', metavar='AGENT',
+            choices=['basic', 'time-series'],
+            help='Also run every iteration with AGENT on the same seeds, in '
+                 'the same process pool, and report the paired differences '
+                 'in win rate, rounds and duration.')
+        parser.add_argument(
+            '--baseline-option', dest='baseline_options', metavar='KEY=VALUE',
+            action='append', type=cls._parse_option, default=[],
+            help='Also run every iteration with the game option KEY set to '
+                 'VALUE, a JSON value or a string, and report the paired '
+                 'differences. May be repeated.')
+        parser.add_argument(
+            '--until-confident', dest='until_confident', action='store_true',
+            help='Treat --iterations as a maximum and stop once the outcome '
+                 'is statistically settled: the win rate interval excludes '
+                 '--win-rate-threshold, the rounds to win interval excludes '
+                 '--rounds-threshold and the win rate interval is narrower '
+                 'than --ci-width, for those given. Iterations not yet '
+                 'started are cancelled.')
+        parser.add_argument(
+            '--win-rate-threshold', dest='win_rate_threshold', type=float,
+            metavar='PERCENT',
+            help='With --until-confident, the percentage of games won to '
+                 'decide whether the win rate is above or below.')
+        parser.add_argument(
+            '--rounds-threshold', dest='rounds_threshold', type=float,
+            metavar='ROUNDS',
+            help='With --until-confident, the number of rounds to decide '
+                 'whether the average rounds to win is above or below.')
+        parser.add_argument(
+            '--ci-width', dest='ci_width', type=float, metavar='POINTS',
+            help='With --until-confident, the width in percentage points the '
+                 'win rate interval must narrow to. Defaults to 10 when no '
+                 'threshold is given.')
+        parser.add_argument(
+            '--min-iterations', dest='min_iterations', type=int, default=10,
+            help='With --until-confident, the number of iterations which '
+                 'always finish before stopping.')
+        parser.add_argument(
+            '--master-seed', dest='master_seed', type=int, metavar='SEED',
+            help='Draw the seed of each iteration from SEED, so the seeds are '
+                 'reproducible and kept as iterations are added.')
+        parser.add_argument(
+            '--result-cache', dest='result_cache', metavar='FILE',
+            default=argparse.SUPPRESS,
+            help='Cache the result of every seeded game in the SQLite database '
+                 'FILE and reuse it instead of playing a game with the same '
+                 'options, seed and versions again.')
+        parser.add_argument(
+            '--max-tasks-per-worker', dest='max_tasks_per_worker', type=int, metavar='N',
+            help='Replace each worker process after it played N games, '
+                 'releasing any memory they leaked.')
+        parser.add_argument(
+            '--max-worker-memory', dest='max_worker_memory', type=int, metavar='MB',
+            help='Restart a worker whose resident memory exceeds MB megabytes '
+                 'and play its game again in the new worker.')
+        parser.add_argument(
+            '--no-trainee-pool', dest='trainee_pool', action='store_false',
+            default=argparse.SUPPRESS,
+            help='Create every game\'s trainee from scratch, instead of copying '
+                 'it from an empty template each worker prepares once.')
+        parser.add_argument(
+            '--start-method', dest='start_method', choices=multiprocessing.get_all_start_methods(),
+            help='How worker processes are started. "forkserver" starts them '
+                 'from a server which imported the engine and games once. '
+                 'Defaults to the platform default.')
         parser.add_argument(
             '--render-mode', dest='render_mode', default=argparse.SUPPRESS,
             help='The Gym render mode. (Not all games support all '
@@ -70,161 +346,802 @@ class Simulation:
         parser.add_argument(
             '--csv', dest='csv', metavar='FILE', type=str,
             help="Append results to FILE")
+        parser.add_argument(
+            '--jsonl', dest='jsonl', metavar='FILE', type=str,
+            help="Append results to FILE in JSON Lines format")
         parser.add_argument(
             '--configuration', dest='configuration', type=str,
             help="Record CONFIGURATION in CSV-format output")
+        parser.add_argument(
+            '--summary-only', dest='summary_only', action='store_true',
+            help="Only print the summary instead of every iteration's "
+                 "result. Results are then not kept in memory.")
+
+        args = parser.parse_args(arguments)
+        if args.warm_start_compare and 'warm_start' not in args:
+            parser.error('--warm-start-compare requires --warm-start')
+        if (args.baseline_agent or args.baseline_options) and (args.cache_compare or args.warm_start_compare):
+            parser.error('--baseline-agent and --baseline-option cannot be used with --cache-compare or '
+                         '--warm-start-compare')
+        return args
 
-        return parser.parse_args(arguments)
+    @staticmethod
+    def _parse_workers(value):
+        """Parse a number of workers, or "auto"."""
+        if value == 'auto':
+            return value
+        try:
+            return int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'expected a number or "auto", got {value!r}')
+
+    @staticmethod
+    def _parse_option(value):
+        """Parse a KEY=VALUE game option, the value as JSON or else a string."""
+        key, sep, raw = value.partition('=')
+        if not sep or not key:
+            raise argparse.ArgumentTypeError(f'expected KEY=VALUE, got {value!r}')
+        key = key.replace('-', '_')
+        try:
+            return key, json.loads(raw)
+        except json.JSONDecodeError:
+            return key, raw
 
     @classmethod
     def entrypoint(cls, arguments):
         """CLI entrypoint."""
         args = vars(cls.process_args(arguments))
-        logging.basicConfig(stream=sys.stdout, level=args.pop('log_level'),
-                            format="[%(asctime)s] %(levelname)s: %(message)s")
-        sim = cls(args.pop('iterations'), max_workers=args.pop('workers'))
+        logging.basicConfig(stream=sys.stdout, level=args.pop('log_level'), format=LOG_FORMAT)
+        max_worker_memory = args.pop('max_worker_memory')
+        iterations = args.pop('iterations')
+        workers = args.pop('workers')
+        allocation = None
+        if workers == 'auto':
+            # Paired runs play every seed twice
+            paired = args['baseline_agent'] or args['baseline_options'] or args['cache_compare'] or \
+                args['warm_start_compare']
+            allocation = CpuAllocation.auto(iterations * (2 if paired else 1),
+                                            multithreaded=is_multithreaded(args.get('engine_config')))
+        sim = cls(iterations, max_workers=None if allocation else workers,
+                  max_tasks_per_worker=args.pop('max_tasks_per_worker'),
+                  max_worker_rss=max_worker_memory and max_worker_memory * 2 ** 20,
+                  allocation=allocation, start_method=args.pop('start_method'))
         csvname = args.pop('csv')
+        jsonlname = args.pop('jsonl')
         configuration = args.pop('configuration')
-        result = sim.run(**args)
+        summary_only = args.pop('summary_only')
+        stopping_options = {
+            key: args.pop(key)
+            for key in ('win_rate_threshold', 'rounds_threshold', 'ci_width', 'min_iterations')
+        }
+        if args.pop('until_confident'):
+            args['stopping'] = SequentialStopping(**stopping_options)
+        master_seed = args.pop('master_seed')
+        if master_seed is not None:
+            args['seeds'] = sim.draw_seeds(master_seed)
+
+        with ExitStack() as stack:
+            # Results are written to the sinks as each iteration finishes
+            sinks = []
+            if csvname:
+                sinks.append(stack.enter_context(CsvResultSink(
+                    csvname,
+                    game_type=args.get('game_type'),
+                    agent_type=args.get('agent_type'),
+                    configuration=configuration,
+                    profile=args.get('profile', False)
+                )))
+            if jsonlname:
+                sinks.append(stack.enter_context(JsonlResultSink(
+                    jsonlname,
+                    game_type=str(args.get('game_type')),
+                    agent_type=args.get('agent_type'),
+                    configuration=configuration
+                )))
+
+            warm_start_compare = args.pop('warm_start_compare')
+            cache_compare = args.pop('cache_compare')
+            baseline_options = dict(args.pop('baseline_options'))
+            baseline_agent = args.pop('baseline_agent')
+            if baseline_agent:
+                baseline_options['agent_type'] = baseline_agent
+            if baseline_options:
+                result = sim.run_paired(baseline_options, sinks=sinks, keep_runs=not summary_only, **args)
+            elif cache_compare:
+                result = sim.run_cache_comparison(sinks=sinks, keep_runs=not summary_only, **args)
+            elif warm_start_compare:
+                result = sim.run_warm_start_comparison(sinks=sinks, keep_runs=not summary_only, **args)
+            else:
+                result = sim.run(sinks=sinks, keep_runs=not summary_only, **args)
 
-        # Output results
-        runs = result['runs']
+        if not summary_only:
+            print(json.dumps(result['runs'], indent=4, sort_keys=True, default=str))
+        cls.print_summary(result, game_type=args.get('game_type'), agent_type=args.get('agent_type'))
+
+    @staticmethod
+    def print_summary(result, *, game_type, agent_type):
+        """Print the summary of a simulation's result."""
         metrics = result['metrics']
         percent_won = metrics['percent-won']
         total_won = metrics['total-won']
         avg_win_rounds = metrics['average-rounds-to-win']
+        win_rounds = metrics['rounds-to-win']
+        won_low, won_high = metrics['percent-won-ci95']
         avg_win_cases = metrics['average-win-cases']
         avg_win_high_score = metrics['average-win-high-score']
         avg_win_duration = metrics['average-win-duration']
 
-        print(json.dumps(runs, indent=4, sort_keys=True, default=str))
         print(f"Summary:\n"
-              f"    Game type: {args.get('game_type')}\n"
-              f"    Agent type: {args.get('agent_type')}\n"
-              f"    Total iterations: {len(runs)}\n"
+              f"    Game type: {game_type}\n"
+              f"    Agent type: {agent_type}\n"
+              f"    Total iterations: {metrics['total-iterations']}\n"
               f"    Winning iterations: {total_won}\n"
-              f"    Percentage of winners: {percent_won:.1f}\n"
+              f"    Percentage of winners: {percent_won:.1f} "
+              f"(95% CI {won_low:.1f} - {won_high:.1f})\n"
               f"    Avg. rounds required to win: {avg_win_rounds:.1f}\n"
               f"    Avg. cases required to win: {avg_win_cases:.1f}\n"
               f"    Avg. winning game high score: {avg_win_high_score:.1f}\n"
               f"    Avg. winning game duration: {avg_win_duration}\n"
+              f"    Avg. train calls: {metrics['average-train-calls']:.1f}\n"
+              f"    Avg. analyze calls: {metrics['average-analyze-calls']:.1f}\n"
               f"    Elapsed time: {result['duration']}")
+        if win_rounds['count'] > 1:
+            print(f"    Rounds required to win: 95% CI {win_rounds['ci95-low']:.1f} - {win_rounds['ci95-high']:.1f}, "
+                  f"std. {win_rounds['std']:.1f}, p50 {win_rounds['p50']:.0f}, p95 {win_rounds['p95']:.0f}")
+        if 'average-cases-removed' in metrics:
+            print(f"    Avg. cases removed for the case budget: {metrics['average-cases-removed']:.1f}")
+        if 'average-train-staleness' in metrics:
+            print(f"    Avg. rounds buffered before training: {metrics['average-train-staleness']:.1f}")
+        if 'background-training-overlap' in metrics:
+            print(f"    Background training overlap: {metrics['background-training-overlap']:.3f} "
+                  f"(avg. {metrics['average-background-wait-seconds']:.2f} s waited of "
+                  f"{metrics['average-background-train-seconds']:.2f} s trained)")
+        Simulation._print_resource_summary(result)
+        if result.get('stopped'):
+            print(f"    Stopped early: {result['stopped']}")
+        if result.get('interrupted'):
+            print("    Interrupted: only finished iterations are included")
+        if 'action-cache-hit-rate' in metrics:
+            print(f"    Action cache hit rate: {metrics['action-cache-hit-rate']:.3f}")
+        if 'distilled-hit-rate' in metrics:
+            print(f"    Distilled policy hit rate: {metrics['distilled-hit-rate']:.3f}")
+        if 'cache-win-rate-delta' in metrics:
+            print(f"    Uncached percentage of winners: {metrics['uncached-percent-won']:.1f}\n"
+                  f"    Win rate delta vs. uncached: {metrics['cache-win-rate-delta']:+.1f}")
+        if 'react-calls-saved' in metrics:
+            print(f"    Avg. rounds from cold start: {metrics['cold-average-rounds']:.1f}\n"
+                  f"    Avg. rounds saved by warm start: {metrics['rounds-saved']:.1f}\n"
+                  f"    Avg. react calls saved by warm start: {metrics['react-calls-saved']:.1f}")
+        if 'comparison' in result:
+            comparison = result['comparison']
+            print(f"    Paired differences vs. baseline over {comparison['pairs']} seeds:")
+            for key, label in (('win-rate-difference', 'Win rate (points)'),
+                               ('rounds-difference', 'Rounds'),
+                               ('rounds-to-win-difference', 'Rounds to win'),
+                               ('duration-difference', 'Duration (s)')):
+                difference = comparison[key]
+                if difference['count']:
+                    print(f"        {label}: {difference['mean']:+.1f} "
+                          f"(95% CI {difference['ci95-low']:+.1f} - {difference['ci95-high']:+.1f})")
+        if 'profile' in metrics:
+            profile = PhaseProfiler.from_dict(metrics['profile'])
+            print("    Profile:\n" + textwrap.indent(profile.format(), ' ' * 8))
 
-        if csvname:
-            with open(csvname, 'a', newline='') as csvfile:
-                writer = DictWriter(
-                    csvfile,
-                    ['game_type', 'agent_type', 'configuration', 'iteration', 'win', 'rounds', 'high_score',
-                     'total_cases', 'duration']
-                )
-                if csvfile.tell() == 0:
-                    writer.writeheader()
-                for iteration, run in runs.items():
-                    writer.writerow({
-                        'game_type': args.get('game_type'),
-                        'agent_type': args.get('agent_type'),
-                        'configuration': configuration,
-                        'iteration': int(iteration),
-                        'win': 'true' if run['win'] else 'false',
-                        'rounds': run['rounds'],
-                        'high_score': run['high_score'],
-                        'total_cases': run['total_cases'],
-                        'duration': run['duration'].total_seconds()
-                    })
+    @staticmethod
+    def _print_resource_summary(result):
+        """Print how a simulation's workers and memory were used."""
+        metrics = result['metrics']
+        if 'allocation' in result:
+            print(f"    Allocation: {CpuAllocation(**result['allocation']).describe()}")
+        if 'cached-iterations' in metrics:
+            print(f"    Iterations from the result cache: {metrics['cached-iterations']}")
+        if 'utilization' in result:
+            print(f"    Worker utilization: {100 * result['utilization']:.1f}%")
+        startup = result.get('startup')
+        if startup and startup['workers_ready'] is not None:
+            print(f"    Worker startup ({startup['start_method']}): ready after {startup['workers_ready']:.2f} s, "
+                  f"client {startup['client']:.2f} s, imports {sum(startup['imports'].values()):.2f} s")
+        if startup and startup['first_step'] is not None:
+            print(f"    Time to first step: {startup['first_step']:.2f} s")
+        if result.get('worker_restarts') or result.get('worker_recycles'):
+            print(f"    Workers restarted: {result['worker_restarts']}, recycled: {result['worker_recycles']}")
+        if 'setup-duration' in metrics and 'teardown-duration' in metrics:
+            print(f"    Avg. agent setup / teardown time: {metrics['setup-duration']['mean']:.3f} s / "
+                  f"{metrics['teardown-duration']['mean']:.3f} s")
+        if 'peak-rss' in metrics:
+            peak_rss = metrics['peak-rss']
+            print(f"    Peak memory per iteration: p50 {peak_rss['p50'] / 2 ** 20:.0f} MB, "
+                  f"max {peak_rss['max'] / 2 ** 20:.0f} MB")
 
     @staticmethod
-    def _process_initializer(lock, logger):
-        """Initialize the HowsoClient once for each process."""
-        with lock:
-            # This instantiates the underlying HowsoClient instance which
-            # may write/read from the file system so we do so in a lock
-            try:
-                from howso import engine
-                engine.get_client()
-            except Exception:
-                logger.exception('Failed to instantiate client in initializer')
+    def _process_initializer(logger, engine_threads=None, scratch_root=None, log_config=None):
+        """Initialize the HowsoClient once for each process, and report how long it took."""
+        if log_config is not None and not logging.getLogger().handlers:
+            # Workers which are not forked do not inherit the logging setup
+            logging.basicConfig(stream=getattr(sys, log_config['stream']), level=log_config['level'],
+                                format=LOG_FORMAT)
+        limit_blas_threads()
+        set_engine_threads(engine_threads)
+        imports = {}
+        for module in PRELOAD_MODULES:
+            started = perf_counter()
+            importlib.import_module(module)
+            imports[module] = perf_counter() - started
+        started = perf_counter()
+        try:
+            # Each worker's client has its own scratch directory, so they are
+            # created concurrently without touching each other's files
+            use_scratch_dir(scratch_root and tempfile.mkdtemp(prefix=f'worker-{os.getpid()}-', dir=scratch_root))
+        except Exception:
+            logger.exception('Failed to instantiate client in initializer')
+        notify('initialized', imports=imports, client=perf_counter() - started)
 
-    def run(self, **kwargs):
-        """Run the game across multiple processes."""
-        runs = {}
+    def run(self, *, seeds=None, sinks=(), keep_runs=True, checkpoint_dir=None, stopping=None, **kwargs):
+        """
+        Run the game across multiple processes.
 
+        Parameters
+        ----------
+        seeds : list of int, optional
+            The seed of each iteration. When not specified, each iteration
+            uses the `seed` keyword argument or a random seed.
+        sinks : list of ResultSink, optional
+            Sinks each iteration's result is written to as soon as it
+            finishes.
+        keep_runs : bool, default True
+            If each iteration's result should be kept and returned. Metrics
+            are computed as iterations finish either way.
+        checkpoint_dir : str, optional
+            The directory to checkpoint the simulation's progress to. When it
+            holds the checkpoint of a previous run with the same options,
+            finished iterations are skipped and unfinished ones resumed.
+        stopping : SequentialStopping, optional
+            The rule to stop the simulation with once its outcome is settled,
+            before all iterations finish. Iterations not yet started are
+            cancelled.
+        **kwargs
+            The game options.
+        """
         logger = logging.getLogger('howso.rl.examples')
         logger.info(f"Running {self.iterations} {kwargs.get('agent_type')} "
                     f"simulations of {kwargs.get('game_type')} with "
                     f"{self.max_workers} workers")
+        stopped = None
+
+        with ExitStack() as stack:
+            variant = _VariantRun(self.iterations, kwargs, seeds=seeds, sinks=sinks, keep_runs=keep_runs,
+                                  checkpoint_dir=checkpoint_dir, stack=stack)
 
-        with Timer() as timer:
-            if self.max_workers == 1:
+            def complete(iteration, result):
+                variant.complete(iteration, result)
+                logger.info('Iteration %.0f finished: win=%s rounds=%s (%d/%d done, %.1f%% won)',
+                            iteration, result['win'], result['rounds'],
+                            variant.aggregator.total, self.iterations, variant.aggregator.percent_won)
+
+            def settled():
+                nonlocal stopped
+                if stopping is not None and stopped is None:
+                    stopped = stopping.check(variant.aggregator)
+                return stopped is not None
+
+            tasks = {} if settled() else {i: (i, options) for i, options in variant.pending.items()}
+            with Timer() as timer:
+                interrupted, pool_stats = self._run_iterations(tasks, complete, settled, logger)
+
+        self._log_finished(logger, variant.aggregator.total, timer.duration, interrupted, stopped)
+        return {
+            'runs': variant.runs,
+            'duration': timer.duration,
+            'metrics': variant.aggregator.metrics(),
+            **pool_stats,
+            'interrupted': interrupted,
+            'stopped': stopped,
+        }
+
+    def run_paired(self, baseline_options, *, seeds=None, sinks=(), keep_runs=True, checkpoint_dir=None,
+                   stopping=None, **kwargs):
+        """
+        Run the game and a baseline variant of it on the same seeds, in one process pool.
+
+        Each seed is played by both variants, so the paired differences
+        between them exclude the variation between seeds. The iterations of
+        both variants are interleaved so each pair finishes close together.
+
+        Parameters
+        ----------
+        baseline_options : dict
+            The game options replaced to play the baseline variant.
+        seeds : list of int, optional
+            The seed of each iteration. When not specified, the seeds are
+            drawn from the `seed` keyword argument, or at random.
+        sinks : list of ResultSink, optional
+            Sinks each iteration's result of the game, but not the baseline,
+            is written to.
+        keep_runs : bool, default True
+            If each iteration's result of the game should be kept and
+            returned.
+        checkpoint_dir : str, optional
+            The directory to checkpoint the simulation's progress to. Each
+            variant is checkpointed to a subdirectory.
+        stopping : SequentialStopping, optional
+            The rule to stop the comparison with once the difference in win
+            rate is settled.
+        **kwargs
+            The game options.
+
+        Returns
+        -------
+        dict
+            The result of the game, extended by the ``baseline`` result and
+            the paired differences in ``comparison``.
+        """
+        logger = logging.getLogger('howso.rl.examples')
+        logger.info(f"Running {self.iterations} paired {kwargs.get('agent_type')} "
+                    f"simulations of {kwargs.get('game_type')} with "
+                    f"{self.max_workers} workers")
+        seed = kwargs.pop('seed', None)
+        if seeds is None:
+            seeds = self.draw_seeds(seed)
+        comparison = PairedComparison()
+        stopped = None
+
+        with ExitStack() as stack:
+            variants = {
+                True: _VariantRun(self.iterations, {**kwargs, **baseline_options}, seeds=seeds,
+                                  keep_runs=False, stack=stack,
+                                  checkpoint_dir=checkpoint_dir and os.path.join(checkpoint_dir, 'baseline')),
+                False: _VariantRun(self.iterations, kwargs, seeds=seeds, sinks=sinks,
+                                   keep_runs=keep_runs, stack=stack,
+                                   checkpoint_dir=checkpoint_dir and os.path.join(checkpoint_dir, 'compared')),
+            }
+            for baseline, variant in variants.items():
+                for i, result in variant.restored.items():
+                    comparison.add(i, result, baseline=baseline)
+
+            def complete(key, result):
+                baseline, iteration = key
+                variants[baseline].complete(iteration, result)
+                comparison.add(iteration, result, baseline=baseline)
+                logger.info('%s iteration %.0f finished: win=%s rounds=%s (%d/%d pairs done)',
+                            'Baseline' if baseline else 'Compared', iteration, result['win'],
+                            result['rounds'], comparison.pairs, self.iterations)
+
+            def settled():
+                nonlocal stopped
+                if stopping is not None and stopped is None:
+                    stopped = stopping.check_paired(comparison)
+                return stopped is not None
+
+            tasks = {}
+            if not settled():
                 for i in range(self.iterations):
-                    runs[i] = self.run_single(i, **kwargs)
-            else:
-                lock = Lock()
-                pool = ProcessPoolExecutor(max_workers=self.max_workers,
-                                           initializer=self._process_initializer,
-                                           initargs=[lock, logger])
-                tasks = {}
-                try:
-                    tasks = {
-                        pool.submit(self.run_single, i, **kwargs): i
-                        for i in range(self.iterations)
-                    }
-                    for future in as_completed(tasks):
-                        iteration = tasks[future]
-                        runs[iteration] = result = future.result()
-                        logger.info('Iteration %.0f finished: win=%s rounds=%s',
-                                    iteration, result['win'], result['rounds'])
-                except KeyboardInterrupt:
-                    for task in tasks:
-                        task.cancel()
-                    pool.shutdown(wait=False)
-                    exit()
-
-        logger.info(
-            f'Completed {self.iterations} simulations in {timer.duration}')
+                    for baseline, variant in variants.items():
+                        if i in variant.pending:
+                            tasks[(baseline, i)] = (i, variant.pending[i])
+            with Timer() as timer:
+                interrupted, pool_stats = self._run_iterations(tasks, complete, settled, logger)
+
+        self._log_finished(logger, comparison.pairs, timer.duration, interrupted, stopped)
         return {
-            'runs': runs,
+            'runs': variants[False].runs,
             'duration': timer.duration,
-            'metrics': self.get_metrics(runs)
+            'metrics': variants[False].aggregator.metrics(),
+            'baseline': {'metrics': variants[True].aggregator.metrics()},
+            'comparison': comparison.metrics(),
+            **pool_stats,
+            'interrupted': interrupted,
+            'stopped': stopped,
+        }
+
+    def draw_seeds(self, seed=None):
+        """
+        Draw the seed of each iteration.
+
+        Parameters
+        ----------
+        seed : int, optional
+            The seed the iterations' seeds are drawn from. When not
+            specified, they are drawn at random.
+
+        Returns
+        -------
+        list of int
+            The seed of each iteration.
+        """
+        # Each iteration's seed is spawned independently of the others, so
+        # the seeds of the first iterations are kept as iterations are added
+        children = np.random.SeedSequence(seed).spawn(self.iterations)
+        return [int(child.generate_state(1)[0] % (2 ** 31 - 2)) + 1 for child in children]
+
+    def _log_finished(self, logger, finished, duration, interrupted, stopped):
+        """Log how a simulation of ``finished`` iterations ended."""
+        if interrupted:
+            logger.warning(f'Interrupted after {finished} of {self.iterations} '
+                           f'simulations in {duration}')
+        elif stopped is not None:
+            logger.info(f'Stopped after {finished} of {self.iterations} '
+                        f'simulations in {duration}: {stopped}')
+        else:
+            logger.info(
+                f'Completed {self.iterations} simulations in {duration}')
+
+    def _run_iterations(self, tasks, complete, settled, logger, *, scheduler=None, jobs=None):
+        """
+        Run the given iterations, sequentially or in a process pool.
+
+        ``tasks`` maps a key passed to ``complete`` to the iteration and its
+        game options. Iterations stop being started once ``settled`` returns
+        True, those already running still finish and are included. When a
+        ``scheduler`` is given, the next iteration started is the one it
+        picks by the job of each task in ``jobs``, otherwise they are started
+        in order. Returns True if the iterations were interrupted before
+        finishing, and the statistics of the pool such as the fraction of
+        the workers' time spent playing.
+        """
+        remaining = dict(tasks)
+        if scheduler is not None:
+            scheduler.schedule(remaining, jobs)
+
+        def start_next(count):
+            for _ in range(min(count, len(remaining))):
+                key = next(iter(remaining)) if scheduler is None else scheduler.pick()
+                yield key, remaining.pop(key)
+
+        def finish(key, result):
+            if scheduler is not None:
+                scheduler.observe(jobs[key], result)
+            complete(key, result)
+
+        stats = {} if self.allocation is None else {'allocation': self.allocation.as_dict()}
+        # Workers are only recycled or watched in a pool
+        if self.max_workers == 1 and self.max_tasks_per_worker is None and self.max_worker_rss is None:
+            if self.allocation is not None:
+                set_engine_threads(self.allocation.engine_threads)
+            try:
+                for key, (i, kwargs) in start_next(len(remaining)):
+                    finish(key, self.run_single(i, **kwargs))
+                    if settled():
+                        break
+            except KeyboardInterrupt:
+                return True, {'utilization': 1.0, **stats}
+            return False, {'utilization': 1.0, **stats}
+        interrupted, pool_stats = self._run_pool(start_next, finish, settled, logger)
+        return interrupted, {**pool_stats, **stats}
+
+    def _run_pool(self, start_next, finish, settled, logger):
+        """Run the iterations returned by ``start_next`` in a process pool."""
+        started = perf_counter()
+        started_at = time.time()
+        busy = 0.0
+        submitted = {}
+        allocation = self.allocation or CpuAllocation(self.max_workers)
+        scratch = tempfile.TemporaryDirectory(prefix='howso-rl-workers-', ignore_cleanup_errors=True)
+        pool = WorkerPool(self.max_workers,
+                          initializer=self._process_initializer,
+                          initargs=[logger, allocation.engine_threads, scratch.name, _log_config()],
+                          max_tasks_per_worker=self.max_tasks_per_worker,
+                          max_rss=self.max_worker_rss,
+                          cpu_sets=allocation.cpu_sets,
+                          start_method=self.start_method,
+                          preload=PRELOAD_MODULES)
+        try:
+            # Only as many iterations as workers are submitted at a time, so
+            # none are started once the outcome is settled and the next one
+            # is picked when a worker frees up
+            for key, (i, kwargs) in start_next(pool.idle):
+                submitted[key] = perf_counter()
+                pool.submit(key, self.run_single, i, **kwargs)
+            while pool.running:
+                for key, result in pool.wait():
+                    busy += perf_counter() - submitted.pop(key)
+                    finish(key, result)
+                if not settled():
+                    for key, (i, kwargs) in start_next(pool.idle):
+                        submitted[key] = perf_counter()
+                        pool.submit(key, self.run_single, i, **kwargs)
+            pool.shutdown()
+        except KeyboardInterrupt:
+            pool.terminate()
+            return True, self._pool_stats(pool, busy, started, started_at)
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            scratch.cleanup()
+        return False, self._pool_stats(pool, busy, started, started_at)
+
+    def _pool_stats(self, pool, busy, started, started_at):
+        """Get the utilization of a pool's workers since ``started``, their replacements and their startup."""
+        elapsed = perf_counter() - started
+        return {
+            'utilization': min(1.0, busy / (self.max_workers * elapsed)) if elapsed > 0 else 1.0,
+            'worker_restarts': pool.restarts,
+            'worker_recycles': pool.recycles,
+            'startup': self._startup_stats(pool, started_at),
         }
 
-    def run_single(self, iteration: int, *, game_type: str, **kwargs):
-        """Run a single simulation of a game."""
+    def _startup_stats(self, pool, started_at):
+        """
+        Get how long a pool's workers took to start, from the events they reported.
+
+        Times are in seconds since the pool was created at ``started_at``.
+        Workers which replaced others are not included in ``ready``.
+        """
+        events = {}
+        for notice in pool.notices:
+            events.setdefault(notice['event'], []).append(notice)
+        ready = sorted(notice['time'] - started_at for notice in events.get('ready', ()))[:self.max_workers]
+        initialized = events.get('initialized', ())
+        imports = {}
+        for notice in initialized:
+            for module, seconds in notice['imports'].items():
+                imports[module] = max(seconds, imports.get(module, 0.0))
+        return {
+            'start_method': pool.start_method,
+            'workers_ready': max(ready) if ready else None,
+            'first_step': min((n['time'] - started_at for n in events.get('first_step', ())), default=None),
+            'client': max((n['client'] for n in initialized), default=None),
+            'imports': imports,
+        }
+
+    def run_cache_comparison(self, *, sinks=(), keep_runs=True, **kwargs):
+        """
+        Run the game with and without the action cache on the same seeds.
+
+        The results are those of the cached runs, with their metrics
+        extended by the win rate of the uncached runs and the difference
+        between the two. Only the cached runs are written to the sinks.
+        """
+        result = self.run_paired({'action_cache': False}, sinks=sinks, keep_runs=keep_runs,
+                                 **kwargs, action_cache=True)
+
+        metrics = result['metrics']
+        metrics['uncached-percent-won'] = result['baseline']['metrics']['percent-won']
+        metrics['cache-win-rate-delta'] = metrics['percent-won'] - metrics['uncached-percent-won']
+        return result
+
+    def run_warm_start_comparison(self, *, sinks=(), keep_runs=True, **kwargs):
+        """
+        Run the game from the warm start trainee and from scratch on the same seeds.
+
+        The results are those of the warm started runs, with their metrics
+        extended by the average rounds and react calls the warm start saved
+        per game compared to starting from an empty trainee. Only the warm
+        started runs are written to the sinks.
+        """
+        result = self.run_paired({'warm_start': None, 'save_winner': None}, sinks=sinks, keep_runs=keep_runs,
+                                 **kwargs)
+
+        metrics = result['metrics']
+        cold = result['baseline']['metrics']
+        metrics['cold-average-rounds'] = cold['average-rounds']
+        metrics['cold-average-react-calls'] = cold['average-react-calls']
+        metrics['rounds-saved'] = metrics['cold-average-rounds'] - metrics['average-rounds']
+        metrics['react-calls-saved'] = metrics['cold-average-react-calls'] - metrics['average-react-calls']
+        return result
+
+    def run_single(self, iteration: int, *, game_type: str, engine_config=None, result_cache=None, **kwargs):
+        """Run a single simulation of a game, or get its result from the result cache."""
+        identity = {'game_type': str(game_type), **kwargs}
+        if engine_config is not None:
+            identity['engine_config'] = engine_config
+        if result_cache is not None and ResultCache.cacheable(identity):
+            with ResultCache(result_cache) as cache:
+                result = cache.get(identity)
+            if result is not None:
+                logging.getLogger('howso.rl.examples').info(
+                    'Iteration %d found in result cache %s', iteration, result_cache)
+                return {**result, 'cached': True}
+        else:
+            result_cache = None
+
+        if engine_config is not None or _engine_clients or _engine_threads is not None:
+            use_engine_config(engine_config)
         # Import locally so loggers are created after setup
         GameClass = import_game(game_type)
         # force a random seed for every iteration
         if "seed" not in kwargs:
             kwargs["seed"] = (1 + iteration) * int(100000 * np.random.rand())
-        with GameClass(**kwargs) as game:
+        with PeakMemoryMonitor() as memory, GameClass(**kwargs) as game:
+            # Lets a worker's pool measure the time until its first step
+            game.on_agent_ready = partial(notify, 'first_step')
             result = game.play()
+        result['peak_rss'] = memory.peak
+        if result_cache is not None:
+            with ResultCache(result_cache) as cache:
+                cache.put(identity, result)
         return result
 
     def get_metrics(self, runs):
         """Calculate and return metrics for given runs."""
-        total_won = sum([1 for v in runs.values() if v['win']])
-        percent_won = (100.0 * total_won / len(runs))
-        if total_won > 0:
-            avg_win_high_score = np.mean(
-                [v['high_score'] for v in runs.values() if v['win']])
-            avg_win_duration = np.mean(
-                [v['duration'] for v in runs.values() if v['win']])
-            avg_win_cases = np.mean(
-                [v['total_cases'] for v in runs.values() if v['win']])
-            avg_win_rounds = np.mean(
-                [v['rounds'] for v in runs.values() if v['win']])
-        else:
-            avg_win_high_score = float("nan")
-            avg_win_duration = float("nan")
-            avg_win_cases = float("nan")
-            avg_win_rounds = float("nan")
+        aggregator = MetricsAggregator()
+        for run in runs.values():
+            aggregator.add(run)
+        return aggregator.metrics()
 
-        return {
-            'total-won': total_won,
-            'percent-won': percent_won,
-            'average-rounds-to-win': avg_win_rounds,
-            'average-win-high-score': avg_win_high_score,
-            'average-win-duration': avg_win_duration,
-            'average-win-cases': avg_win_cases
-        }
+
+class _VariantRun:
+    """
+    The iterations of one variant of a simulation and their results.
+
+    Parameters
+    ----------
+    iterations : int
+        The number of iterations of the simulation.
+    options : dict
+        The game options of the variant.
+    seeds : list of int, optional
+        The seed of each iteration.
+    sinks : list of ResultSink, optional
+        Sinks each iteration's result is written to.
+    keep_runs : bool, default True
+        If each iteration's result should be kept.
+    checkpoint_dir : str, optional
+        The directory to checkpoint the variant's progress to.
+    stack : ExitStack
+        The stack the checkpoint is closed with.
+    """
+
+    def __init__(self, iterations, options, *, seeds=None, sinks=(), keep_runs=True, checkpoint_dir=None,
+                 stack):
+        self.aggregator = MetricsAggregator()
+        self.runs = {}
+        self.keep_runs = keep_runs
+        self.sinks = list(sinks)
+        self.restored = {}
+        checkpoint = None
+        if checkpoint_dir is not None:
+            checkpoint = stack.enter_context(SimulationCheckpoint(
+                checkpoint_dir, iterations, options, seeds=seeds))
+            seeds = checkpoint.seeds
+            self.sinks.append(checkpoint)
+            self.restored = dict(sorted(checkpoint.completed.items()))
+            for i, result in self.restored.items():
+                self._record(i, result)
+
+        # The game options of each iteration which has not finished yet
+        self.pending = {}
+        for i in range(iterations):
+            if i in self.restored:
+                continue
+            self.pending[i] = options if seeds is None else {**options, 'seed': seeds[i]}
+            if checkpoint is not None:
+                self.pending[i] = {**self.pending[i], 'checkpoint_dir': checkpoint.iteration_dir(i)}
+
+    def complete(self, iteration, result):
+        """Record the result of a finished iteration and write it to the sinks."""
+        self._record(iteration, result)
+        for sink in self.sinks:
+            sink.write(iteration, result)
+
+    def _record(self, iteration, result):
+        self.aggregator.add(result)
+        if self.keep_runs:
+            self.runs[iteration] = result
+
+
+def _log_config():
+    """Get the logging setup of the command line, for workers which do not inherit it."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream in (sys.stdout, sys.stderr):
+            return {
+                'stream': 'stdout' if handler.stream is sys.stdout else 'stderr',
+                'level': logging.getLogger().level,
+            }
+    return None
+
+
+def create_scheduler(history=None, reprioritize=False):
+    """
+    Create the schedule to start games in from the command line arguments.
+
+    Parameters
+    ----------
+    history : list of str, optional
+        The results files to predict game durations from.
+    reprioritize : bool, default False
+        If predictions should be updated as games finish.
+
+    Returns
+    -------
+    LongestJobFirst or None
+        The schedule, or None to start games in order.
+    """
+    if not history and not reprioritize:
+        return None
+    scheduler = LongestJobFirst(reprioritize=reprioritize)
+    for path in history or ():
+        scheduler.load(path)
+    return scheduler
+
+
+_engine_clients = {}
+"""The Howso client of each engine configuration used by this process."""
+
+_engine_threads = None
+"""The threads of the multi-threaded engine of every client used by this process."""
+
+_scratch_dir = None
+"""The directory the clients of this process save trainees to by default, when not the working directory."""
+
+
+def use_scratch_dir(scratch_dir=None):
+    """
+    Create the default Howso client of this process, saving trainees to a scratch directory.
+
+    Clients created by :func:`use_engine_config` afterwards use the same
+    scratch directory.
+
+    Parameters
+    ----------
+    scratch_dir : str, optional
+        The directory relative trainee paths are resolved against. Defaults
+        to the working directory.
+    """
+    global _scratch_dir
+    from howso import engine
+    from howso.client.pandas import HowsoPandasClient
+
+    _scratch_dir = scratch_dir
+    # Clients inherited from a forked parent are not used by this process
+    _engine_clients.clear()
+    trainee_pool.clear(delete=False)
+    _engine_clients[None] = HowsoPandasClient(**_client_options())
+    engine.use_client(_engine_clients[None])
+
+
+def _client_options():
+    """Get the options of the Howso clients created by this process."""
+    return {} if _scratch_dir is None else {'default_persist_path': _scratch_dir}
+
+
+def set_engine_threads(threads=None):
+    """
+    Limit the threads of the multi-threaded engine of the clients used next.
+
+    Parameters
+    ----------
+    threads : int, optional
+        The number of threads. When not specified, the engine's default is
+        kept.
+    """
+    global _engine_threads
+    _engine_threads = threads
+
+
+def use_engine_config(engine_config=None):
+    """
+    Use the Howso client of an engine configuration for the trainees created next.
+
+    Clients are created once per process and configuration, so the games
+    played by a worker may use different configurations without restarting
+    it.
+
+    Parameters
+    ----------
+    engine_config : str, optional
+        The Howso configuration file. When not specified, the process's
+        default client is used.
+
+    See Also
+    --------
+    set_engine_threads : Limits the threads of the client's engine.
+    """
+    from howso import engine
+    from howso.client.pandas import HowsoPandasClient
+
+    if not _engine_clients:
+        _engine_clients[None] = engine.get_client()
+    key = None if engine_config is None else str(Path(engine_config).resolve())
+    if key not in _engine_clients:
+        if not Path(key).is_file():
+            raise ValueError(f'Engine configuration "{engine_config}" does not exist')
+        _engine_clients[key] = HowsoPandasClient(config_path=key, **_client_options())
+    client = _engine_clients[key]
+    if _engine_threads is not None and getattr(client, 'amlg', None) is not None:
+        # The single-threaded engine ignores this
+        client.amlg.set_max_num_threads(_engine_threads)
+    engine.use_client(client)
 
 
 def import_game(game_type: GameType):
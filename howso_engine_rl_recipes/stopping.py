@@ -0,0 +1,161 @@
+import math
+from statistics import NormalDist
+import typing as t
+
+from .results import MetricsAggregator, PairedComparison, wilson_interval
+
+
+class SequentialStopping:
+    """
+    Rule which stops a simulation once its outcome is statistically settled.
+
+    The rule is checked after every finished iteration. Each criterion
+    given must be settled for the simulation to stop. Checking after every
+    iteration gives chance fluctuations many opportunities to cross a
+    threshold, so the error rate ``alpha`` is spent across the checks: the
+    k-th check past ``min_iterations`` uses intervals at the level
+    ``1 - 6 * alpha / (pi**2 * k**2)``, whose error rates sum to ``alpha``.
+    The chance a simulation ever stops with a threshold on the wrong side
+    of its interval is then at most ``alpha``, however many iterations are
+    checked, up to the accuracy of the intervals' normal approximations,
+    which are poor over fewer than about 10 iterations.
+    With the default, the first check uses a 97% interval, the 10th a
+    99.97% interval and the 100th a 99.9997% interval, so settling an
+    outcome close to a threshold takes more iterations than a single test
+    at the end would.
+
+    Parameters
+    ----------
+    win_rate_threshold : float, optional
+        A percentage of games won. Settled once the confidence interval of
+        the win rate is entirely above or below it.
+    rounds_threshold : float, optional
+        A number of rounds. Settled once the confidence interval of the
+        average rounds to win is entirely above or below it, or once the win
+        rate is settled below ``win_rate_threshold`` since too few games are
+        won to measure it.
+    ci_width : float, optional
+        Settled once the confidence interval of the win rate is at most this
+        many percentage points wide. Defaults to 10 when no threshold is
+        given.
+    min_iterations : int, default 10
+        The number of iterations which always finish before stopping. In a
+        paired comparison, the number of seeds both variants finish.
+    alpha : float, default 0.05
+        The chance of stopping with a wrong decision, over every check.
+    """
+
+    def __init__(
+        self,
+        *,
+        win_rate_threshold: t.Optional[float] = None,
+        rounds_threshold: t.Optional[float] = None,
+        ci_width: t.Optional[float] = None,
+        min_iterations: int = 10,
+        alpha: float = 0.05
+    ) -> None:
+        if ci_width is None and win_rate_threshold is None and rounds_threshold is None:
+            ci_width = 10.0
+        self.win_rate_threshold = win_rate_threshold
+        self.rounds_threshold = rounds_threshold
+        self.ci_width = ci_width
+        self.min_iterations = max(1, min_iterations)
+        self.alpha = alpha
+
+    def z(self, count: int) -> float:
+        """
+        Get the standard score of the intervals checked after a number of iterations.
+
+        Parameters
+        ----------
+        count : int
+            The number of iterations finished, at least ``min_iterations``.
+
+        Returns
+        -------
+        float
+            The standard score, which grows with each check.
+        """
+        check = count - self.min_iterations + 1
+        alpha = 6 * self.alpha / (math.pi ** 2 * check ** 2)
+        return NormalDist().inv_cdf(1 - alpha / 2)
+
+    def check(self, aggregator: MetricsAggregator) -> t.Optional[str]:
+        """
+        Check if the simulation's outcome is settled.
+
+        Parameters
+        ----------
+        aggregator : MetricsAggregator
+            The metrics of the iterations finished so far.
+
+        Returns
+        -------
+        str or None
+            A description of the settled outcome, or None when the
+            simulation should continue.
+        """
+        if aggregator.total < self.min_iterations:
+            return None
+        z = self.z(aggregator.total)
+        low, high = (100.0 * bound for bound in wilson_interval(aggregator.won, aggregator.total, z))
+        win_rate = f'win rate {low:.1f}% - {high:.1f}%'
+        reasons = []
+
+        win_rate_below = False
+        if self.win_rate_threshold is not None:
+            if low > self.win_rate_threshold:
+                reasons.append(f'{win_rate} above {self.win_rate_threshold:g}%')
+            elif high < self.win_rate_threshold:
+                reasons.append(f'{win_rate} below {self.win_rate_threshold:g}%')
+                win_rate_below = True
+            else:
+                return None
+
+        if self.ci_width is not None:
+            if high - low > self.ci_width:
+                return None
+            reasons.append(f'{win_rate} within {self.ci_width:g} points')
+
+        if self.rounds_threshold is not None:
+            rounds_low, rounds_high = aggregator.win_rounds.confidence_interval(z)
+            rounds = f'rounds to win {rounds_low:.1f} - {rounds_high:.1f}'
+            if rounds_low > self.rounds_threshold:
+                reasons.append(f'{rounds} above {self.rounds_threshold:g}')
+            elif rounds_high < self.rounds_threshold:
+                reasons.append(f'{rounds} below {self.rounds_threshold:g}')
+            elif win_rate_below:
+                reasons.append('too few wins to measure rounds to win')
+            else:
+                return None
+
+        return ', '.join(reasons)
+
+    def check_paired(self, comparison: PairedComparison) -> t.Optional[str]:
+        """
+        Check if the difference between two variants of a paired comparison is settled.
+
+        The difference in win rate is settled once its confidence interval
+        excludes zero, or is at most ``ci_width`` percentage points wide.
+        The thresholds only apply to a single variant.
+
+        Parameters
+        ----------
+        comparison : PairedComparison
+            The paired differences of the seeds finished so far.
+
+        Returns
+        -------
+        str or None
+            A description of the settled difference, or None when the
+            comparison should continue.
+        """
+        if comparison.pairs < self.min_iterations:
+            return None
+        low, high = comparison.win_rate.confidence_interval(self.z(comparison.pairs))
+        difference = f'win rate difference {low:+.1f} - {high:+.1f} points'
+        if low > 0 or high < 0:
+            return f'{difference} excludes 0'
+        if self.ci_width is not None and high - low <= self.ci_width:
+            return f'{difference} within {self.ci_width:g} points'
+        return None
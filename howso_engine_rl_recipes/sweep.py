@@ -0,0 +1,340 @@
+import argparse
+from contextlib import ExitStack
+import itertools
+import json
+import logging
+import multiprocessing
+from pathlib import Path
+import sys
+
+from howso.utilities.monitors import Timer
+
+from .results import CsvResultSink, JsonlResultSink, MetricsAggregator
+from .allocation import CpuAllocation, is_multithreaded
+from .simulation import create_scheduler, import_game, LOG_FORMAT, Simulation
+
+logger = logging.getLogger('howso.rl.examples.sweep')
+
+UNLABELED_OPTIONS = ('game_type', 'agent_type')
+"""The options recorded in their own columns instead of the configuration label."""
+
+
+class Sweep(Simulation):
+    """
+    Play every configuration of a grid of game options in one process pool.
+
+    Every (configuration, iteration) cell is scheduled on the same pool of
+    workers, so workers stay busy until the whole sweep finishes instead of
+    idling at the end of each configuration's iterations. Every
+    configuration plays the same seeds.
+
+    Parameters
+    ----------
+    iterations : int, default 1
+        The number of games played by each configuration.
+    max_workers : int, optional
+        The number of worker processes. Defaults to a single worker, or the
+        workers of the allocation.
+    allocation : CpuAllocation, optional
+        The workers, engine threads and CPUs of each worker. ``max_workers``
+        must not be given with it.
+    """
+
+    @classmethod
+    def process_args(cls, arguments):
+        """Process command line arguments."""
+        parser = argparse.ArgumentParser(
+            prog='python -m howso_engine_rl_recipes sweep',
+            description='Play every configuration of a grid of game options.')
+        parser.add_argument(
+            'grid', metavar='FILE',
+            help='A YAML or JSON file of the grid. Its "grid" maps each game '
+                 'option, such as game_type, agent_type, desired_conviction, '
+                 'explanation_level, max_rounds or engine_config, to the '
+                 'values to sweep, or is a list of such mappings. Its '
+                 '"options" are used by every configuration, and it may set '
+                 '"iterations" and "seed".')
+        parser.add_argument(
+            '--iterations', '-i', dest='iterations', type=int,
+            help='The number of games played by each configuration. '
+                 'Overrides the grid file.')
+        parser.add_argument(
+            '--workers', '-w', dest='workers', type=cls._parse_workers, default=1,
+            help='The number of workers to use to play the games, or "auto" '
+                 'to choose the workers and engine threads from the detected '
+                 'cores and pin each worker to its own CPUs.')
+        parser.add_argument(
+            '--seed', '-s', dest='seed', type=int,
+            help='The seed the seeds of the games are drawn from. Overrides '
+                 'the grid file.')
+        parser.add_argument(
+            '--csv', dest='csv', metavar='FILE', type=str,
+            help="Append results to FILE, labeled by configuration.")
+        parser.add_argument(
+            '--jsonl', dest='jsonl', metavar='FILE', type=str,
+            help="Append results to FILE in JSON Lines format, labeled by "
+                 "configuration.")
+        parser.add_argument(
+            '--output', '-o', dest='output', metavar='FILE',
+            help='Write the metrics of each configuration to FILE.')
+        parser.add_argument(
+            '--schedule-history', dest='schedule_history', metavar='FILE', nargs='+',
+            help='Start the games expected to take longest first, predicting '
+                 'their durations from the results in these CSV or JSON Lines '
+                 'files written by a previous run, so fewer workers idle while '
+                 'the last games finish.')
+        parser.add_argument(
+            '--reprioritize', dest='reprioritize', action='store_true',
+            help='Start the games expected to take longest first, updating '
+                 'the predicted durations as games finish.')
+        parser.add_argument(
+            '--max-tasks-per-worker', dest='max_tasks_per_worker', type=int, metavar='N',
+            help='Replace each worker process after it played N games, '
+                 'releasing any memory they leaked.')
+        parser.add_argument(
+            '--max-worker-memory', dest='max_worker_memory', type=int, metavar='MB',
+            help='Restart a worker whose resident memory exceeds MB megabytes '
+                 'and play its game again in the new worker.')
+        parser.add_argument(
+            '--start-method', dest='start_method', choices=multiprocessing.get_all_start_methods(),
+            help='How worker processes are started. "forkserver" starts them '
+                 'from a server which imported the engine and games once. '
+                 'Defaults to the platform default.')
+        parser.add_argument(
+            '--result-cache', dest='result_cache', metavar='FILE',
+            help='Cache the result of every game in the SQLite database FILE '
+                 'and reuse it instead of playing the same game again, so '
+                 'extending a sweep only plays its new games.')
+        parser.add_argument(
+            '--log-level', dest='log_level', default=logging.INFO,
+            help="The the log level to use.")
+
+        return parser.parse_args(arguments)
+
+    @classmethod
+    def entrypoint(cls, arguments):
+        """CLI entrypoint."""
+        args = cls.process_args(arguments)
+        logging.basicConfig(stream=sys.stderr, level=args.log_level, format=LOG_FORMAT)
+        grid = load_grid(args.grid)
+        configurations = expand_grid(grid.get('grid', {}), grid.get('options'))
+        iterations = args.iterations or grid.get('iterations', 1)
+        seed = args.seed if args.seed is not None else grid.get('seed')
+        allocation = None
+        if args.workers == 'auto':
+            # Engine threads are only worth sharing out when every configuration can use them
+            multithreaded = all(is_multithreaded(c['options'].get('engine_config')) for c in configurations)
+            allocation = CpuAllocation.auto(iterations * len(configurations), multithreaded=multithreaded)
+        sweep = cls(iterations, max_workers=None if allocation else args.workers,
+                    max_tasks_per_worker=args.max_tasks_per_worker,
+                    max_worker_rss=args.max_worker_memory and args.max_worker_memory * 2 ** 20,
+                    allocation=allocation, start_method=args.start_method)
+
+        with ExitStack() as stack:
+            # Each configuration appends to the same files with its own labels
+            profile = any(c['options'].get('profile', False) for c in configurations)
+            sinks = []
+            for configuration in configurations:
+                label = configuration['configuration']
+                sinks.append([])
+                if args.csv:
+                    sinks[-1].append(stack.enter_context(CsvResultSink(
+                        args.csv,
+                        game_type=str(configuration['options']['game_type']),
+                        agent_type=configuration['options']['agent_type'],
+                        configuration=label,
+                        profile=profile
+                    )))
+                if args.jsonl:
+                    sinks[-1].append(stack.enter_context(JsonlResultSink(
+                        args.jsonl,
+                        game_type=str(configuration['options']['game_type']),
+                        agent_type=configuration['options']['agent_type'],
+                        configuration=label
+                    )))
+            scheduler = create_scheduler(args.schedule_history, args.reprioritize)
+            report = sweep.run_sweep(configurations, seed=seed, sinks=sinks, scheduler=scheduler,
+                                     result_cache=args.result_cache)
+
+        output = json.dumps(report, indent=4, default=str)
+        print(output)
+        if args.output:
+            with open(args.output, 'w') as output_file:
+                output_file.write(output)
+
+    def run_sweep(self, configurations, *, seed=None, seeds=None, sinks=None, scheduler=None, result_cache=None):
+        """
+        Play every iteration of every configuration.
+
+        Parameters
+        ----------
+        configurations : list of dict
+            The configurations returned by :func:`expand_grid`.
+        seed : int, optional
+            The seed the seeds of the games are drawn from. The seeds of the
+            first iterations are kept when iterations are added, so games
+            already in the result cache are not played again.
+        seeds : list of int, optional
+            The seed of each iteration, the same for every configuration.
+        sinks : list of list of ResultSink, optional
+            The sinks each configuration's results are written to, in the
+            order of the configurations.
+        scheduler : LongestJobFirst, optional
+            The schedule to start games in, instead of iteration by
+            iteration.
+        result_cache : str, optional
+            The SQLite database to cache the result of every game in.
+
+        Returns
+        -------
+        dict
+            The sweep report, with the metrics of each configuration.
+        """
+        if seeds is None:
+            seeds = self.draw_seeds(seed)
+        sinks = sinks or [()] * len(configurations)
+        aggregators = [MetricsAggregator() for _ in configurations]
+        logger.info(f'Sweeping {len(configurations)} configurations of {self.iterations} '
+                    f'iterations with {self.max_workers} workers')
+
+        # Cells are ordered iteration first, so every configuration has
+        # results early on should the sweep be interrupted
+        tasks = {}
+        for i in range(self.iterations):
+            for index, configuration in enumerate(configurations):
+                options = {**configuration['options'], 'seed': seeds[i]}
+                if result_cache is not None:
+                    options['result_cache'] = result_cache
+                tasks[(index, i)] = (i, options)
+
+        done = 0
+
+        def complete(key, result):
+            nonlocal done
+            index, iteration = key
+            done += 1
+            aggregators[index].add(result)
+            for sink in sinks[index]:
+                sink.write(iteration, result)
+            logger.info('%s iteration %.0f finished: win=%s rounds=%s (%d/%d done)',
+                        configurations[index]['configuration'], iteration, result['win'], result['rounds'],
+                        done, len(tasks))
+
+        jobs = {
+            (index, i): (str(c['options']['game_type']), c['options']['agent_type'], c['configuration'])
+            for index, c in enumerate(configurations)
+            for i in range(self.iterations)
+        }
+        with Timer() as timer:
+            interrupted, pool_stats = self._run_iterations(
+                tasks, complete, lambda: False, logger, scheduler=scheduler, jobs=jobs)
+
+        if interrupted:
+            logger.warning(f'Interrupted after {done} of {len(tasks)} games in {timer.duration}')
+        else:
+            logger.info(f'Completed {len(tasks)} games in {timer.duration}, '
+                        f'workers were busy {100 * pool_stats["utilization"]:.1f}% of the time')
+        return {
+            'iterations': self.iterations,
+            'seeds': seeds,
+            'duration': timer.duration.total_seconds(),
+            **pool_stats,
+            'interrupted': interrupted,
+            'configurations': [
+                {
+                    'configuration': c['configuration'],
+                    'game_type': str(c['options']['game_type']),
+                    'agent_type': c['options']['agent_type'],
+                    'options': c['options'],
+                    'metrics': aggregator.metrics(),
+                }
+                for c, aggregator in zip(configurations, aggregators)
+            ],
+        }
+
+
+def load_grid(path):
+    """
+    Load a sweep's grid file.
+
+    Parameters
+    ----------
+    path : str
+        The YAML file, with a .yml or .yaml suffix, or JSON file.
+
+    Returns
+    -------
+    dict
+        The grid file's contents.
+    """
+    with open(path) as grid_file:
+        if Path(path).suffix.lower() in ('.yml', '.yaml'):
+            import yaml
+            grid = yaml.safe_load(grid_file)
+        else:
+            grid = json.load(grid_file)
+    if not isinstance(grid, dict):
+        raise ValueError(f'Grid file "{path}" must contain a mapping')
+    return grid
+
+
+def expand_grid(grid, options=None):
+    """
+    Expand a grid of game options into every configuration of it.
+
+    Parameters
+    ----------
+    grid : dict or list of dict
+        Maps each game option to the list of values to sweep, or a single
+        value. A list of grids is expanded into the configurations of each.
+    options : dict, optional
+        The game options of every configuration, which the grid overrides.
+
+    Returns
+    -------
+    list of dict
+        The configurations, each with its ``options`` and a
+        ``configuration`` label of the swept options which vary. Agents a
+        game does not support are skipped.
+    """
+    grids = grid if isinstance(grid, list) else [grid]
+    options = {key.replace('-', '_'): value for key, value in (options or {}).items()}
+    configurations = []
+    for grid in grids:
+        values = {
+            key.replace('-', '_'): value if isinstance(value, list) else [value]
+            for key, value in grid.items()
+        }
+        for combination in itertools.product(*values.values()):
+            configurations.append({**options, **dict(zip(values, combination))})
+
+    labeled = []
+    for configuration in configurations:
+        configuration.setdefault('game_type', 'wtm')
+        configuration.setdefault('agent_type', 'basic')
+        if configuration['agent_type'] not in import_game(configuration['game_type']).agent_registry:
+            logger.warning('Skipping the unsupported agent "%s" of %s',
+                           configuration['agent_type'], configuration['game_type'])
+            continue
+        labeled.append(configuration)
+
+    varying = [
+        key for key in dict.fromkeys(key for c in labeled for key in c)
+        if key not in UNLABELED_OPTIONS and len({_format_value(key, c.get(key)) for c in labeled}) > 1
+    ]
+    return [
+        {
+            'configuration': ' '.join(
+                f'{key}={_format_value(key, c[key])}' for key in varying if key in c
+            ) or 'default',
+            'options': c,
+        }
+        for c in labeled
+    ]
+
+
+def _format_value(key, value):
+    """Format an option's value for a configuration label."""
+    if key == 'engine_config' and value is not None:
+        return Path(value).stem
+    return json.dumps(value) if isinstance(value, (dict, list)) else str(value)
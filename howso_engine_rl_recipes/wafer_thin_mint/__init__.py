@@ -4,3 +4,9 @@ register(
     id="WaferThinMint-v0",
     entry_point="howso_engine_rl_recipes.wafer_thin_mint.wafer_thin_mint:WaferThinMintEnv",
 )
+
+register(
+    id="WaferThinMintNative-v0",
+    entry_point="howso_engine_rl_recipes.wafer_thin_mint.wafer_thin_mint:WaferThinMintEnv",
+    vector_entry_point="howso_engine_rl_recipes.wafer_thin_mint.wafer_thin_mint:WaferThinMintVectorEnv",
+)
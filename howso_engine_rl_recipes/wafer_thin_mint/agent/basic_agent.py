@@ -1,9 +1,9 @@
 import logging
 
-from howso import engine
-import pandas as pd
+import numpy as np
 
 from ...common.agent import BaseAgent
+from ...common.training import StepBuffer
 
 logger = logging.getLogger('howso.rl.examples.wafer_thin_mint')
 
@@ -29,6 +29,8 @@ class BasicAgent(BaseAgent[int, int]):
     the round.
     """
 
+    default_desired_conviction = 2
+
     def setup(self) -> None:
         """Setup the agent."""
         self.features = {
@@ -46,16 +48,20 @@ class BasicAgent(BaseAgent[int, int]):
         self.action_features = ['action']
         self.goal_features_map = dict(zip(self.goal_features, [{"goal": "max"}]))
 
-        self.trainee = engine.Trainee(features=self.features)
-        self.trainee.set_auto_analyze_params(
+        # Steps of rounds recorded client side, instead of in the series store
+        self.steps = StepBuffer(len(self.context_features) + len(self.action_features))
+
+        self.trainee = self.create_trainee(
+            self.features,
             auto_analyze_enabled=True,
             context_features=self.context_features + self.action_features,
             rebalance_features=self.goal_features
         )
-        if self.seed is not None:
-            self.trainee.set_random_seed(self.seed)
-        # Show all DataFrame columns
-        pd.set_option('display.max_columns', None)
+        if self.explanations.enabled:
+            import pandas as pd
+
+            # Show all DataFrame columns of the explanations
+            pd.set_option('display.max_columns', None)
 
     def done(self, won=False) -> None:
         """Cleanup when finished."""
@@ -63,90 +69,86 @@ class BasicAgent(BaseAgent[int, int]):
 
     def act(self, observation, round_num, step) -> int:
         """React to the observation to get the action."""
-        desired_conviction = 2
-
-        details = {}
-        if self.explanation_level >= 2:
-            details['influential_cases'] = True
+        if self.records_cases:
+            return self.act_batch([observation], [round_num], [step])[0]
 
-        if self.explanation_level >= 3:
-            details['feature_full_accuracy_contributions'] = True
-            details['feature_full_residuals'] = True
-            details['feature_full_residuals_for_case'] = True
-            details['boundary_cases'] = 3
-
-        react = self.trainee.react(
-            desired_conviction=desired_conviction,
+        explain = self.explanations.should_explain()
+        react = self.react(
+            desired_conviction=self.desired_conviction,
             contexts=[[observation]],
             context_features=self.context_features,
             action_features=self.action_features,
             goal_features_map=self.goal_features_map,
             into_series_store=str(round_num),
-            details=details,
+            details=self.get_react_details() if explain else None,
         )
         action = react['action']['action'][0]
 
-        self.output_explanations(react)
+        if explain:
+            with self.profiler.phase('explanations'):
+                self.explanations.record(react['details'], round=round_num, step=step)
 
         return int(action)
 
+    def act_batch(self, observations, round_nums, steps) -> list[int]:
+        """React to the observations of several rounds at once."""
+        contexts = [[int(observation)] for observation in observations]
+        actions = [None] * len(contexts)
+        if self.action_cache is not None:
+            actions = [self.action_cache.get(context[0]) for context in contexts]
+        pending = [i for i, action in enumerate(actions) if action is None]
+        if self.distilled is not None and pending:
+            # Only the observations the distilled policy is unsure of are reacted to
+            distilled = self.distilled_actions(
+                [contexts[i] for i in pending],
+                desired_conviction=self.desired_conviction,
+                goal_features_map=self.goal_features_map,
+            )
+            for i, action in zip(pending, distilled):
+                if action is not None:
+                    actions[i] = int(action)
+            pending = [i for i in pending if actions[i] is None]
+
+        if pending:
+            explain = self.explanations.should_explain()
+            react = self.react(
+                desired_conviction=self.desired_conviction,
+                num_cases_to_generate=len(pending),
+                contexts=[contexts[i] for i in pending],
+                context_features=self.context_features,
+                action_features=self.action_features,
+                goal_features_map=self.goal_features_map,
+                details=self.get_react_details() if explain else None,
+            )
+            for index, i in enumerate(pending):
+                actions[i] = int(react['action']['action'][index])
+                if self.action_cache is not None:
+                    self.action_cache.put(contexts[i][0], actions[i])
+                if explain:
+                    with self.profiler.phase('explanations'):
+                        self.explanations.record(react['details'], index, round=int(round_nums[i]), step=int(steps[i]))
+
+        # A react can only record into a single series store, so the steps of
+        # each round are kept here until the round's reward is assigned
+        for context, action, round_num in zip(contexts, actions, round_nums):
+            self.steps.append(round_num, [*context, action])
+
+        return actions
+
     def assign_reward(self, observation, scores, round_num, step) -> None:
         """Assign reward to model."""
-        score = scores[-1]
+        score = scores.last
+        steps = self.steps.pop(round_num)
 
-        self.trainee.train(
-            features=self.goal_features,
-            cases=[[score]],
-            series=str(round_num),
-        )
+        if steps is not None:
+            self.train_round(
+                np.column_stack([steps, np.full(len(steps), score)]).tolist(),
+                features=self.context_features + self.action_features + self.goal_features,
+            )
+        else:
+            self.train([[score]], features=self.goal_features, series=str(round_num))
 
         logger.info(
-            'Round %s: score=%.0f', round_num, score)
-
-    def output_explanations(self, react) -> None:
-        """
-        Log react explanations based on explanation_level.
-
-        Parameters
-        ----------
-        react : dict
-            A react response.
-        """
-        if self.explanation_level >= 2:
-            # Get influential cases
-            influential_cases_data = react['explanation']['influential_cases']
-            if influential_cases_data is not None:
-                influential_cases_list = influential_cases_data[0]
-                influential_cases = pd.DataFrame(influential_cases_list)
-                logger.info("Most influential cases: \n%s", influential_cases)
-
-        if self.explanation_level >= 3:
-            # Get boundary cases
-            boundary_cases_data = react['explanation']['boundary_cases']
-            if boundary_cases_data is not None:
-                boundary_cases_list = boundary_cases_data[0]
-                boundary_cases = pd.DataFrame(boundary_cases_list)
-                logger.info("Boundary cases: \n%s", boundary_cases)
-
-            # Get mean decrease in accuracy
-            ac_data = react['explanation']['feature_full_accuracy_contributions'][0]
-            if ac_data is not None:
-                for feature in ac_data:
-                    logger.info(
-                        "Removing feature '%s' reduces accuracy of best action by: %s",
-                        feature, ac_data[feature])
-
-            # Get residuals
-            residuals_data = react['explanation']['feature_full_residuals_for_case'][0]
-            if residuals_data is not None:
-                for feature in residuals_data:
-                    logger.info(
-                        "Feature %s has a residual of: %s",
-                        feature, residuals_data[feature])
-
-            residuals_data = react['explanation']['feature_full_residuals'][0]
-            if residuals_data is not None:
-                for feature in residuals_data:
-                    logger.info(
-                        "Feature %s has a residual of: %s",
-                        feature, residuals_data[feature])
+            'Round %s: score=%.0f cases=%d react_latency=%.2fms',
+            round_num, score, self.num_cases, 1000 * self.pop_react_latency()
+        )
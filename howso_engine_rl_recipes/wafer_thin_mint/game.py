@@ -1,3 +1,4 @@
+from datetime import timedelta
 import logging
 
 from howso.utilities.monitors import Timer
@@ -18,44 +19,53 @@ class WaferThinMintGame(BaseGame):
     """
 
     game_id = 'WaferThinMint-v0'
+    native_game_id = 'WaferThinMintNative-v0'
 
     win_threshold = 6
     """Required average score across all rounds to consider the game won."""
 
+    agent_registry = agent_registry
+
     def __init__(self, agent_type: str, **kwargs) -> None:
         try:
-            agent = agent_registry[agent_type]
+            agent = self.agent_registry[agent_type]
         except KeyError:
             raise ValueError("Invalid agent type. Allowed types include: "
-                             f"[{', '.join(agent_registry.keys())}]")
+                             f"[{', '.join(self.agent_registry.keys())}]")
         kwargs.setdefault("max_rounds", 150)
         super().__init__(agent, **kwargs)
 
-    def play(self) -> GameResult:
-        """Play the game."""
+    def play_sequential(self) -> GameResult:
+        """Play the game one round at a time."""
         observation, _ = self.env.reset(seed=self.seed)
-        agent = self.agent_class(
-            env=self.env,
-            explanation_level=self.explanation_level,
-            seed=self.seed,
-            win_threshold=self.win_threshold,
-        )
-        agent.setup()
+        agent = self.create_agent()
 
         round_num = 1
         step = 1
         highest_score = 0
-        final_scores = []
+        final_scores = self.create_score_tracker()
         round_score = 0
         is_win = False
         total_cases = 0
+        total_steps = 0
 
         timer = Timer()
         timer.start()
 
+        # Continue an interrupted game from its last checkpoint
+        elapsed = timedelta()
+        state = self.load_checkpoint(agent)
+        if state is not None:
+            round_num = state['round_num']
+            final_scores = self.create_score_tracker(state['final_scores'])
+            highest_score = state['highest_score']
+            total_steps = state['total_steps']
+            elapsed = timedelta(seconds=state['duration'])
+            observation, _ = self.env.reset(seed=None if self.seed is None else self.seed + round_num)
+
         while True:
             if round_num > self.max_rounds:
-                avg_score = np.mean(final_scores)
+                avg_score = final_scores.mean
                 if avg_score >= self.win_threshold:
                     logger.info(f"Game won after {self.max_rounds} games with an average score of {avg_score:.3f}")
                     is_win = True
@@ -66,7 +76,9 @@ class WaferThinMintGame(BaseGame):
 
             action = agent.act(observation, round_num, step)
             logger.debug("Act: %s", action)
-            observation, reward, terminated, truncated, _ = self.env.step(action)
+            with self.profiler.phase('env_step'):
+                observation, reward, terminated, truncated, _ = self.env.step(action)
+            total_steps += 1
 
             if reward == -1:
                 # If they've hit the 'explosion threshold' assign low score
@@ -89,21 +101,110 @@ class WaferThinMintGame(BaseGame):
                 step = 1
                 round_num += 1
                 logger.debug("Game env reset")
+
+                if self.checkpoint_due(round_num):
+                    self.save_checkpoint(
+                        agent, round_num,
+                        final_scores=final_scores.get_state(),
+                        highest_score=float(highest_score),
+                        total_steps=total_steps,
+                        duration=(elapsed + timer.duration).total_seconds()
+                    )
             else:
                 logger.debug('Step %s:%s ob=%s', round_num, step, observation)
                 step += 1
 
         # Capture total number of trained cases
+        agent.flush_training()
+        if hasattr(agent, 'trainee'):
+            total_cases = agent.trainee.get_num_training_cases()
+
+        timer.end()
+        self.finish_agent(agent, is_win)
+        return {
+            **self.get_metrics(agent),
+            'win': is_win,
+            'rounds': len(final_scores),
+            'high_score': highest_score,
+            'duration': elapsed + timer.duration,
+            'total_cases': total_cases,
+            'steps': total_steps,
+            'average_score': final_scores.mean,
+        }
+
+    def play_vectorized(self) -> GameResult:
+        """Play the game with rounds from all environments in lockstep."""
+        observations, _ = self.vector_env.reset(seed=self.seed)
+        agent = self.create_agent()
+
+        # The round and step being played in each environment
+        round_nums = np.arange(1, self.num_envs + 1)
+        steps = np.ones(self.num_envs, dtype=int)
+        round_scores = np.zeros(self.num_envs)
+        next_round_num = self.num_envs + 1
+        highest_score = 0
+        final_scores = self.create_score_tracker()
+        is_win = False
+        total_cases = 0
+        total_steps = 0
+
+        timer = Timer()
+        timer.start()
+
+        while len(final_scores) < self.max_rounds:
+            actions = agent.act_batch(observations, round_nums, steps)
+            logger.debug("Act: %s", actions)
+            with self.profiler.phase('env_step'):
+                observations, rewards, terminated, truncated, info = self.vector_env.step(np.asarray(actions))
+            total_steps += self.num_envs
+
+            # If they've hit the 'explosion threshold' assign low score,
+            # otherwise assign the step reward
+            round_scores = np.where(rewards == -1, -10, round_scores + rewards)
+
+            for index in np.flatnonzero(terminated | truncated):
+                # Game has ended, the environment was already reset
+                observation = info['final_obs'][index]
+                round_num = int(round_nums[index])
+                round_score = float(round_scores[index])
+                logger.debug('Terminated %s:%s ob=%s',
+                             round_num, steps[index], observation)
+                final_scores.append(round_score)
+
+                agent.assign_reward(observation, final_scores, round_num, int(steps[index]))
+
+                highest_score = max(highest_score, round_score)
+                round_scores[index] = 0
+                steps[index] = 0
+                round_nums[index] = next_round_num
+                next_round_num += 1
+                if len(final_scores) >= self.max_rounds:
+                    break
+
+            steps += 1
+
+        avg_score = final_scores.mean
+        if avg_score >= self.win_threshold:
+            logger.info(f"Game won after {self.max_rounds} games with an average score of {avg_score:.3f}")
+            is_win = True
+        else:
+            logger.error(
+                f"Failed to win within {self.max_rounds} games with an average score of {avg_score:.3f}")
+
+        # Capture total number of trained cases
+        agent.flush_training()
         if hasattr(agent, 'trainee'):
             total_cases = agent.trainee.get_num_training_cases()
 
-        agent.done(is_win)
         timer.end()
+        self.finish_agent(agent, is_win)
         return {
+            **self.get_metrics(agent),
             'win': is_win,
             'rounds': len(final_scores),
             'high_score': highest_score,
             'duration': timer.duration,
             'total_cases': total_cases,
-            'average_score': float(np.mean(final_scores)),
+            'steps': total_steps,
+            'average_score': final_scores.mean,
         }
@@ -2,6 +2,9 @@ from typing import Optional
 
 import gymnasium as gym
 from gymnasium import logger, spaces
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+import numpy as np
 
 
 class WaferThinMintEnv(gym.Env[int, int]):
@@ -97,3 +100,73 @@ class WaferThinMintEnv(gym.Env[int, int]):
         self.state = 0
         self.steps_beyond_terminated = None
         return self.state, {}
+
+
+class WaferThinMintVectorEnv(VectorEnv):
+    """
+    A batch of wafer_thin_mint games stepped together as NumPy arrays.
+
+    Plays the same game as `WaferThinMintEnv` in every environment, but
+    steps all of them with a few array operations instead of one Python
+    environment at a time.
+
+    ## Autoreset
+
+        Games which end are reset within the same step, so every observation
+        returned is the start of an active game. The final observation of
+        each game which ended is returned in `info["final_obs"]`, marked by
+        `info["_final_obs"]`.
+    """
+
+    metadata = {"render_modes": [], "autoreset_mode": AutoresetMode.SAME_STEP}
+
+    def __init__(
+        self,
+        num_envs: int = 1,
+        render_mode: Optional[str] = None,
+        explode_threshold: int = 10,
+    ):
+        if render_mode is not None:
+            raise ValueError("WaferThinMintVectorEnv does not support rendering")
+        self.num_envs = num_envs
+        self.explode_threshold = explode_threshold
+        self.render_mode = render_mode
+        self.state = None
+
+        self.single_action_space = spaces.Discrete(2)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.single_observation_space = spaces.Discrete(self.explode_threshold + 1)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+    def step(self, actions):
+        if self.state is None:
+            raise gym.error.ResetNeeded("Call reset before using step method.")
+        actions = np.asarray(actions)
+        if actions.shape != (self.num_envs,) or not np.isin(actions, (0, 1)).all():
+            raise ValueError(f"{actions!r} invalid")
+
+        # Eat another wafer
+        eat = actions == 1
+        self.state += eat
+
+        exploded = self.state >= self.explode_threshold
+        terminated = exploded | ~eat
+        rewards = np.where(terminated, np.where(exploded, -1.0, 0.0), 1.0)
+        truncated = np.zeros(self.num_envs, dtype=np.bool_)
+
+        info = {}
+        if terminated.any():
+            info = {"final_obs": self.state.copy(), "_final_obs": terminated}
+            self.state[terminated] = 0
+
+        return self.state.copy(), rewards, terminated, truncated, info
+
+    def reset(
+        self,
+        *,
+        seed: Optional[int] = None,
+        options: Optional[dict] = None,
+    ):
+        super().reset(seed=seed)
+        self.state = np.zeros(self.num_envs, dtype=np.int64)
+        return self.state.copy(), {}
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import pytest
+
+from howso_engine_rl_recipes.allocation import CpuAllocation, is_multithreaded
+from howso_engine_rl_recipes.benchmark import DEFAULT_ENGINE_CONFIGS
+from howso_engine_rl_recipes.simulation import Simulation
+
+CONFIG_DIR = Path(__file__).parent.parent / 'config'
+
+
+@pytest.mark.parametrize('tasks, multithreaded, workers, engine_threads, cpu_sets', [
+    (None, True, 4, 1, [[0, 1], [2, 3], [4, 5], [6, 7]]),
+    (10, False, 4, 1, [[0, 1], [2, 3], [4, 5], [6, 7]]),
+    (2, True, 2, 2, [[0, 1, 2, 3], [4, 5, 6, 7]]),
+    (2, False, 2, 1, [[0, 1, 2, 3], [4, 5, 6, 7]]),
+    (3, True, 3, 1, [[0, 1], [2, 3, 4], [5, 6, 7]]),
+])
+def test_auto_allocation(tasks, multithreaded, workers, engine_threads, cpu_sets):
+    """Test the cores are shared out between the workers and their engine threads."""
+    allocation = CpuAllocation.auto(tasks, multithreaded=multithreaded, cpus=range(8), cores=4)
+    assert allocation.workers == workers
+    assert allocation.engine_threads == engine_threads
+    assert allocation.cpu_sets == cpu_sets
+    assert sorted(cpu for cpus in allocation.cpu_sets for cpu in cpus) == list(range(8))
+
+
+def test_auto_allocation_detects_cpus():
+    """Test the detected CPUs are allocated without oversubscribing them."""
+    allocation = CpuAllocation.auto()
+    assert 1 <= allocation.workers <= allocation.cores
+    assert allocation.workers * allocation.engine_threads <= allocation.cores
+    assert len(allocation.cpu_sets) == allocation.workers
+    assert all(allocation.cpu_sets)
+
+
+def test_is_multithreaded():
+    """Test the engine configurations are told apart by their Amalgam library."""
+    st_config, mt_config = DEFAULT_ENGINE_CONFIGS
+    assert is_multithreaded(mt_config)
+    assert not is_multithreaded(st_config)
+    assert not is_multithreaded(CONFIG_DIR / 'latest-st-debug-howso.yml')
+
+
+def test_simulation_workers_from_allocation():
+    """Test the allocation is the only source of a simulation's number of workers."""
+    allocation = CpuAllocation.auto(2, multithreaded=False, cpus=range(8), cores=4)
+    assert Simulation(2, allocation=allocation).max_workers == 2
+    with pytest.raises(ValueError):
+        Simulation(2, max_workers=1, allocation=allocation)
@@ -0,0 +1,32 @@
+from pathlib import Path
+
+import howso_engine_rl_recipes
+from howso_engine_rl_recipes.benchmark import compare_to_baseline, DEFAULT_ENGINE_CONFIGS
+
+
+def _report(**metrics):
+    return {'results': [{
+        'game_type': 'wtm',
+        'agent_type': 'basic',
+        'engine_config': 'latest-st-howso',
+        **metrics
+    }]}
+
+
+def test_compare_to_baseline():
+    """Test only metrics that moved the wrong way beyond tolerance regress."""
+    baseline = _report(steps_per_sec=100.0, react_latency_p95=0.010, peak_rss=1000)
+    report = _report(steps_per_sec=85.0, react_latency_p95=0.0105, peak_rss=800)
+
+    regressions = compare_to_baseline(report, baseline, tolerance=0.1)
+    assert [r['metric'] for r in regressions] == ['steps_per_sec']
+    assert compare_to_baseline(report, baseline, tolerance=0.2) == []
+
+
+def test_default_engine_configs(monkeypatch, tmp_path):
+    """Test the default configurations are installed with the package and found from any working directory."""
+    monkeypatch.chdir(tmp_path)
+    package_dir = Path(howso_engine_rl_recipes.__file__).resolve().parent
+    for config in DEFAULT_ENGINE_CONFIGS:
+        assert config.is_file()
+        assert config.resolve().parent == package_dir / 'config'
@@ -1,7 +1,11 @@
 import logging
 import pytest
-from multiprocessing import cpu_count
 
+import gymnasium as gym
+import numpy as np
+
+from howso_engine_rl_recipes.cart_pole.agent import BasicAgent, TimeSeriesAgent
+from howso_engine_rl_recipes.allocation import CpuAllocation
 from howso_engine_rl_recipes.simulation import GameType, Simulation
 
 logger = logging.getLogger("howso.rl.tests")
@@ -13,8 +17,7 @@ logger = logging.getLogger("howso.rl.tests")
 ])
 def test_agents_regression(agent_type, iterations, max_avg_rounds):
     """Test cart pole is solved by all agent types."""
-    max_workers = int(cpu_count() / 2 - 1)
-    sim = Simulation(iterations=iterations, max_workers=max_workers)
+    sim = Simulation(iterations=iterations, allocation=CpuAllocation.auto(iterations))
     results = sim.run(game_type=GameType.CART_POLE, agent_type=agent_type,
                       max_rounds=max_avg_rounds)
 
@@ -39,8 +42,7 @@ def test_agents_regression(agent_type, iterations, max_avg_rounds):
 ])
 def test_agents_experimental(agent_type, iterations, max_avg_rounds):
     """Test cart pole is solved by all agent types."""
-    max_workers = int(cpu_count() / 2 - 1)
-    sim = Simulation(iterations=iterations, max_workers=max_workers)
+    sim = Simulation(iterations=iterations, allocation=CpuAllocation.auto(iterations))
     results = sim.run(game_type=GameType.CART_POLE, agent_type=agent_type,
                       max_rounds=1000)
 
@@ -57,3 +59,55 @@ def test_agents_experimental(agent_type, iterations, max_avg_rounds):
     assert metrics['total-won'] >= 4
     assert metrics['average-rounds-to-win'] < max_avg_rounds
     assert metrics['average-win-high-score'] >= 300
+
+
+def test_case_budget_reduce():
+    """Test data reduction keeps the trainee within its case budget."""
+    agent = BasicAgent(gym.make('CartPole-v1'), 100, case_budget=50, case_budget_strategy='reduce', seed=1)
+    agent.setup()
+    try:
+        rng = np.random.default_rng(1)
+        cases = np.column_stack([rng.normal(size=(80, 4)), rng.integers(0, 2, 80), rng.integers(1, 80, 80)])
+        agent.train(cases.tolist(), agent.context_features + agent.action_features + agent.goal_features)
+
+        assert agent.num_cases <= 50
+        assert agent.cases_removed == 80 - agent.num_cases
+        assert agent.case_reductions == 1
+    finally:
+        agent.done()
+
+
+def test_time_series_agent_rejects_distilled_policy():
+    """Test the time-series agent, whose reacts depend on the previous step, cannot be distilled."""
+    with pytest.raises(ValueError, match='distilled policy'):
+        TimeSeriesAgent(gym.make('CartPole-v1'), 100, distilled_policy=True)
+
+
+def test_native_vector_env():
+    """Test the native vector environment steps as CartPole-v1 and resets finished rounds in the same step."""
+    env = gym.make_vec('CartPoleNative-v1', num_envs=3, vectorization_mode='vector_entry_point',
+                       max_episode_steps=20)
+    observations, _ = env.reset(seed=0)
+    scalar_envs = [gym.make('CartPole-v1').unwrapped for _ in range(3)]
+    for scalar_env, observation in zip(scalar_envs, observations):
+        scalar_env.reset(seed=0)
+        scalar_env.state = observation.astype(np.float64)
+
+    rng = np.random.default_rng(0)
+    for step in range(1, 21):
+        actions = rng.integers(0, 2, 3)
+        observations, rewards, terminated, truncated, info = env.step(actions)
+        np.testing.assert_array_equal(rewards, 1.0)
+        for index, scalar_env in enumerate(scalar_envs):
+            if scalar_env is None:
+                continue
+            expected, _, expected_terminated, _, _ = scalar_env.step(int(actions[index]))
+            assert terminated[index] == expected_terminated
+            assert truncated[index] == (step == 20 and not expected_terminated)
+            if terminated[index] or truncated[index]:
+                np.testing.assert_allclose(info['final_obs'][index], expected, rtol=1e-5)
+                assert np.all(np.abs(observations[index]) <= 0.05)
+                scalar_envs[index] = None
+            else:
+                np.testing.assert_allclose(observations[index], expected, rtol=1e-5)
+    assert all(scalar_env is None for scalar_env in scalar_envs)
@@ -0,0 +1,254 @@
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from howso_engine_rl_recipes.common.cache import ActionCache
+from howso_engine_rl_recipes.common.distilled import DistilledPolicy
+from howso_engine_rl_recipes.common.explanations import ExplanationRecorder
+from howso_engine_rl_recipes.common.profiler import PhaseProfiler
+from howso_engine_rl_recipes.common.scores import ScoreTracker
+from howso_engine_rl_recipes.common.trainee_pool import TraineePool
+from howso_engine_rl_recipes.common.training import BackgroundTrainer, StepBuffer, TrainingBuffer
+from howso_engine_rl_recipes.results import RunningStats, wilson_interval
+
+
+def test_action_cache_invalidation():
+    """Test cached actions are discarded once the model is trained enough."""
+    cache = ActionCache(invalidate_every=2)
+    assert cache.get(3) is None
+    cache.put(3, 1)
+    assert cache.get(3) == 1
+
+    cache.model_trained()
+    assert cache.get(3) == 1
+    cache.model_trained()
+    assert cache.get(3) is None
+    assert cache.model_version == 1
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert cache.hit_rate == 0.5
+
+
+def test_action_cache_quantized_lru():
+    """Test nearby observations share an action and old actions are evicted."""
+    cache = ActionCache(bin_widths=[0.5, 0.1], max_size=2)
+    cache.put([0.1, 0.01], 0)
+    assert cache.get([0.4, 0.09]) == 0
+
+    cache.put([1.0, 0.0], 1)
+    # Touch the first entry so the second is the least recently used
+    assert cache.get([0.2, 0.05]) == 0
+    cache.put([2.0, 0.0], 1)
+    assert cache.evictions == 1
+    assert cache.get([1.1, 0.0]) is None
+    assert cache.get([0.0, 0.0]) == 0
+
+
+def test_profiler_merge():
+    """Test phase latencies merge across profilers into percentiles."""
+    first, second = PhaseProfiler(), PhaseProfiler()
+    for _ in range(90):
+        first.record('react', 0.001)
+    for _ in range(10):
+        second.record('react', 0.1)
+
+    merged = PhaseProfiler.from_dict(first.to_dict())
+    merged.merge(PhaseProfiler.from_dict(second.to_dict()))
+    summary = merged.summary()['react']
+    assert summary['count'] == 100
+    assert summary['total'] == pytest.approx(1.09)
+    assert summary['p50'] == pytest.approx(0.001, rel=0.05)
+    assert summary['p95'] == pytest.approx(0.1, rel=0.05)
+
+
+def test_profiler_disabled():
+    """Test a disabled profiler records nothing."""
+    profiler = PhaseProfiler(enabled=False)
+    with profiler.phase('react'):
+        pass
+    assert profiler.summary() == {}
+
+
+def test_explanation_recorder_output(tmp_path):
+    """Test sampled explanations are written in the background."""
+    details = {
+        'influential_cases': [[{'score': 1, '.influence_weight': 1.0}], None],
+        'feature_full_residuals': pd.DataFrame({'score': [0.5, 0.25]}),
+    }
+    output = tmp_path / 'explanations.jsonl'
+    recorder = ExplanationRecorder(2, sample_every=2, output=str(output))
+    for step in range(4):
+        if recorder.should_explain():
+            recorder.record(details, 1, step=step)
+    recorder.close()
+
+    with open(output) as output_file:
+        explanations = [json.loads(line) for line in output_file]
+    assert explanations == [
+        {'step': 0, 'feature_full_residuals': {'score': 0.25}},
+        {'step': 2, 'feature_full_residuals': {'score': 0.25}},
+    ]
+    assert (recorder.recorded, recorder.dropped) == (2, 0)
+    assert not ExplanationRecorder(1).should_explain()
+
+
+def test_training_buffer():
+    """Test rounds are buffered until enough rounds or cases are buffered."""
+    buffer = TrainingBuffer(every_rounds=3, every_cases=5)
+    assert not buffer.add([[1], [2]], ['x'])
+    assert buffer.add([[3], [4], [5]], ['x'])
+    assert buffer.drain() == [[1], [2], [3], [4], [5]]
+    assert not buffer.add([[6]], ['x'])
+    assert not buffer.add([[7]], ['x'])
+    assert buffer.add([[8]], ['x'])
+    assert len(buffer.drain()) == 3
+    assert buffer.staleness == (1 + 3) / 5
+
+
+def test_step_buffer():
+    """Test steps are recorded per round and arrays are reused."""
+    buffer = StepBuffer(2, capacity=2)
+    for step in range(3):
+        buffer.append(1, [step, 0])
+    buffer.append(2, [9, 1])
+
+    steps = buffer.pop(1)
+    assert steps.tolist() == [[0, 0], [1, 0], [2, 0]]
+    assert 1 not in buffer and 2 in buffer
+    assert buffer.pop(1) is None
+
+    # The popped round's array is reused without changing its steps
+    buffer.append(3, [5, 5])
+    assert steps[0].tolist() == [0, 0]
+    assert buffer.discard(3)
+    assert not buffer.discard(3)
+
+
+def test_score_tracker():
+    """Test windowed statistics match those of every score kept in a list."""
+    rng = np.random.default_rng(0)
+    scores = rng.integers(-10, 500, 1000).astype(float)
+    tracker = ScoreTracker(100)
+    for i, score in enumerate(scores, 1):
+        tracker.append(score)
+        assert tracker.last == score
+        assert tracker.window_mean == pytest.approx(np.mean(scores[max(0, i - 100):i]))
+        assert tracker.window_max == np.max(scores[max(0, i - 100):i])
+    assert len(tracker) == 1000
+    assert tracker.window_full
+    assert tracker.mean == pytest.approx(np.mean(scores))
+    assert tracker.max == np.max(scores)
+    assert tracker.recent().tolist() == scores[-100:].tolist()
+
+    restored = ScoreTracker.from_state(100, json.loads(json.dumps(tracker.get_state())))
+    restored.append(1.0)
+    tracker.append(1.0)
+    assert len(restored) == len(tracker)
+    assert restored.window_mean == pytest.approx(tracker.window_mean)
+    assert restored.window_max == tracker.window_max
+    assert restored.mean == pytest.approx(tracker.mean)
+
+
+def test_running_stats():
+    """Test streaming statistics approximate those of the values."""
+    rng = np.random.default_rng(0)
+    values = rng.normal(200, 50, 10000)
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+
+    assert stats.mean == pytest.approx(np.mean(values))
+    assert stats.std == pytest.approx(np.std(values, ddof=1))
+    for q in (50, 90, 95):
+        assert stats.percentile(q) == pytest.approx(np.percentile(values, q), rel=0.03)
+    low, high = stats.confidence_interval()
+    assert low < 200 < high
+
+    assert RunningStats().summary()['count'] == 0
+    assert wilson_interval(0, 10)[0] == 0.0
+    assert wilson_interval(5, 10) == pytest.approx((0.2366, 0.7634), abs=1e-4)
+
+
+def test_trainee_pool():
+    """Test trainees are copies of one template per feature specification, independent of each other."""
+    features = {'x': {'type': 'continuous'}, 'y': {'type': 'continuous'}}
+    pool = TraineePool()
+    first = pool.acquire(features, auto_analyze_enabled=True, context_features=['x'])
+    second = pool.acquire(features, auto_analyze_enabled=True, context_features=['x'])
+    other = pool.acquire(features, auto_analyze_enabled=True, context_features=['y'])
+    try:
+        assert len(pool) == 2
+        assert first.id != second.id
+        first.train(pd.DataFrame({'x': [1.0, 2.0], 'y': [3.0, 4.0]}))
+        assert first.get_num_training_cases() == 2
+        assert second.get_num_training_cases() == 0
+        assert set(second.features) == set(features)
+    finally:
+        for trainee in (first, second, other):
+            trainee.delete()
+        pool.clear()
+    assert len(pool) == 0
+
+
+def test_distilled_policy():
+    """Test the distilled policy only acts where its nearest cases agree and falls back otherwise."""
+    policy = DistilledPolicy(2, neighbors=3)
+    assert policy.stale
+    policy.fit([[0.0], [1.0], [2.0], [3.0], [4.0], [5.0], [6.0]], [1, 1, 1, 1, 1, 0, 0])
+    assert not policy.stale and len(policy) == 7
+
+    # Unanimous, split and out of range neighbourhoods
+    actions, confident = policy.predict([[1.2], [5.1], [9.0]])
+    assert actions[0] == 1
+    assert confident.tolist() == [True, False, False]
+    assert policy.hits == 1 and policy.fallbacks == 2
+
+    policy.max_distance = 0.1
+    assert not policy.predict([[1.5]])[1][0]
+
+    policy.model_trained()
+    assert not policy.stale
+    policy.model_trained()
+    assert policy.stale
+
+    # Too few cases to vote
+    policy.fit(np.empty((0, 1)), np.empty(0))
+    assert not policy.predict([[1.0]])[1].any()
+
+    # Large trainees are distilled at a sample of their contexts
+    policy = DistilledPolicy(max_samples=3, seed=1)
+    samples = policy.sample(np.arange(10.0))
+    assert samples.shape == (3, 1)
+    assert np.all(np.diff(samples[:, 0]) > 0)
+
+
+def test_background_trainer():
+    """Test train calls run on the background thread with at most the allowed number outstanding."""
+    release = threading.Event()
+    calls = []
+    trainer = BackgroundTrainer(max_pending=2)
+    try:
+        trainer.submit(lambda: (release.wait(), calls.append(1), 1)[-1])
+        trainer.submit(lambda: (calls.append(2), 2)[-1])
+        assert trainer.pending == 2
+        assert trainer.collect() == []
+
+        # A third call waits for the first to finish
+        threading.Timer(0.05, release.set).start()
+        trainer.submit(lambda: (calls.append(3), 3)[-1])
+        assert trainer.wait_seconds > 0
+        trainer.wait()
+        assert calls == [1, 2, 3]
+        assert trainer.collect() == [1, 2, 3]
+        assert trainer.collect() == []
+        assert 0 <= trainer.overlap <= 1
+
+        def fail():
+            raise ValueError('failed')
+        trainer.submit(fail)
+        with pytest.raises(ValueError):
+            trainer.wait()
+    finally:
+        trainer.close()
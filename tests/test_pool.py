@@ -0,0 +1,85 @@
+import os
+import time
+
+import psutil
+import pytest
+
+from howso_engine_rl_recipes.pool import notify, WorkerPool
+
+
+def _pid():
+    return os.getpid()
+
+
+def _notify_pid():
+    notify('task', pid=os.getpid())
+    return os.getpid()
+
+
+def _exit_once(marker):
+    """Exit the worker the first time, as if it crashed, then succeed."""
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return 'done'
+
+
+def _affinity():
+    return sorted(psutil.Process().cpu_affinity())
+
+
+def _allocate(size):
+    memory = b'x' * size
+    time.sleep(10)
+    return len(memory)
+
+
+def test_recycles_workers():
+    """Test a worker is replaced once it ran its share of tasks."""
+    pids = []
+    with WorkerPool(1, max_tasks_per_worker=2) as pool:
+        for i in range(3):
+            pool.submit(i, _pid)
+            pids.extend(pid for _, pid in pool.wait())
+    assert pids[0] == pids[1] != pids[2]
+    assert pool.recycles == 1
+
+
+def test_notices():
+    """Test workers report when they are ready and the events of their tasks."""
+    with WorkerPool(1) as pool:
+        pool.submit('task', _notify_pid)
+        [(_, pid)] = pool.wait()
+    assert [notice['event'] for notice in pool.notices] == ['ready', 'task']
+    assert all(notice['pid'] == pid for notice in pool.notices)
+    assert pool.notices[0]['started'] <= pool.notices[0]['time'] <= pool.notices[1]['time']
+
+
+def test_resubmits_task_of_failed_worker(tmp_path):
+    """Test the task of a worker which exited is played again in a new worker."""
+    with WorkerPool(1) as pool:
+        pool.submit('task', _exit_once, str(tmp_path / 'marker'))
+        assert pool.wait() == [('task', 'done')]
+    assert pool.restarts == 1
+
+
+def test_memory_limit():
+    """Test a worker exceeding the memory limit is restarted until the task fails."""
+    max_rss = psutil.Process().memory_info().rss + 100 * 2 ** 20
+    with WorkerPool(1, max_rss=max_rss, max_retries=1, poll_interval=0.1) as pool:
+        pool.submit('task', _allocate, 200 * 2 ** 20)
+        with pytest.raises(RuntimeError, match='exceeded the memory limit'):
+            pool.wait()
+    assert pool.restarts == 2
+
+
+@pytest.mark.skipif(not hasattr(psutil.Process(), 'cpu_affinity'), reason='CPU affinity is not supported')
+def test_pins_workers_to_cpus():
+    """Test each worker, including its replacement, is pinned to its CPU set."""
+    cpu = psutil.Process().cpu_affinity()[-1]
+    affinities = []
+    with WorkerPool(1, max_tasks_per_worker=1, cpu_sets=[[cpu]]) as pool:
+        for i in range(2):
+            pool.submit(i, _affinity)
+            affinities.extend(affinity for _, affinity in pool.wait())
+    assert affinities == [[cpu], [cpu]]
@@ -0,0 +1,242 @@
+import csv
+from datetime import timedelta
+import json
+import logging
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from howso_engine_rl_recipes.results import read_jsonl_results
+from howso_engine_rl_recipes.results import CsvResultSink, JsonlResultSink
+from howso_engine_rl_recipes.scheduling import LongestJobFirst
+from howso_engine_rl_recipes.simulation import GameType, PRELOAD_MODULES, Simulation
+from howso_engine_rl_recipes.stopping import SequentialStopping
+from howso_engine_rl_recipes.sweep import Sweep
+from howso_engine_rl_recipes.wafer_thin_mint.game import WaferThinMintGame
+
+
+def test_streamed_results(tmp_path):
+    """Test results are written to sinks without being kept in memory."""
+    csv_path, jsonl_path = tmp_path / 'results.csv', tmp_path / 'results.jsonl'
+    sim = Simulation(iterations=2)
+    with (
+        CsvResultSink(csv_path, game_type='wtm', agent_type='basic') as csv_sink,
+        JsonlResultSink(jsonl_path, game_type='wtm') as jsonl_sink
+    ):
+        results = sim.run(sinks=[csv_sink, jsonl_sink], keep_runs=False,
+                          game_type=GameType.WTM, agent_type='basic', max_rounds=10)
+
+    assert results['runs'] == {}
+    assert results['metrics']['total-iterations'] == 2
+
+    with open(csv_path, newline='') as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert sorted(int(row['iteration']) for row in rows) == [0, 1]
+
+    with open(jsonl_path) as jsonl_file:
+        records = [json.loads(line) for line in jsonl_file]
+    assert all(record['rounds'] == 10 for record in records)
+    assert len(records) == 2
+
+
+def test_profiled_csv_includes_every_phase(tmp_path):
+    """Test the CSV has latency columns for phases beyond the core game loop."""
+    csv_path = tmp_path / 'results.csv'
+    sim = Simulation(iterations=1)
+    with CsvResultSink(csv_path, game_type='wtm', agent_type='basic', profile=True) as sink:
+        sim.run(sinks=[sink], game_type=GameType.WTM, agent_type='basic', max_rounds=10,
+                profile=True, case_budget=5)
+
+    with open(csv_path, newline='') as csv_file:
+        row, = csv.DictReader(csv_file)
+    assert int(row['case_budget_calls']) > 0
+    assert int(row['train_calls']) > 0
+
+
+def test_checkpoint_skips_finished_iterations(tmp_path):
+    """Test a simulation run again with more iterations only plays the new ones."""
+    options = dict(game_type=GameType.WTM, agent_type='basic', max_rounds=5)
+    Simulation(iterations=1).run(checkpoint_dir=tmp_path, **options)
+    with open(tmp_path / 'simulation.json') as manifest_file:
+        seeds = json.load(manifest_file)['seeds']
+
+    results = Simulation(iterations=2).run(checkpoint_dir=tmp_path, **options)
+
+    assert sorted(results['runs']) == [0, 1]
+    assert sorted(read_jsonl_results(tmp_path / 'results.jsonl')) == [0, 1]
+    with open(tmp_path / 'simulation.json') as manifest_file:
+        assert json.load(manifest_file)['seeds'][:1] == seeds
+    assert not list(tmp_path.glob('iteration-*'))
+
+
+def test_checkpoint_resumes_game(tmp_path, caplog):
+    """Test a game continues from the rounds played before its checkpoint."""
+    with WaferThinMintGame('basic', max_rounds=10, seed=1, checkpoint_dir=tmp_path, checkpoint_every=4) as game:
+        game.play()
+    with open(tmp_path / 'state.json') as state_file:
+        assert json.load(state_file)['game']['round_num'] == 9
+
+    with caplog.at_level(logging.INFO), WaferThinMintGame('basic', max_rounds=12, seed=1,
+                                                          checkpoint_dir=tmp_path) as game:
+        result = game.play()
+    assert 'Resuming from round 9' in caplog.text
+    assert result['rounds'] == 12
+    assert result['total_cases'] > 8
+
+
+def test_checkpoint_rejects_different_seeds(tmp_path):
+    """Test a simulation is not resumed with seeds other than those it was checkpointed with."""
+    options = dict(game_type=GameType.WTM, agent_type='basic', max_rounds=3)
+    Simulation(iterations=1).run(seeds=[1], checkpoint_dir=tmp_path, **options)
+    Simulation(iterations=2).run(seeds=[1, 2], checkpoint_dir=tmp_path, **options)
+
+    with pytest.raises(ValueError, match='different seeds'):
+        Simulation(iterations=2).run(seeds=[3, 2], checkpoint_dir=tmp_path, **options)
+
+
+def test_checkpoint_keeps_buffered_rounds(tmp_path):
+    """Test rounds buffered for training are checkpointed rather than trained."""
+    options = dict(max_rounds=10, seed=1, checkpoint_dir=tmp_path, checkpoint_every=4, train_every_rounds=3)
+    with WaferThinMintGame('basic', **options) as game:
+        game.play()
+    with open(tmp_path / 'state.json') as state_file:
+        state = json.load(state_file)
+    # Rounds 1-6 were trained and rounds 7-8 buffered when round 9 was checkpointed
+    assert state['training_buffer']['rounds'] == 2
+
+    with WaferThinMintGame('basic', **{**options, 'max_rounds': 12}) as game:
+        result = game.play()
+    assert result['rounds'] == 12
+    assert result['train_calls'] == 2
+
+
+def test_warm_start(tmp_path):
+    """Test a game's agent starts from a saved trainee without deleting its file."""
+    trainee_path = tmp_path / 'trainee.caml'
+    with WaferThinMintGame('basic', max_rounds=5, seed=1) as game:
+        agent = game.create_agent()
+        agent.trainee.train([[0, 1, 5], [1, 0, 2]], features=['wafer_count', 'action', 'score'])
+        agent.save_trainee(str(trainee_path))
+        game.finish_agent(agent, True)
+
+    with WaferThinMintGame('basic', max_rounds=5, seed=1, warm_start=str(trainee_path)) as game:
+        agent = game.create_agent()
+        assert agent.trainee.get_num_training_cases() == 2
+        game.finish_agent(agent, False)
+    assert trainee_path.is_file()
+
+
+def test_stops_once_settled():
+    """Test iterations stop being started once the win rate is settled."""
+    sim = Simulation(iterations=30)
+    # Too few rounds to win, so the win rate settles below the threshold
+    results = sim.run(game_type=GameType.WTM, agent_type='basic', max_rounds=3,
+                      stopping=SequentialStopping(win_rate_threshold=50, min_iterations=5))
+
+    assert results['stopped'].endswith('below 50%')
+    assert 5 <= len(results['runs']) < 30
+    assert results['metrics']['total-iterations'] == len(results['runs'])
+
+
+def test_stopping_error_rate():
+    """Test checking after every iteration rarely stops when the win rate is at the threshold."""
+    rng = np.random.default_rng(0)
+    stopping = SequentialStopping(win_rate_threshold=50)
+    stopped = 0
+    for wins in rng.random((500, 300)) < 0.5:
+        aggregator = SimpleNamespace(won=0, total=0)
+        for win in wins:
+            aggregator.won += int(win)
+            aggregator.total += 1
+            if stopping.check(aggregator) is not None:
+                stopped += 1
+                break
+    assert stopped / 500 <= stopping.alpha
+
+
+def test_paired_comparison():
+    """Test both variants play every seed and the paired differences are reported."""
+    sim = Simulation(iterations=3)
+    results = sim.run_paired({'max_rounds': 5}, game_type=GameType.WTM, agent_type='basic', max_rounds=8, seed=3)
+
+    comparison = results['comparison']
+    assert comparison['pairs'] == 3
+    assert comparison['rounds-difference']['count'] == 3
+    # Wafer thin mint always plays its maximum number of rounds
+    assert comparison['rounds-difference']['mean'] == 3
+    assert results['baseline']['metrics']['total-iterations'] == 3
+    assert sorted(results['runs']) == [0, 1, 2]
+
+
+def test_longest_job_first(tmp_path):
+    """Test the games predicted to take longest are started first."""
+    csv_path = tmp_path / 'history.csv'
+    with CsvResultSink(csv_path, game_type='wtm', agent_type='basic', configuration='short') as sink:
+        sink.write(0, {'win': False, 'rounds': 2, 'high_score': 0, 'total_cases': 0,
+                       'duration': timedelta(seconds=1)})
+    scheduler = LongestJobFirst()
+    scheduler.load(csv_path)
+    scheduler.add(('wtm', 'basic', 'long'), 3.0)
+    assert scheduler.predict(('wtm', 'basic', 'short')) == 1.0
+    # Unseen labels are predicted from the other games of the same agent
+    assert scheduler.predict(('wtm', 'basic', 'other')) == 2.0
+    assert math.isinf(scheduler.predict(('cartpole', 'basic', None)))
+
+    finished = []
+    configurations = [
+        {'configuration': 'short', 'options': {'game_type': 'wtm', 'agent_type': 'basic', 'max_rounds': 2}},
+        {'configuration': 'long', 'options': {'game_type': 'wtm', 'agent_type': 'basic', 'max_rounds': 4}},
+    ]
+
+    class OrderSink:
+        def __init__(self, label):
+            self.label = label
+
+        def write(self, iteration, result):
+            finished.append(self.label)
+
+    sweep = Sweep(iterations=2)
+    report = sweep.run_sweep(configurations, seed=1, scheduler=scheduler,
+                             sinks=[[OrderSink('short')], [OrderSink('long')]])
+    assert finished == ['long', 'long', 'short', 'short']
+    assert report['utilization'] == 1.0
+
+
+def test_longest_job_first_picks():
+    """Test tasks are picked by the predicted duration of their job, reprioritized as games finish."""
+    scheduler = LongestJobFirst(reprioritize=True)
+    scheduler.add(('wtm', 'basic', 'short'), 1.0)
+    scheduler.add(('wtm', 'basic', 'long'), 3.0)
+    jobs = {0: ('wtm', 'basic', 'short'), 1: ('wtm', 'basic', 'other'), 2: ('wtm', 'basic', 'long'),
+            3: ('wtm', 'basic', 'other'), 4: ('cartpole', 'basic', None)}
+    scheduler.schedule(jobs, jobs)
+    assert [scheduler.pick() for _ in range(3)] == [4, 2, 1]
+    # Finishing a game longer than predicted moves its label ahead of the queued games
+    scheduler.observe(('wtm', 'basic', 'short'), {'duration': timedelta(seconds=9)})
+    assert [scheduler.pick() for _ in range(2)] == [0, 3]
+
+
+def test_forkserver_startup():
+    """Test workers started by a preloaded forkserver report how long they took to start."""
+    sim = Simulation(iterations=2, max_workers=2, start_method='forkserver')
+    results = sim.run(game_type=GameType.WTM, agent_type='basic', max_rounds=3, seed=1)
+
+    startup = results['startup']
+    assert startup['start_method'] == 'forkserver'
+    assert 0 < startup['workers_ready'] <= startup['first_step']
+    assert set(startup['imports']) == set(PRELOAD_MODULES)
+    assert len(results['runs']) == 2
+
+
+def test_setup_timed_separately():
+    """Test agent setup and teardown are reported apart from the duration of play."""
+    sim = Simulation(iterations=2)
+    results = sim.run(game_type=GameType.WTM, agent_type='basic', max_rounds=3, seed=2)
+
+    metrics = results['metrics']
+    assert metrics['setup-duration']['count'] == 2
+    assert metrics['teardown-duration']['count'] == 2
+    for run in results['runs'].values():
+        assert run['setup_duration'] > 0 and run['teardown_duration'] > 0
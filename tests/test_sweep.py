@@ -0,0 +1,65 @@
+import csv
+import json
+
+from howso_engine_rl_recipes.result_cache import ResultCache
+from howso_engine_rl_recipes.results import CsvResultSink
+from howso_engine_rl_recipes.sweep import expand_grid, load_grid, Sweep
+
+
+def test_expand_grid(tmp_path):
+    """Test a grid is expanded into labeled configurations of the options which vary."""
+    grid_path = tmp_path / 'grid.json'
+    grid_path.write_text(json.dumps({
+        'options': {'max-rounds': 5},
+        'grid': [
+            {'game_type': 'wtm', 'desired_conviction': [1, 2], 'engine_config': 'config/latest-st-howso.yml'},
+            {'game_type': 'cartpole', 'agent_type': ['basic', 'unknown']},
+        ],
+    }))
+    grid = load_grid(grid_path)
+    configurations = expand_grid(grid['grid'], grid['options'])
+
+    assert [c['configuration'] for c in configurations] == [
+        'desired_conviction=1 engine_config=latest-st-howso',
+        'desired_conviction=2 engine_config=latest-st-howso',
+        'default',
+    ]
+    assert all(c['options']['max_rounds'] == 5 for c in configurations)
+    assert configurations[2]['options']['game_type'] == 'cartpole'
+
+
+def test_sweep(tmp_path):
+    """Test every cell of a sweep is played on the same seeds and labeled in the CSV output."""
+    csv_path = tmp_path / 'results.csv'
+    configurations = expand_grid({'desired_conviction': [1, 2], 'max_rounds': 4})
+    sweep = Sweep(iterations=2)
+    with (
+        CsvResultSink(csv_path, game_type='wtm', agent_type='basic',
+                      configuration=configurations[0]['configuration']) as first,
+        CsvResultSink(csv_path, game_type='wtm', agent_type='basic',
+                      configuration=configurations[1]['configuration']) as second
+    ):
+        report = sweep.run_sweep(configurations, seed=1, sinks=[[first], [second]])
+
+    assert [c['metrics']['total-iterations'] for c in report['configurations']] == [2, 2]
+    assert len(report['seeds']) == 2
+    with open(csv_path, newline='') as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert sorted(row['configuration'] for row in rows) == ['desired_conviction=1'] * 2 + ['desired_conviction=2'] * 2
+
+
+def test_result_cache(tmp_path):
+    """Test extending a sweep only plays the games not already in the result cache."""
+    cache_path = str(tmp_path / 'results.db')
+    configurations = expand_grid({'max_rounds': [3, 4]})
+    first = Sweep(iterations=2).run_sweep(configurations, seed=5, result_cache=cache_path)
+    extended = Sweep(iterations=3).run_sweep(configurations, seed=5, result_cache=cache_path)
+
+    assert extended['seeds'][:2] == first['seeds']
+    assert [c['metrics']['cached-iterations'] for c in extended['configurations']] == [2, 2]
+    with ResultCache(cache_path) as cache:
+        assert len(cache) == 6
+        options = {'game_type': 'wtm', 'agent_type': 'basic', 'max_rounds': 3, 'seed': first['seeds'][0]}
+        assert cache.get({**options, 'checkpoint_dir': 'ignored'}) is not None
+        assert cache.get({**options, 'seed': 0}) is None
+        assert not ResultCache.cacheable({**options, 'save_winner': 'winner.caml'})
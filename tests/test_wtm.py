@@ -1,8 +1,15 @@
 import logging
+
+import gymnasium as gym
+from gymnasium.vector import AutoresetMode
+import numpy as np
 import pytest
-from multiprocessing import cpu_count
 
+from howso_engine_rl_recipes.allocation import CpuAllocation
+from howso_engine_rl_recipes.common.training import supports_background_training
 from howso_engine_rl_recipes.simulation import GameType, Simulation
+from howso_engine_rl_recipes.stopping import SequentialStopping
+from howso_engine_rl_recipes.wafer_thin_mint.game import WaferThinMintGame
 
 logger = logging.getLogger("howso.rl.tests")
 
@@ -12,16 +19,20 @@ logger = logging.getLogger("howso.rl.tests")
     ('basic', 100),
 ])
 def test_wafer_thin_mint(agent_type, iterations):
-    max_workers = int(cpu_count() / 2 - 1)
-    sim = Simulation(iterations=iterations, max_workers=max_workers)
-    results = sim.run(game_type=GameType.WTM, agent_type=agent_type)
+    sim = Simulation(iterations=iterations, allocation=CpuAllocation.auto(iterations))
+    # Stop once the win rate is settled either side of the required rate
+    stopping = SequentialStopping(win_rate_threshold=58, min_iterations=20)
+    results = sim.run(game_type=GameType.WTM, agent_type=agent_type, stopping=stopping)
     logger.info({
         "agent_type": agent_type,
         "iterations": iterations,
         "results": results
     })
 
-    assert len(results['runs']) == iterations
+    if results['stopped'] is None:
+        assert len(results['runs']) == iterations
+    else:
+        assert results['stopped'].endswith('above 58%')
 
     metrics = results['metrics']
     assert metrics['percent-won'] >= 58
@@ -36,3 +47,136 @@ def test_wafer_thin_mint(agent_type, iterations):
     for run in results['runs'].values():
         if run['win']:
             assert run['total_cases'] >= 2
+
+
+@pytest.mark.parametrize('num_envs, vector_mode', [(1, 'sync'), (4, 'sync'), (4, 'native')])
+def test_wafer_thin_mint_rounds(num_envs, vector_mode):
+    """Test every round is played when rounds are played in lockstep."""
+    sim = Simulation(iterations=2)
+    results = sim.run(game_type=GameType.WTM, agent_type='basic',
+                      max_rounds=20, num_envs=num_envs, vector_mode=vector_mode)
+
+    assert len(results['runs']) == 2
+    for run in results['runs'].values():
+        assert run['rounds'] == 20
+        assert run['total_cases'] >= 20
+
+
+def test_wafer_thin_mint_batched_training():
+    """Test the cases of several rounds are trained in a single call."""
+    sim = Simulation(iterations=1)
+    results = sim.run(game_type=GameType.WTM, agent_type='basic', max_rounds=20, train_every_rounds=5)
+
+    run = results['runs'][0]
+    assert run['train_calls'] == 4
+    assert run['train_staleness'] == 2
+    assert run['total_cases'] >= 20
+
+
+def test_wafer_thin_mint_case_budget():
+    """Test the lowest score cases are removed to keep within the case budget."""
+    sim = Simulation(iterations=1)
+    results = sim.run(game_type=GameType.WTM, agent_type='basic', max_rounds=12,
+                      case_budget=8, case_budget_strategy='lowest-score')
+
+    run = results['runs'][0]
+    assert run['total_cases'] <= 8
+    assert run['cases_removed'] > 0
+    assert run['case_reductions'] > 0
+
+
+def test_wafer_thin_mint_vector_env():
+    """Test the native vector environment plays the same as the Gym environments."""
+    sync_env = gym.make_vec('WaferThinMint-v0', num_envs=4, vectorization_mode='sync',
+                            vector_kwargs={'autoreset_mode': AutoresetMode.SAME_STEP}, render_mode=None)
+    native_env = gym.make_vec('WaferThinMintNative-v0', num_envs=4, vectorization_mode='vector_entry_point')
+    assert native_env.metadata['autoreset_mode'] == AutoresetMode.SAME_STEP
+
+    sync_observations, _ = sync_env.reset(seed=0)
+    native_observations, _ = native_env.reset(seed=0)
+    np.testing.assert_array_equal(native_observations, sync_observations)
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        actions = rng.choice([0, 1], p=[0.1, 0.9], size=4)
+        *sync_step, sync_info = sync_env.step(actions)
+        *native_step, native_info = native_env.step(actions)
+        for native, sync in zip(native_step, sync_step):
+            np.testing.assert_array_equal(native, sync)
+        if '_final_obs' in sync_info:
+            finished = sync_info['_final_obs']
+            np.testing.assert_array_equal(native_info['_final_obs'], finished)
+            np.testing.assert_array_equal(native_info['final_obs'][finished], sync_info['final_obs'][finished])
+
+
+def test_wafer_thin_mint_distilled_policy():
+    """Test most steps are acted on by the distilled policy instead of reacts."""
+    sim = Simulation(iterations=1)
+    results = sim.run(game_type=GameType.WTM, agent_type='basic', max_rounds=30, seed=1, distilled_policy=True)
+
+    run = results['runs'][0]
+    assert run['distilled_hits'] > 0
+    assert run['distilled_hits'] + run['distilled_fallbacks'] == run['steps']
+    assert run['react_calls'] < run['steps']
+    assert results['metrics']['distilled-hit-rate'] > 0
+
+
+def test_distilled_policy_follows_goal():
+    """Test the policy is distilled from goal-seeking reacts rather than the majority of cases."""
+    with WaferThinMintGame('basic', max_rounds=5, seed=1, distilled_policy=True) as game:
+        agent = game.create_agent()
+        try:
+            # Most cases ate the mint and exploded, a few stopped and won
+            cases = [[wafers, 1, -10] for wafers in range(3) for _ in range(8)]
+            cases += [[wafers, 0, 10] for wafers in range(3) for _ in range(2)]
+            agent.trainee.train(cases, features=['wafer_count', 'action', 'score'])
+
+            actions = agent.distilled_actions([[0], [1], [2]], desired_conviction=agent.desired_conviction,
+                                              goal_features_map=agent.goal_features_map)
+            assert actions == [0, 0, 0]
+            assert agent.react_calls == 1
+        finally:
+            game.finish_agent(agent, False)
+
+
+def test_wafer_thin_mint_background_training():
+    """Test every trained round is trained when training overlaps play."""
+    if not supports_background_training():
+        pytest.skip('Background training requires the multi-threaded engine')
+    sim = Simulation(iterations=1)
+    results = sim.run(game_type=GameType.WTM, agent_type='basic', max_rounds=20, background_training=True)
+
+    run = results['runs'][0]
+    assert run['rounds'] == 20
+    assert run['total_cases'] >= 20
+    assert run['train_calls'] > 0
+    assert run['background_train_seconds'] > 0
+    assert 0 <= results['metrics']['background-training-overlap'] <= 1
+
+
+def test_wafer_thin_mint_background_case_budget():
+    """Test the case budget is enforced on the playing thread when training overlaps play."""
+    if not supports_background_training():
+        pytest.skip('Background training requires the multi-threaded engine')
+    sim = Simulation(iterations=1)
+    results = sim.run(game_type=GameType.WTM, agent_type='basic', max_rounds=12, background_training=True,
+                      max_pending_trains=2, case_budget=8, case_budget_strategy='lowest-score')
+
+    run = results['runs'][0]
+    assert run['total_cases'] <= 8
+    assert run['cases_removed'] > 0
+    assert run['train_calls'] > 0
+
+
+def test_background_training_decided_before_play():
+    """Test if rounds are recorded client side does not change once training starts."""
+    with WaferThinMintGame('basic', max_rounds=5, seed=1, background_training=True) as game:
+        agent = game.create_agent()
+        try:
+            assert agent.background_training == supports_background_training()
+            records_cases = agent.records_cases
+            agent.train([[0, 0, 10]], ['wafer_count', 'action', 'score'])
+            agent.flush_training()
+            assert agent.records_cases == records_cases
+            assert agent.train_calls == 1
+        finally:
+            game.finish_agent(agent, False)